@@ -0,0 +1,116 @@
+"""Create change log of touched sale dates for aggregated tables
+
+Revision ID: 3c1e9a7b5d20
+Revises: 77af5394a84f
+Create Date: 2026-10-18 09:12:31.402117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c1e9a7b5d20'
+down_revision: Union[str, None] = '77af5394a84f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    """ Cria a tabela de datas alteradas e os triggers que a alimentam a partir de sales e product_sales """
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS aggregate_changed_dates (
+            aggregate TEXT NOT NULL,
+            sale_date DATE NOT NULL,
+            changed_at TIMESTAMP NOT NULL DEFAULT now(),
+            PRIMARY KEY (aggregate, sale_date)
+        );
+    """)
+
+    # Vendas alteram as três tabelas de agregação
+    op.execute("""
+        CREATE OR REPLACE FUNCTION capture_sales_changed_dates() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO aggregate_changed_dates (aggregate, sale_date)
+                SELECT a.aggregate, d.sale_date
+                FROM (SELECT DISTINCT datetime::date AS sale_date FROM new_rows) d
+                CROSS JOIN (VALUES ('product_sales_aggregated'),
+                                   ('category_revenue_aggregated'),
+                                   ('customer_purchases_aggregated')) a(aggregate)
+                ON CONFLICT (aggregate, sale_date) DO NOTHING;
+            END IF;
+            IF TG_OP IN ('DELETE', 'UPDATE') THEN
+                INSERT INTO aggregate_changed_dates (aggregate, sale_date)
+                SELECT a.aggregate, d.sale_date
+                FROM (SELECT DISTINCT datetime::date AS sale_date FROM old_rows) d
+                CROSS JOIN (VALUES ('product_sales_aggregated'),
+                                   ('category_revenue_aggregated'),
+                                   ('customer_purchases_aggregated')) a(aggregate)
+                ON CONFLICT (aggregate, sale_date) DO NOTHING;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+    # Itens de venda alteram apenas as agregações por produto e por categoria
+    op.execute("""
+        CREATE OR REPLACE FUNCTION capture_product_sales_changed_dates() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO aggregate_changed_dates (aggregate, sale_date)
+                SELECT a.aggregate, d.sale_date
+                FROM (SELECT DISTINCT s.datetime::date AS sale_date
+                      FROM new_rows r JOIN sales s ON s.id = r.id_sale) d
+                CROSS JOIN (VALUES ('product_sales_aggregated'),
+                                   ('category_revenue_aggregated')) a(aggregate)
+                ON CONFLICT (aggregate, sale_date) DO NOTHING;
+            END IF;
+            IF TG_OP IN ('DELETE', 'UPDATE') THEN
+                INSERT INTO aggregate_changed_dates (aggregate, sale_date)
+                SELECT a.aggregate, d.sale_date
+                FROM (SELECT DISTINCT s.datetime::date AS sale_date
+                      FROM old_rows r JOIN sales s ON s.id = r.id_sale) d
+                CROSS JOIN (VALUES ('product_sales_aggregated'),
+                                   ('category_revenue_aggregated')) a(aggregate)
+                ON CONFLICT (aggregate, sale_date) DO NOTHING;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+    # Triggers por comando com tabelas de transição (uma linha de log por data, não por venda)
+    for table, function in (("sales", "capture_sales_changed_dates"),
+                            ("product_sales", "capture_product_sales_changed_dates")):
+        op.execute(f"""
+            CREATE TRIGGER {table}_changed_dates_insert
+            AFTER INSERT ON {table}
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION {function}();
+        """)
+        op.execute(f"""
+            CREATE TRIGGER {table}_changed_dates_update
+            AFTER UPDATE ON {table}
+            REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION {function}();
+        """)
+        op.execute(f"""
+            CREATE TRIGGER {table}_changed_dates_delete
+            AFTER DELETE ON {table}
+            REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION {function}();
+        """)
+
+
+def downgrade():
+    """ Remove os triggers, as funções e a tabela de datas alteradas """
+    for table in ("sales", "product_sales"):
+        for event in ("insert", "update", "delete"):
+            op.execute(f"DROP TRIGGER IF EXISTS {table}_changed_dates_{event} ON {table};")
+    op.execute("DROP FUNCTION IF EXISTS capture_product_sales_changed_dates();")
+    op.execute("DROP FUNCTION IF EXISTS capture_sales_changed_dates();")
+    op.execute("DROP TABLE IF EXISTS aggregate_changed_dates;")
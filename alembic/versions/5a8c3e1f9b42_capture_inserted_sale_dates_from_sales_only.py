@@ -0,0 +1,43 @@
+"""Capture inserted sale dates from the sales trigger only
+
+Revision ID: 5a8c3e1f9b42
+Revises: d9e2f4a71c36
+Create Date: 2026-10-18 20:41:07.193654
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5a8c3e1f9b42'
+down_revision: Union[str, None] = 'd9e2f4a71c36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    """ Remove o trigger de INSERT de product_sales.
+
+    Para achar a data de cada item, o trigger junta as linhas novas com
+    `sales` só pelo id; sem `datetime` na junção, cada item é procurado em
+    todas as partições, e esse custo caía em todo lote de ingestão. Os itens
+    são sempre gravados na mesma transação da venda, cujo trigger já registra
+    a data nas três agregações.
+
+    UPDATE e DELETE em product_sales continuam registrados: são correções
+    avulsas, sem a venda junto, e raras o bastante para pagar a busca.
+    """
+    op.execute("DROP TRIGGER IF EXISTS product_sales_changed_dates_insert ON product_sales;")
+
+
+def downgrade():
+    """ Recria o trigger de INSERT de product_sales """
+    op.execute("""
+        CREATE TRIGGER product_sales_changed_dates_insert
+        AFTER INSERT ON product_sales
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION capture_product_sales_changed_dates();
+    """)
@@ -0,0 +1,56 @@
+"""Create monthly and yearly rollup tables for aggregated tables
+
+Revision ID: 8d41f2c6a9e3
+Revises: 3c1e9a7b5d20
+Create Date: 2026-10-18 10:03:52.118640
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d41f2c6a9e3'
+down_revision: Union[str, None] = '3c1e9a7b5d20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# sale_date guarda o primeiro dia do mês/ano do rollup
+ROLLUPS = {
+    "product_sales_aggregated": ("id_product INTEGER NOT NULL, description TEXT NOT NULL, total_sold BIGINT NOT NULL",
+                                 "id_product", "description", "total_sold"),
+    "category_revenue_aggregated": ("id_category INTEGER NOT NULL, category TEXT NOT NULL, total_revenue NUMERIC(16,2) NOT NULL",
+                                    "id_category", "category", "total_revenue"),
+    "customer_purchases_aggregated": ("id_user INTEGER NOT NULL, total_purchases BIGINT NOT NULL",
+                                      "id_user", None, "total_purchases"),
+}
+
+
+def upgrade():
+    """ Cria e popula os rollups mensais e anuais a partir das tabelas diárias """
+    for table, (columns, key, label, measure) in ROLLUPS.items():
+        dimensions = f"{key}, {label}" if label else key
+        for period in ("month", "year"):
+            rollup = f"{table}_{period}ly"
+            op.execute(f"""
+                CREATE TABLE IF NOT EXISTS {rollup} (
+                    sale_date DATE NOT NULL,
+                    {columns},
+                    PRIMARY KEY (sale_date, {key})
+                );
+            """)
+            op.execute(f"""
+                INSERT INTO {rollup} (sale_date, {dimensions}, {measure})
+                SELECT date_trunc('{period}', sale_date)::date, {key}, {f"MAX({label}), " if label else ""}SUM({measure})
+                FROM {table}
+                GROUP BY 1, {key};
+            """)
+
+
+def downgrade():
+    """ Remove os rollups mensais e anuais """
+    for table in ROLLUPS:
+        for period in ("month", "year"):
+            op.execute(f"DROP TABLE IF EXISTS {table}_{period}ly;")
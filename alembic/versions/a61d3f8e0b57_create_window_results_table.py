@@ -0,0 +1,38 @@
+"""Create window_results table for precomputed named date windows
+
+Revision ID: a61d3f8e0b57
+Revises: e4a7c2d91f08
+Create Date: 2026-10-18 16:41:05.912734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a61d3f8e0b57'
+down_revision: Union[str, None] = 'e4a7c2d91f08'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    """ Cria a tabela com o resultado de cada métrica para cada janela conhecida (today, last_7_days...) """
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS window_results (
+            window_name TEXT NOT NULL,
+            metric TEXT NOT NULL,
+            start_date DATE NOT NULL,
+            end_date DATE NOT NULL,
+            result JSONB NOT NULL,
+            computed_at TIMESTAMP NOT NULL DEFAULT now(),
+            PRIMARY KEY (window_name, metric)
+        );
+    """)
+
+
+def downgrade():
+    """ Remove a tabela de janelas pré-calculadas """
+    op.execute("DROP TABLE IF EXISTS window_results;")
@@ -0,0 +1,50 @@
+"""Create precomputed top customer candidate lists per month and year
+
+Revision ID: b7e05d93c4a1
+Revises: 8d41f2c6a9e3
+Create Date: 2026-10-18 11:20:44.573019
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.services.top_customer_engine import TOP_CANDIDATES
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e05d93c4a1'
+down_revision: Union[str, None] = '8d41f2c6a9e3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    """ Cria e popula as listas dos N maiores compradores de cada mês e de cada ano """
+    for period in ("monthly", "yearly"):
+        op.execute(f"""
+            CREATE TABLE IF NOT EXISTS customer_top_candidates_{period} (
+                sale_date DATE NOT NULL,
+                rank INTEGER NOT NULL,
+                id_user INTEGER NOT NULL,
+                total_purchases BIGINT NOT NULL,
+                PRIMARY KEY (sale_date, rank)
+            );
+        """)
+        op.execute(f"""
+            INSERT INTO customer_top_candidates_{period} (sale_date, rank, id_user, total_purchases)
+            SELECT sale_date, rank, id_user, total_purchases
+            FROM (
+                SELECT sale_date, id_user, total_purchases,
+                       ROW_NUMBER() OVER (PARTITION BY sale_date ORDER BY total_purchases DESC, id_user) AS rank
+                FROM customer_purchases_aggregated_{period}
+            ) ranked
+            WHERE rank <= {TOP_CANDIDATES};
+        """)
+
+
+def downgrade():
+    """ Remove as listas de candidatos """
+    for period in ("monthly", "yearly"):
+        op.execute(f"DROP TABLE IF EXISTS customer_top_candidates_{period};")
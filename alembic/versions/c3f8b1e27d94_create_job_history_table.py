@@ -0,0 +1,42 @@
+"""Create job_history table for the leader-elected job runner
+
+Revision ID: c3f8b1e27d94
+Revises: a61d3f8e0b57
+Create Date: 2026-10-18 18:12:44.207391
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3f8b1e27d94'
+down_revision: Union[str, None] = 'a61d3f8e0b57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    """ Cria o histórico de execuções dos jobs agendados """
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS job_history (
+            id BIGSERIAL PRIMARY KEY,
+            job TEXT NOT NULL,
+            instance TEXT NOT NULL,
+            status TEXT NOT NULL,
+            started_at TIMESTAMP NOT NULL,
+            finished_at TIMESTAMP,
+            duration_ms DOUBLE PRECISION,
+            rows_affected JSONB,
+            error TEXT
+        );
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS idx_job_history_job_started_at ON job_history (job, started_at DESC);")
+
+
+def downgrade():
+    """ Remove o histórico de execuções dos jobs """
+    op.execute("DROP INDEX IF EXISTS idx_job_history_job_started_at;")
+    op.execute("DROP TABLE IF EXISTS job_history;")
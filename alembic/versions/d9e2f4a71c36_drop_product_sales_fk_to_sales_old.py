@@ -0,0 +1,36 @@
+"""Drop the product_sales foreign key left pointing at sales_old
+
+Revision ID: d9e2f4a71c36
+Revises: c3f8b1e27d94
+Create Date: 2026-10-18 19:05:12.418230
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd9e2f4a71c36'
+down_revision: Union[str, None] = 'c3f8b1e27d94'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    """ Remove a FK de product_sales.id_sale, que seguiu a tabela renomeada para sales_old.
+
+    A `sales` particionada tem chave (id, datetime), então não há como
+    referenciar só `sales.id`; com a FK antiga, toda venda nova falhava ao
+    gravar os itens.
+    """
+    op.execute("ALTER TABLE product_sales DROP CONSTRAINT IF EXISTS product_sales_id_sale_fkey;")
+
+
+def downgrade():
+    """ Recria a FK como estava (para sales_old), sem validar as linhas gravadas depois """
+    op.execute("""
+        ALTER TABLE product_sales
+        ADD CONSTRAINT product_sales_id_sale_fkey FOREIGN KEY (id_sale) REFERENCES sales_old (id) NOT VALID;
+    """)
@@ -0,0 +1,56 @@
+"""Replace yearly_total_sales materialized view with monthly sales counters
+
+Revision ID: e4a7c2d91f08
+Revises: b7e05d93c4a1
+Create Date: 2026-10-18 14:02:17.381245
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4a7c2d91f08'
+down_revision: Union[str, None] = 'b7e05d93c4a1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    """ Cria o contador mensal de vendas e remove a Materialized View anual """
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS sales_counter_monthly (
+            sale_date DATE PRIMARY KEY,
+            total_sales BIGINT NOT NULL
+        );
+    """)
+
+    # Cada venda pertence a um único cliente, então a soma das compras por
+    # cliente no mês é o total de vendas do mês; o refresh mantém essa igualdade
+    op.execute("""
+        INSERT INTO sales_counter_monthly (sale_date, total_sales)
+        SELECT sale_date, SUM(total_purchases)
+        FROM customer_purchases_aggregated_monthly
+        GROUP BY sale_date
+        HAVING SUM(total_purchases) <> 0;
+    """)
+
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS yearly_total_sales;")
+
+
+def downgrade():
+    """ Recria a Materialized View anual e remove o contador mensal """
+    op.execute("""
+        CREATE MATERIALIZED VIEW yearly_total_sales AS
+        SELECT 
+            extract(year FROM datetime) AS year,
+            COUNT(id) AS total_sales
+        FROM sales
+        GROUP BY year
+        ORDER BY year;
+    """)
+    op.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_yearly_total_sales ON yearly_total_sales (year);")
+
+    op.execute("DROP TABLE IF EXISTS sales_counter_monthly;")
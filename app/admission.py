@@ -0,0 +1,191 @@
+import asyncio
+import bisect
+import itertools
+import math
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from fastapi.responses import JSONResponse
+from starlette.routing import Match
+from starlette.types import ASGIApp, Receive, Scope, Send
+from app.logger import logger
+from app.metrics import ADMISSION_REJECTED, ADMISSION_WAIT
+from app.services.dashboard_service import DASHBOARD_CONNECTIONS
+
+ADMISSION_MAX_CONCURRENCY = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "64"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "256"))
+ADMISSION_QUEUE_TIMEOUT_SECONDS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "2"))
+
+CHEAP, HEAVY = 0, 1
+
+# (prioridade, máximo de requisições simultâneas) por rota; rotas fora da
+# tabela não passam pelo controle. As consultas às tabelas agregadas têm
+# prioridade sobre as que varrem `sales`.
+ADMISSION_RULES: Dict[Tuple[str, str], Tuple[int, int]] = {
+    ("GET", "/sales/top-product"): (CHEAP, 64),
+    ("GET", "/sales/top-customer"): (CHEAP, 64),
+    ("GET", "/sales/top-products"): (CHEAP, 64),
+    ("GET", "/sales/top-customers"): (CHEAP, 64),
+    ("GET", "/sales/revenue-by-category"): (CHEAP, 64),
+    ("GET", "/sales/monthly-average"): (CHEAP, 64),
+    ("POST", "/sales/batch"): (CHEAP, 16),
+    ("GET", "/sales/dashboard"): (HEAVY, 16),
+    ("GET", "/sales/summary"): (HEAVY, 16),
+    ("GET", "/sales/export"): (HEAVY, 4),
+    ("GET", "/sales/aggregates/{table}/export"): (HEAVY, 4),
+}
+
+# Vagas ocupadas por requisição nas rotas que abrem mais de uma conexão ao mesmo tempo
+ADMISSION_WEIGHTS: Dict[Tuple[str, str], int] = {
+    ("GET", "/sales/dashboard"): DASHBOARD_CONNECTIONS,
+}
+
+
+class Overloaded(Exception):
+    """ A fila de espera está cheia ou a espera passou do limite. """
+
+
+class AdmissionController:
+    """ Limita quantas requisições usam o banco ao mesmo tempo.
+
+    Há `capacity` vagas no total, uma por conexão: cada requisição ocupa
+    `weight` vagas, tantas quantas conexões abre em paralelo, e o limite por
+    rota conta requisições. Quem não consegue vaga espera em uma fila de até
+    `max_queue` requisições, ordenada por prioridade e depois por chegada;
+    após `queue_timeout` segundos na fila, ou com a fila cheia, a requisição
+    é recusada.
+    """
+
+    def __init__(self, capacity: int = ADMISSION_MAX_CONCURRENCY, max_queue: int = ADMISSION_MAX_QUEUE,
+                 queue_timeout: float = ADMISSION_QUEUE_TIMEOUT_SECONDS):
+        self.capacity = capacity
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._active = 0
+        self._active_by_route: Dict[str, int] = {}
+        self._waiters: List[Tuple[int, int, str, int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self.admitted = 0
+        self.rejected = 0
+
+    def _weight(self, weight: int) -> int:
+        # Mais vagas que a capacidade nunca caberiam: a requisição ocupa todas
+        return max(1, min(weight, self.capacity))
+
+    def _can_admit(self, route: str, limit: int, weight: int) -> bool:
+        return self._active + weight <= self.capacity and self._active_by_route.get(route, 0) < limit
+
+    def _admit(self, route: str, weight: int) -> None:
+        self._active += weight
+        self._active_by_route[route] = self._active_by_route.get(route, 0) + 1
+        self.admitted += 1
+
+    def _dispatch(self) -> None:
+        """ Libera, em ordem de prioridade, os que esperam e já cabem nos limites. """
+        index = 0
+        while index < len(self._waiters) and self._active < self.capacity:
+            _, _, route, limit, weight, future = self._waiters[index]
+            if future.done():
+                del self._waiters[index]
+            elif self._can_admit(route, limit, weight):
+                del self._waiters[index]
+                self._admit(route, weight)
+                future.set_result(True)
+            else:
+                index += 1
+
+    async def acquire(self, route: str, priority: int, limit: int, weight: int = 1) -> None:
+        weight = self._weight(weight)
+        # `_dispatch` roda a cada liberação, então quem ainda espera com vagas
+        # livres está barrado pelo limite da própria rota ou pelo peso: não há fila a furar
+        if self._can_admit(route, limit, weight):
+            self._admit(route, weight)
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise Overloaded(f"admission queue full ({self.max_queue})")
+
+        future = asyncio.get_running_loop().create_future()
+        waiter = (priority, next(self._sequence), route, limit, weight, future)
+        bisect.insort(self._waiters, waiter, key=lambda item: item[:2])
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # A vaga foi concedida junto com o timeout/cancelamento: devolve
+                self.release(route, weight)
+            else:
+                future.cancel()
+                self._dispatch()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self.rejected += 1
+            raise Overloaded(f"waited more than {self.queue_timeout}s for a database slot")
+
+    def release(self, route: str, weight: int = 1) -> None:
+        self._active -= self._weight(weight)
+        self._active_by_route[route] -= 1
+        self._dispatch()
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.queue_timeout))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "capacity": self.capacity,
+            "active": self._active,
+            "active_by_route": {route: count for route, count in self._active_by_route.items() if count},
+            "queued": sum(1 for waiter in self._waiters if not waiter[-1].done()),
+            "max_queue": self.max_queue,
+            "queue_timeout_seconds": self.queue_timeout,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
+
+
+admission = AdmissionController()
+
+
+def match_rule(scope: Scope) -> Optional[Tuple[str, Tuple[int, int]]]:
+    app = scope.get("app")
+    for route in getattr(app, "routes", []):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            key = (scope["method"], route.path)
+            return (route.path, ADMISSION_RULES[key]) if key in ADMISSION_RULES else None
+    return None
+
+
+class AdmissionMiddleware:
+    """ Middleware ASGI: a vaga é mantida até o fim do envio da resposta (inclusive streaming). """
+
+    def __init__(self, app: ASGIApp, controller: AdmissionController = admission):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        rule = match_rule(scope) if scope["type"] == "http" else None
+        if rule is None:
+            await self.app(scope, receive, send)
+            return
+
+        route, (priority, limit) = rule
+        weight = ADMISSION_WEIGHTS.get((scope["method"], route), 1)
+        started = time.perf_counter()
+        try:
+            await self.controller.acquire(route, priority, limit, weight)
+        except Overloaded as e:
+            ADMISSION_REJECTED.labels(route).inc()
+            logger.warning(f"Shedding {scope['method']} {route}: {e}")
+            response = JSONResponse(
+                {"detail": "Server is overloaded, retry later."}, status_code=503,
+                headers={"Retry-After": str(self.controller.retry_after())},
+            )
+            await response(scope, receive, send)
+            return
+        ADMISSION_WAIT.labels(route).observe(time.perf_counter() - started)
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(route, weight)
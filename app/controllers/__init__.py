@@ -1 +1,3 @@
-from .sales_controller import router as sales_router
\ No newline at end of file
+from .sales_controller import router as sales_router
+from .admin_controller import router as admin_router
+from .health_controller import router as health_router
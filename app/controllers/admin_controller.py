@@ -0,0 +1,40 @@
+from fastapi import APIRouter, Query
+from typing import Dict, Any, List, Optional
+from app.database import SessionLocal, slow_query_log
+from app.jobs.manage_partitions import partition_report
+from app.jobs.job_runner import job_runner
+from app.admission import admission
+router = APIRouter(prefix="/admin")
+
+@router.get("/slow-queries", response_model=Dict[str, Any])
+def list_slow_queries(limit: int = Query(50, ge=1, le=1000)) -> Dict[str, Any]:
+    return {
+        "threshold_ms": slow_query_log.threshold_ms,
+        "explain_sample_rate": slow_query_log.explain_sample_rate,
+        "queries": slow_query_log.entries(limit),
+    }
+
+@router.delete("/slow-queries", response_model=Dict[str, str])
+def clear_slow_queries() -> Dict[str, str]:
+    slow_query_log.clear()
+    return {"status": "cleared"}
+
+@router.get("/partitions", response_model=List[Dict[str, Any]])
+def list_partitions() -> List[Dict[str, Any]]:
+    db = SessionLocal()
+    try:
+        return partition_report(db)
+    finally:
+        db.close()
+
+@router.get("/admission", response_model=Dict[str, Any])
+def admission_stats() -> Dict[str, Any]:
+    return admission.stats()
+
+@router.get("/jobs", response_model=Dict[str, Any])
+def list_job_runs(limit: int = Query(50, ge=1, le=1000), job: Optional[str] = None) -> Dict[str, Any]:
+    return {
+        "instance": job_runner.instance,
+        "leader": job_runner.is_leader,
+        "runs": job_runner.history(limit, job),
+    }
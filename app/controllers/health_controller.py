@@ -0,0 +1,35 @@
+import asyncio
+import os
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from typing import Dict, Any
+from sqlalchemy.sql import text
+from app.database import AsyncSessionLocal
+from app.jobs.warmup import warmup_state, aggregate_freshness
+from app.logger import logger
+router = APIRouter(prefix="/health")
+
+HEALTH_CHECK_TIMEOUT_SECONDS = float(os.getenv("HEALTH_CHECK_TIMEOUT_SECONDS", "2"))
+
+async def check_database() -> Dict[str, Any]:
+    async with AsyncSessionLocal() as db:
+        await db.execute(text("SELECT 1;"))
+        return await aggregate_freshness(db)
+
+@router.get("/live", response_model=Dict[str, str])
+async def liveness() -> Dict[str, str]:
+    return {"status": "alive"}
+
+@router.get("/ready", response_model=Dict[str, Any])
+async def readiness() -> JSONResponse:
+    """ Pronto quando o banco responde; o aquecimento e o atraso das agregações são informativos. """
+    try:
+        freshness = await asyncio.wait_for(check_database(), timeout=HEALTH_CHECK_TIMEOUT_SECONDS)
+    except Exception as e:
+        logger.warning(f"Readiness check failed: {e!r}")
+        return JSONResponse(status_code=503, content={
+            "status": "unavailable", "database": "unreachable", "warmup": warmup_state.report(),
+        })
+    return JSONResponse(content={
+        "status": "ready", "database": "ok", "warmup": warmup_state.report(), "aggregates": freshness,
+    })
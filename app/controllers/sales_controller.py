@@ -1,33 +1,51 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import Dict, Any
-from app.database import SessionLocal
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.background import BackgroundTask
+import os
+import tempfile
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import AsyncIterator, Dict, Any, List, Optional
+from sqlalchemy.exc import IntegrityError
+from app.database import AsyncSessionLocal
 from app.services.sales_service import (
     get_sales_summary, get_top_product, get_top_customer, 
-    get_revenue_by_category, get_yearly_sales_average
+    get_revenue_by_category, get_yearly_sales_average,
+    get_top_products, get_top_customers
 )
+from app.services.top_customer_engine import TOP_CANDIDATES
+from app.services.result_cache import result_cache
+from app.services.single_flight import coalescer
+from app.services.window_results import window_results
+from app.services.sales_cube import sales_cube
+from app.services.sales_ingestion import sales_write_buffer, BufferFullError, INGEST_DURABILITY
+from app.services.sales_export import stream_sales, EXPORT_FORMATS
+from app.services import aggregate_export
+from app.services.batch_service import run_batch
+from app.services.dashboard_service import get_dashboard
+from app.schemas import SaleIn, BulkSalesIn, SalesAccepted, BatchQueryIn, BatchQueryOut, BatchQueryResult
+from app.utils.date_utils import validate_dates, parse_date, resolve_date_range
 from app.logger import logger  
 router = APIRouter()
 
-def get_db() -> Session:
-    db = SessionLocal()
-    try:
+async def get_db() -> AsyncIterator[AsyncSession]:
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 @router.get("/sales/summary", response_model=Dict[str, int])
-def sales_summary(start_date: str, end_date: str, db: Session = Depends(get_db)) -> Dict[str, int]:
-    total_sales = get_sales_summary(db, start_date, end_date)
+async def sales_summary(start_date: Optional[str] = None, end_date: Optional[str] = None, window: Optional[str] = None, db: AsyncSession = Depends(get_db)) -> Dict[str, int]:
+    start_date, end_date = resolve_date_range(start_date, end_date, window)
+    total_sales = await get_sales_summary(db, start_date, end_date)
     if total_sales is None: 
         logger.error("Internal server error while processing request.")
         raise HTTPException(status_code=500, detail="Internal server error while processing request.")
     return {"total_sales": total_sales}
 
 @router.get("/sales/top-product", response_model=Dict[str, Any])
-def sales_top_product(start_date: str, end_date: str, db: Session = Depends(get_db)) -> Dict[str, Any]:
+async def sales_top_product(start_date: Optional[str] = None, end_date: Optional[str] = None, window: Optional[str] = None, db: AsyncSession = Depends(get_db)) -> Dict[str, Any]:
+    start_date, end_date = resolve_date_range(start_date, end_date, window)
     try:
-        top_product = get_top_product(db, start_date, end_date)
+        top_product = await get_top_product(db, start_date, end_date)
         if top_product is None:
             logger.info("No product found in the period.")
             raise HTTPException(status_code=404, detail="No product found in the period.")
@@ -37,9 +55,10 @@ def sales_top_product(start_date: str, end_date: str, db: Session = Depends(get_
         raise HTTPException(status_code=500, detail="Internal server error while processing request.")
 
 @router.get("/sales/top-customer", response_model=Dict[str, Any])
-def sales_top_customer(start_date: str, end_date: str, db: Session = Depends(get_db)) -> Dict[str, Any]:
+async def sales_top_customer(start_date: Optional[str] = None, end_date: Optional[str] = None, window: Optional[str] = None, db: AsyncSession = Depends(get_db)) -> Dict[str, Any]:
+    start_date, end_date = resolve_date_range(start_date, end_date, window)
     try: 
-        top_customer = get_top_customer(db, start_date, end_date)
+        top_customer = await get_top_customer(db, start_date, end_date)
         if top_customer is None: 
             logger.info("No customer found in the period.")
             raise HTTPException(status_code=404, detail="No customer found in the period.")
@@ -48,10 +67,31 @@ def sales_top_customer(start_date: str, end_date: str, db: Session = Depends(get
         logger.error(f"Unexpected error while fetching top customer: {e}")
         raise HTTPException(status_code=500, detail="Internal server error while processing request.")
 
+@router.get("/sales/top-products", response_model=Dict[str, Any])
+async def sales_top_products(start_date: Optional[str] = None, end_date: Optional[str] = None, window: Optional[str] = None, k: int = Query(10, ge=1, le=100),
+                             category_id: Optional[int] = None, db: AsyncSession = Depends(get_db)) -> Dict[str, Any]:
+    start_date, end_date = resolve_date_range(start_date, end_date, window)
+    ranking = await get_top_products(db, start_date, end_date, k=k, category_id=category_id)
+    if not ranking:
+        logger.info("No product found in the period.")
+        raise HTTPException(status_code=404, detail="No product found in the period.")
+    return {"products": ranking}
+
+@router.get("/sales/top-customers", response_model=Dict[str, Any])
+async def sales_top_customers(start_date: Optional[str] = None, end_date: Optional[str] = None, window: Optional[str] = None, k: int = Query(10, ge=1, le=TOP_CANDIDATES),
+                              db: AsyncSession = Depends(get_db)) -> Dict[str, Any]:
+    start_date, end_date = resolve_date_range(start_date, end_date, window)
+    ranking = await get_top_customers(db, start_date, end_date, k=k)
+    if not ranking:
+        logger.info("No customer found in the period.")
+        raise HTTPException(status_code=404, detail="No customer found in the period.")
+    return {"customers": ranking}
+
 @router.get("/sales/revenue-by-category", response_model=Dict[str, Any])
-def sales_revenue_by_category(start_date: str, end_date: str, db: Session = Depends(get_db)) -> Dict[str, Any]:
+async def sales_revenue_by_category(start_date: Optional[str] = None, end_date: Optional[str] = None, window: Optional[str] = None, db: AsyncSession = Depends(get_db)) -> Dict[str, Any]:
+    start_date, end_date = resolve_date_range(start_date, end_date, window)
     try: 
-        result = get_revenue_by_category(db, start_date, end_date)
+        result = await get_revenue_by_category(db, start_date, end_date)
         if result is None or len(result) == 0: 
             logger.info("No revenue found in the period.")
             raise HTTPException(status_code=404, detail="No revenue found in the period.")
@@ -61,9 +101,9 @@ def sales_revenue_by_category(start_date: str, end_date: str, db: Session = Depe
         raise HTTPException(status_code=500, detail="Internal server error while processing request.")
 
 @router.get("/sales/monthly-average", response_model=Dict[str, Any])
-def sales_monthly_average(db: Session = Depends(get_db)) -> Dict[str, Any]:
+async def sales_monthly_average(db: AsyncSession = Depends(get_db)) -> Dict[str, Any]:
     try: 
-        yearly_sales_average = get_yearly_sales_average(db)
+        yearly_sales_average = await get_yearly_sales_average(db)
         if yearly_sales_average is None or len(yearly_sales_average) == 0:
             raise HTTPException(status_code=404, detail="No average sales found.")
 
@@ -71,4 +111,96 @@ def sales_monthly_average(db: Session = Depends(get_db)) -> Dict[str, Any]:
 
     except Exception as e:
         logger.error(f"Internal error while fetching yearly sales average: {e}")    
-        raise HTTPException(status_code=500, detail="Internal server error while processing request.")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Internal server error while processing request.")
+
+@router.get("/sales/export")
+async def sales_export(start_date: str, end_date: str,
+                       format: str = Query("ndjson", pattern="^(ndjson|csv)$")) -> StreamingResponse:
+    validate_dates(start_date, end_date)
+    filename = f"sales_{start_date}_{end_date}.{format}"
+    return StreamingResponse(
+        stream_sales(start_date, end_date, format),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@router.get("/sales/aggregates/{table}/export")
+async def sales_aggregate_export(table: str, start_date: str, end_date: str,
+                                 format: str = Query("parquet", pattern="^(parquet|arrow)$"),
+                                 granularity: str = Query("daily", pattern="^(daily|monthly|yearly)$")) -> FileResponse:
+    if table not in aggregate_export.AGGREGATE_EXPORTS:
+        raise HTTPException(status_code=404, detail=f"Unknown aggregate table. Use one of: {', '.join(aggregate_export.AGGREGATE_EXPORTS)}.")
+    validate_dates(start_date, end_date)
+    media_type, extension = aggregate_export.EXPORT_FORMATS[format]
+    handle, path = tempfile.mkstemp(suffix=f".{extension}")
+    os.close(handle)
+    try:
+        await run_in_threadpool(aggregate_export.export_aggregate, table, parse_date(start_date), parse_date(end_date),
+                                path, format, granularity)
+    except Exception as e:
+        os.remove(path)
+        logger.error(f"Internal error while exporting {table}: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error while processing request.")
+    return FileResponse(path, media_type=media_type, filename=f"{table}_{start_date}_{end_date}.{extension}",
+                        background=BackgroundTask(os.remove, path))
+
+@router.get("/sales/dashboard", response_model=Dict[str, Any])
+async def sales_dashboard(start_date: Optional[str] = None, end_date: Optional[str] = None, window: Optional[str] = None) -> Dict[str, Any]:
+    start_date, end_date = resolve_date_range(start_date, end_date, window)
+    return await get_dashboard(start_date, end_date)
+
+@router.post("/sales/batch", response_model=BatchQueryOut)
+async def sales_batch(batch: BatchQueryIn, db: AsyncSession = Depends(get_db)) -> BatchQueryOut:
+    queries = [(item.metric, item.start_date, item.end_date) for item in batch.queries]
+    try:
+        results = await run_batch(db, queries)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Internal error while running batch query: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error while processing request.")
+    return BatchQueryOut(results=[
+        BatchQueryResult(**item.model_dump(), result=result) for item, result in zip(batch.queries, results)
+    ])
+
+@router.get("/sales/cache-stats", response_model=Dict[str, Any])
+async def sales_cache_stats() -> Dict[str, Any]:
+    return {
+        **result_cache.stats(), "single_flight": coalescer.stats(),
+        "window_results": window_results.stats(), "sales_cube": sales_cube.stats(),
+    }
+
+async def ingest_sales(sales: List[SaleIn], durability: Optional[str], response: Response) -> SalesAccepted:
+    durability = durability or INGEST_DURABILITY
+    payload = [sale.model_dump() for sale in sales]
+    try:
+        sale_ids = await sales_write_buffer.submit(payload, wait=durability == "committed")
+    except BufferFullError as e:
+        logger.warning(f"Sales buffer full: {e}")
+        raise HTTPException(status_code=503, detail="Sales buffer is full, retry later.",
+                            headers={"Retry-After": str(max(1, round(sales_write_buffer.flush_interval)))})
+    except IntegrityError as e:
+        logger.info(f"Rejected sales with unknown user or product: {e}")
+        raise HTTPException(status_code=422, detail="Unknown user or product, or datetime without a partition.")
+    except Exception as e:
+        logger.error(f"Internal error while writing sales: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error while processing request.")
+
+    if sale_ids is None:
+        response.status_code = 202
+        return SalesAccepted(status="buffered", accepted=len(payload))
+    return SalesAccepted(status="committed", accepted=len(sale_ids), sale_ids=sale_ids)
+
+@router.post("/sales", response_model=SalesAccepted, status_code=201)
+async def create_sale(sale: SaleIn, response: Response,
+                      durability: Optional[str] = Query(None, pattern="^(committed|buffered)$")) -> SalesAccepted:
+    return await ingest_sales([sale], durability, response)
+
+@router.post("/sales/bulk", response_model=SalesAccepted, status_code=201)
+async def create_sales_bulk(bulk: BulkSalesIn, response: Response,
+                            durability: Optional[str] = Query(None, pattern="^(committed|buffered)$")) -> SalesAccepted:
+    return await ingest_sales(bulk.sales, durability, response)
+
+@router.get("/sales/ingest-stats", response_model=Dict[str, Any])
+async def sales_ingest_stats() -> Dict[str, Any]:
+    return sales_write_buffer.stats()
@@ -1 +1,2 @@
-from .database import SessionLocal, Base, engine, DATABASE_URL
\ No newline at end of file
+from .database import SessionLocal, AsyncSessionLocal, Base, engine, async_engine, DATABASE_URL, ASYNC_DATABASE_URL
+from .slow_query_log import slow_query_log
\ No newline at end of file
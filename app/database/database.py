@@ -1,8 +1,12 @@
 import os
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
+from app.database.pool import TimedQueuePool, TimedAsyncAdaptedQueuePool
+from app.database.slow_query_log import slow_query_log
+from app.logger import logger
 
 load_dotenv(dotenv_path=".env", override=True)
 
@@ -11,11 +15,59 @@ DATABASE_URL = (
     f"@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
 )
 
-# conexão com o banco
-engine = create_engine(DATABASE_URL, 
-                       pool_size=200, 
-                       max_overflow=800, 
-                       pool_timeout=30, 
+ASYNC_DATABASE_URL = (
+    f"postgresql+asyncpg://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}"
+    f"@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
+)
+
+# Orçamento de conexões: no pior caso cada engine abre pool_size + max_overflow
+# conexões em cada processo da API. DB_MAX_CONNECTIONS é o total para todos os
+# WEB_CONCURRENCY workers, abaixo do max_connections do Postgres (1000 no
+# docker-compose) com folga para migrations, CLIs, o seed e os engines sem pool
+# do pré-cálculo das janelas. O pool assíncrono acompanha o controle de admissão
+# (64 vagas por processo), que é quem de fato limita as consultas das rotas.
+DB_SYNC_POOL_SIZE = int(os.getenv("DB_SYNC_POOL_SIZE", "10"))
+DB_SYNC_MAX_OVERFLOW = int(os.getenv("DB_SYNC_MAX_OVERFLOW", "10"))
+DB_ASYNC_POOL_SIZE = int(os.getenv("DB_ASYNC_POOL_SIZE", "64"))
+DB_ASYNC_MAX_OVERFLOW = int(os.getenv("DB_ASYNC_MAX_OVERFLOW", "16"))
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", "900"))
+WEB_CONCURRENCY = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+
+# conexão com o banco (jobs, migrations e scripts); as rotas usam o engine assíncrono
+engine = create_engine(DATABASE_URL,
+                       poolclass=TimedQueuePool,
+                       pool_size=DB_SYNC_POOL_SIZE,
+                       max_overflow=DB_SYNC_MAX_OVERFLOW,
+                       pool_timeout=30,
                        pool_recycle=3600)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# conexão assíncrona usada pelas rotas da API
+async_engine = create_async_engine(ASYNC_DATABASE_URL,
+                                   poolclass=TimedAsyncAdaptedQueuePool,
+                                   pool_size=DB_ASYNC_POOL_SIZE,
+                                   max_overflow=DB_ASYNC_MAX_OVERFLOW,
+                                   pool_timeout=30,
+                                   pool_recycle=3600)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
+
+def check_connection_budget(pool_connections: int, max_connections: int = DB_MAX_CONNECTIONS,
+                            workers: int = WEB_CONCURRENCY) -> bool:
+    """ Avisa quando os pools de um processo passam da sua parte do orçamento de conexões. """
+    per_worker = max_connections // workers
+    if pool_connections > per_worker:
+        logger.warning(
+            f"Database pools can open {pool_connections} connections per process, above "
+            f"DB_MAX_CONNECTIONS={max_connections} / WEB_CONCURRENCY={workers} = {per_worker}."
+        )
+        return False
+    return True
+
+
+check_connection_budget(DB_SYNC_POOL_SIZE + DB_SYNC_MAX_OVERFLOW + DB_ASYNC_POOL_SIZE + DB_ASYNC_MAX_OVERFLOW)
+
+# Log de consultas lentas; o EXPLAIN amostrado roda pelo engine síncrono
+slow_query_log.install(engine, "sync")
+slow_query_log.install(async_engine.sync_engine, "async")
+slow_query_log.explain_engine = engine
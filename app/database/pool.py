@@ -0,0 +1,32 @@
+import time
+from typing import Callable, List
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# Funções chamadas a cada checkout com (pool, segundos de espera, timeout?)
+pool_wait_observers: List[Callable[[object, float, bool], None]] = []
+
+
+class TimedPoolMixin:
+    """ Mede quanto tempo cada checkout esperou por uma conexão livre do pool. """
+
+    def _do_get(self):
+        started = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            timed_out = True
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            for observer in pool_wait_observers:
+                observer(self, waited, timed_out)
+
+
+class TimedQueuePool(TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedAsyncAdaptedQueuePool(TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
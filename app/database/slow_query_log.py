@@ -0,0 +1,149 @@
+import json
+import os
+import random
+import re
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from threading import Lock
+from typing import Any, Dict, List, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.logger import logger
+from app.utils.sql_utils import sql_shape
+
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "500"))
+SLOW_QUERY_BUFFER_SIZE = int(os.getenv("SLOW_QUERY_BUFFER_SIZE", "200"))
+SLOW_QUERY_EXPLAIN_SAMPLE_RATE = float(os.getenv("SLOW_QUERY_EXPLAIN_SAMPLE_RATE", "0.1"))
+SLOW_QUERY_EXPLAIN_TIMEOUT_MS = int(os.getenv("SLOW_QUERY_EXPLAIN_TIMEOUT_MS", "30000"))
+SLOW_QUERY_LOG_FILE = os.getenv("SLOW_QUERY_LOG_FILE") or None
+
+# Conexões marcadas com esta chave (as do próprio EXPLAIN) não são registradas
+SKIP_KEY = "slow_query_log_skip"
+
+READ_ONLY_STATEMENT = re.compile(r"^\s*(SELECT|WITH)\b", re.IGNORECASE)
+WRITE_KEYWORDS = re.compile(r"\b(INSERT|UPDATE|DELETE|MERGE|CREATE|DROP|ALTER|TRUNCATE|REFRESH)\b", re.IGNORECASE)
+
+
+def is_read_only(statement: str) -> bool:
+    """ EXPLAIN ANALYZE executa a consulta, então só é aplicado a SELECTs sem escrita. """
+    return bool(READ_ONLY_STATEMENT.match(statement)) and not WRITE_KEYWORDS.search(statement)
+
+
+def to_pyformat(statement: str, parameters: Any):
+    """ Converte o SQL do asyncpg ($1, $2...) para o formato do psycopg2, usado no EXPLAIN. """
+    if isinstance(parameters, dict):
+        return statement, parameters
+    converted = re.sub(r"\$(\d+)", r"%(p\1)s", statement.replace("%", "%%"))
+    return converted, {f"p{position}": value for position, value in enumerate(parameters or (), start=1)}
+
+
+def _json_safe(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {str(key): _json_safe(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_safe(item) for item in value]
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+class SlowQueryLog:
+    """ Registra as instruções mais lentas que `threshold_ms` em um buffer circular.
+
+    Uma amostra das consultas somente leitura recebe o plano de
+    EXPLAIN (ANALYZE, BUFFERS), executado em uma thread separada, em uma
+    transação desfeita ao final, pelo engine definido em `explain_engine`.
+    """
+
+    def __init__(self, threshold_ms: float = SLOW_QUERY_THRESHOLD_MS, max_entries: int = SLOW_QUERY_BUFFER_SIZE,
+                 explain_sample_rate: float = SLOW_QUERY_EXPLAIN_SAMPLE_RATE,
+                 log_file: Optional[str] = SLOW_QUERY_LOG_FILE):
+        self.threshold_ms = threshold_ms
+        self.explain_sample_rate = explain_sample_rate
+        self.log_file = log_file
+        self.explain_engine: Optional[Engine] = None
+        self._entries: deque = deque(maxlen=max_entries)
+        self._lock = Lock()
+        self._explaining = False
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-query-explain")
+
+    def install(self, engine: Engine, label: str) -> None:
+        """ Registra os eventos em `engine` (para engines assíncronos use `.sync_engine`). """
+
+        # Início guardado no contexto da execução: comandos que falham não deixam resto na conexão
+        @event.listens_for(engine, "before_cursor_execute")
+        def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            context.slow_query_started_at = time.perf_counter()
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            duration_ms = (time.perf_counter() - context.slow_query_started_at) * 1000
+            if duration_ms >= self.threshold_ms and not conn.info.get(SKIP_KEY):
+                self.record(label, statement, parameters, duration_ms, executemany)
+
+    def record(self, label: str, statement: str, parameters: Any, duration_ms: float,
+               executemany: bool = False) -> Dict[str, Any]:
+        entry = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "engine": label,
+            "shape": sql_shape(statement),
+            "statement": statement,
+            "parameters": {"rows": len(parameters)} if executemany else _json_safe(parameters),
+            "duration_ms": round(duration_ms, 2),
+            "explain": None,
+        }
+        logger.warning(f"Slow query ({entry['duration_ms']} ms, {label}): {entry['shape']}")
+        with self._lock:
+            self._entries.append(entry)
+            sample = (not executemany and self.explain_engine is not None and not self._explaining
+                      and is_read_only(statement) and random.random() < self.explain_sample_rate)
+            if sample:
+                self._explaining = True
+        if sample:
+            self._executor.submit(self._explain, entry, statement, parameters)
+        else:
+            self._write(entry)
+        return entry
+
+    def _explain(self, entry: Dict[str, Any], statement: str, parameters: Any) -> None:
+        try:
+            sql, params = to_pyformat(statement, parameters)
+            with self.explain_engine.connect() as conn:
+                conn.info[SKIP_KEY] = True
+                try:
+                    conn.exec_driver_sql(f"SET LOCAL statement_timeout = {SLOW_QUERY_EXPLAIN_TIMEOUT_MS}")
+                    rows = conn.exec_driver_sql("EXPLAIN (ANALYZE, BUFFERS) " + sql, params).scalars().all()
+                    entry["explain"] = "\n".join(rows)
+                finally:
+                    conn.rollback()
+                    conn.info.pop(SKIP_KEY, None)
+        except Exception as e:
+            entry["explain"] = f"EXPLAIN failed: {e}"
+        finally:
+            with self._lock:
+                self._explaining = False
+            self._write(entry)
+
+    def _write(self, entry: Dict[str, Any]) -> None:
+        if not self.log_file:
+            return
+        try:
+            with self._lock, open(self.log_file, "a") as log_file:
+                log_file.write(json.dumps(entry, default=str) + "\n")
+        except OSError as e:
+            logger.error(f"Error writing slow query log: {e}")
+
+    def entries(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """ Entradas mais recentes primeiro. """
+        with self._lock:
+            items = list(reversed(self._entries))
+        return [dict(item) for item in items[:limit]]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+slow_query_log = SlowQueryLog()
@@ -1,2 +1,5 @@
-from .refresh_materialized_view import start_scheduler
-from .refresh_aggregated_table import start_aggregated_table_scheduler, update_product_sales_aggregated, update_category_revenue_aggregated, update_top_customers_aggregated
\ No newline at end of file
+from .refresh_aggregated_table import start_aggregated_table_scheduler, refresh_aggregated_tables, refresh_aggregates_and_windows
+from .precompute_windows import refresh_window_results
+from .manage_partitions import manage_partitions, start_partition_scheduler
+from .backfill_aggregated_tables import backfill_aggregated_tables
+from .warmup import start_warmup, warm_up, warmup_state
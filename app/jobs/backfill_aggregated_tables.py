@@ -0,0 +1,249 @@
+"""Recálculo das tabelas de agregação em paralelo, uma partição mensal de `sales` por tarefa.
+
+Exemplos:
+    python -m app.jobs.backfill_aggregated_tables
+    python -m app.jobs.backfill_aggregated_tables --start-date 2024-01-01 --end-date 2024-12-31 --workers 8
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.jobs.job_runner import AGGREGATES_LOCK, job_runner
+from app.jobs.manage_partitions import add_months, list_partitions
+from app.jobs.refresh_aggregated_table import (
+    AGGREGATED_TABLES, FAN_OUT, refresh_top_candidates, stage_changed_sales, timed_stage
+)
+from app.logger import logger
+from app.metrics import track_job
+from app.services.result_cache import result_cache
+from app.services.rollup import ROLLUP_COLUMNS
+
+BACKFILL_WORKERS = int(os.getenv("BACKFILL_WORKERS", str(os.cpu_count() or 4)))
+
+
+def partition_ranges(db: Session, start: Optional[date] = None, end: Optional[date] = None) -> List[Tuple[str, date, date]]:
+    """ Intervalos [início, fim) de cada partição de `sales`, recortados por `start`..`end` (inclusivo). """
+    ranges = []
+    for partition in list_partitions(db):
+        range_start, range_end = partition["range_start"], partition["range_end"]
+        if range_start is None:
+            continue
+        if start is not None:
+            range_start = max(range_start, start)
+        if end is not None:
+            range_end = min(range_end, end + timedelta(days=1))
+        if range_start < range_end:
+            ranges.append((partition["name"], range_start, range_end))
+    return ranges
+
+
+def changed_partition_ranges(db: Session, dates: List[date]) -> List[Tuple[str, date, date]]:
+    """ Só as partições que contêm alguma das `dates`, recortadas da primeira à última delas.
+
+    Datas fora das partições mensais (partição default ou limites não reconhecidos)
+    ficam de fora; cabe ao refresh incremental tratá-las.
+    """
+    ranges = []
+    for name, range_start, range_end in partition_ranges(db):
+        inside = [d for d in dates if range_start <= d < range_end]
+        if inside:
+            ranges.append((name, min(inside), max(inside) + timedelta(days=1)))
+    return ranges
+
+
+def months_between(range_start: date, range_end: date) -> List[date]:
+    """ Primeiro dia de cada mês que intersecta [range_start, range_end). """
+    months = []
+    month = range_start.replace(day=1)
+    while month < range_end:
+        months.append(month)
+        month = add_months(month, 1)
+    return months
+
+
+def rebuild_monthly_rollups(db: Session, aggregate: str, range_start: date, range_end: date) -> int:
+    """ Recalcula do zero os meses do intervalo no rollup mensal de `aggregate`. """
+    key, label, measure = ROLLUP_COLUMNS[aggregate]
+    dimensions = f"{key}, {label}" if label else key
+    label_select = f"MAX({label}), " if label else ""
+    months = {"month_start": range_start.replace(day=1), "month_end": add_months(range_end - timedelta(days=1), 1)}
+    db.execute(text(f"""
+        DELETE FROM {aggregate}_monthly
+        WHERE sale_date >= :month_start AND sale_date < :month_end;
+    """), months)
+    return db.execute(text(f"""
+        INSERT INTO {aggregate}_monthly (sale_date, {dimensions}, {measure})
+        SELECT date_trunc('month', sale_date)::date, {key}, {label_select}SUM({measure})
+        FROM {aggregate}
+        WHERE sale_date >= :month_start AND sale_date < :month_end
+        GROUP BY 1, {key}
+        HAVING SUM({measure}) <> 0;
+    """), months).rowcount
+
+
+def rebuild_sales_counters(db: Session, range_start: date, range_end: date) -> int:
+    """ Recalcula o contador mensal de vendas dos meses do intervalo a partir do rollup mensal por cliente. """
+    months = {"month_start": range_start.replace(day=1), "month_end": add_months(range_end - timedelta(days=1), 1)}
+    db.execute(text("""
+        DELETE FROM sales_counter_monthly
+        WHERE sale_date >= :month_start AND sale_date < :month_end;
+    """), months)
+    return db.execute(text("""
+        INSERT INTO sales_counter_monthly (sale_date, total_sales)
+        SELECT sale_date, SUM(total_purchases)
+        FROM customer_purchases_aggregated_monthly
+        WHERE sale_date >= :month_start AND sale_date < :month_end
+        GROUP BY sale_date
+        HAVING SUM(total_purchases) <> 0;
+    """), months).rowcount
+
+
+def rebuild_yearly_rollups(db: Session, aggregate: str, years: List[date]) -> int:
+    """ Recalcula os anos informados no rollup anual a partir do rollup mensal. """
+    key, label, measure = ROLLUP_COLUMNS[aggregate]
+    dimensions = f"{key}, {label}" if label else key
+    label_select = f"MAX({label}), " if label else ""
+    db.execute(text(f"DELETE FROM {aggregate}_yearly WHERE sale_date = ANY(:years);"), {"years": years})
+    return db.execute(text(f"""
+        INSERT INTO {aggregate}_yearly (sale_date, {dimensions}, {measure})
+        SELECT date_trunc('year', sale_date)::date, {key}, {label_select}SUM({measure})
+        FROM {aggregate}_monthly
+        WHERE date_trunc('year', sale_date)::date = ANY(:years)
+        GROUP BY 1, {key}
+        HAVING SUM({measure}) <> 0;
+    """), {"years": years}).rowcount
+
+
+def backfill_partition(name: str, range_start: date, range_end: date) -> Dict[str, Any]:
+    """ Recalcula as agregações diárias e mensais de uma partição em uma transação própria.
+
+    Cada tarefa escreve apenas linhas do seu intervalo, então as tarefas não
+    disputam locks; o rollup anual é montado depois, a partir dos meses.
+    """
+    dates = [range_start + timedelta(days=offset) for offset in range((range_end - range_start).days)]
+    rows: Dict[str, int] = {}
+    started = time.perf_counter()
+
+    db = SessionLocal()
+    try:
+        # As datas recalculadas aqui não precisam mais passar pelo refresh incremental
+        db.execute(text("""
+            DELETE FROM aggregate_changed_dates
+            WHERE sale_date >= :range_start AND sale_date < :range_end;
+        """), {"range_start": range_start, "range_end": range_end})
+        rows["staging"] = stage_changed_sales(db, dates)
+        for aggregate in AGGREGATED_TABLES:
+            rows[aggregate] = FAN_OUT[aggregate](db, dates)
+            rows[f"{aggregate}_monthly"] = rebuild_monthly_rollups(db, aggregate, range_start, range_end)
+        rows["sales_counter_monthly"] = rebuild_sales_counters(db, range_start, range_end)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    return {"partition": name, "dates": len(dates), "rows": rows,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)}
+
+
+@track_job("backfill_aggregated_tables")
+def backfill_aggregated_tables(start: Optional[date] = None, end: Optional[date] = None,
+                               workers: int = BACKFILL_WORKERS, dates: Optional[List[date]] = None) -> Dict[str, Any]:
+    """ Recalcula as agregações de `start` a `end` (todas as partições, por padrão).
+
+    Com `dates`, recalcula apenas as partições que contêm essas datas, como faz
+    o refresh quando recebe muitas datas alteradas espalhadas no tempo.
+
+    As partições são processadas em paralelo por até `workers` conexões. Uma
+    partição que falha não desfaz as demais; como cada tarefa é idempotente,
+    basta executar de novo o mesmo intervalo.
+    """
+    if dates is not None:
+        logger.info(f"Backfilling aggregation tables for {len(dates)} changed dates with {workers} workers...")
+    else:
+        logger.info(f"Backfilling aggregation tables from {start or 'the first partition'} to {end or 'the last partition'} "
+                    f"with {workers} workers...")
+    timings: Dict[str, float] = {}
+    rows: Dict[str, int] = {}
+    errors: List[str] = []
+    done: List[Tuple[date, date]] = []
+
+    with timed_stage(timings, "total"):
+        db = SessionLocal()
+        try:
+            ranges = changed_partition_ranges(db, dates) if dates is not None else partition_ranges(db, start, end)
+        finally:
+            db.close()
+
+        with timed_stage(timings, "partitions"), ThreadPoolExecutor(max_workers=workers,
+                                                                    thread_name_prefix="backfill") as executor:
+            futures = {executor.submit(backfill_partition, *item): item for item in ranges}
+            for future in as_completed(futures):
+                name, range_start, range_end = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.error(f"Error backfilling partition {name}: {e}")
+                    errors.append(f"{name}: {e}")
+                    continue
+                done.append((range_start, range_end))
+                timings[name] = result["elapsed_ms"]
+                for table, count in result["rows"].items():
+                    rows[table] = rows.get(table, 0) + count
+
+        months = sorted({month for range_start, range_end in done for month in months_between(range_start, range_end)})
+        if months:
+            years = sorted({month.replace(month=1) for month in months})
+            with timed_stage(timings, "yearly"):
+                db = SessionLocal()
+                try:
+                    for aggregate in AGGREGATED_TABLES:
+                        rows[f"{aggregate}_yearly"] = rebuild_yearly_rollups(db, aggregate, years)
+                    rows["customer_top_candidates"] = refresh_top_candidates(db, months)
+                    db.commit()
+                except Exception as e:
+                    db.rollback()
+                    logger.error(f"Error rebuilding yearly rollups: {e}")
+                    errors.append(f"yearly: {e}")
+                finally:
+                    db.close()
+            for aggregate in AGGREGATED_TABLES + ("sales_counter_monthly",):
+                result_cache.invalidate(aggregate)
+
+    total_dates = sum((range_end - range_start).days for range_start, range_end in done)
+    logger.info(f"Backfilled {len(done)} of {len(ranges)} partitions ({total_dates} dates). Timings (ms): {timings}. Rows: {rows}")
+    result = {"dates": total_dates, "partitions": len(done), "timings_ms": timings, "rows": rows}
+    if errors:
+        result["error"] = "; ".join(errors)
+    return result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.jobs.backfill_aggregated_tables",
+                                     description="Recalcula as tabelas de agregação em paralelo por partição.")
+    parser.add_argument("--start-date", type=date.fromisoformat)
+    parser.add_argument("--end-date", type=date.fromisoformat)
+    parser.add_argument("--workers", type=int, default=BACKFILL_WORKERS)
+    args = parser.parse_args()
+
+    # Mesmo lock do refresh agendado: os dois nunca gravam as agregações ao mesmo tempo
+    result = job_runner.run_exclusive("backfill_aggregated_tables", backfill_aggregated_tables,
+                                      args.start_date, args.end_date, args.workers, lock=AGGREGATES_LOCK)
+    if result is None:
+        print("The aggregated tables are being refreshed elsewhere; try again later.")
+        return 1
+    print(f"partitions: {result['partitions']}  dates: {result['dates']}  total: {result['timings_ms']['total']} ms")
+    if "error" in result:
+        print(f"errors: {result['error']}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
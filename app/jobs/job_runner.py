@@ -0,0 +1,268 @@
+import json
+import os
+import socket
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set
+from apscheduler.schedulers.background import BackgroundScheduler
+from sqlalchemy import Connection, Engine, text
+from app.database import engine
+from app.logger import logger
+from app.services.result_cache import result_cache
+from app.services.sales_cube import sales_cube
+from app.services.window_results import window_results
+
+JOB_LEADER_POLL_SECONDS = float(os.getenv("JOB_LEADER_POLL_SECONDS", "15"))
+
+# Primeira chave de todos os advisory locks do runner; a segunda identifica o lock
+ADVISORY_LOCK_NAMESPACE = 73011
+LEADER_LOCK = "leader"
+AGGREGATES_LOCK = "aggregated_tables"
+
+# Caches que ficam desatualizados quando o job termina em outro processo
+JOB_CACHE_SOURCES: Dict[str, tuple] = {
+    "refresh_aggregated_tables": (
+        "product_sales_aggregated", "category_revenue_aggregated",
+        "customer_purchases_aggregated", "sales_counter_monthly",
+    ),
+    "backfill_aggregated_tables": (
+        "product_sales_aggregated", "category_revenue_aggregated",
+        "customer_purchases_aggregated", "sales_counter_monthly",
+    ),
+}
+
+
+def try_advisory_lock(connection: Connection, name: str) -> bool:
+    acquired = connection.execute(
+        text("SELECT pg_try_advisory_lock(:namespace, hashtext(:name));"),
+        {"namespace": ADVISORY_LOCK_NAMESPACE, "name": name},
+    ).scalar()
+    # O lock é de sessão: a transação não precisa ficar aberta enquanto ele vale
+    connection.commit()
+    return bool(acquired)
+
+
+def advisory_unlock(connection: Connection, name: str) -> None:
+    connection.execute(
+        text("SELECT pg_advisory_unlock(:namespace, hashtext(:name));"),
+        {"namespace": ADVISORY_LOCK_NAMESPACE, "name": name},
+    )
+    connection.commit()
+
+
+def job_rows(result: Any) -> Any:
+    """ Mesmo formato aceito por track_job: {"rows": {tabela: n}} ou um inteiro. """
+    return result.get("rows") if isinstance(result, dict) else result
+
+
+class JobRunner:
+    """ Executa os jobs agendados em um único processo entre todos os workers e réplicas.
+
+    Todo processo agenda os mesmos jobs, mas só o líder, o processo que
+    detém o advisory lock LEADER_LOCK em uma conexão dedicada, os executa.
+    A cada `poll_seconds` os demais tentam assumir a liderança (se o líder
+    cair, o Postgres libera o lock junto com a conexão) e leem `job_history`
+    para invalidar os próprios caches com o que o líder recalculou.
+
+    Cada execução também segura o lock do job (ou do grupo em `lock`), então
+    a mesma tarefa nunca roda em paralelo, nem pela CLI, e fica registrada em
+    `job_history` com início, fim, duração e linhas afetadas.
+    """
+
+    def __init__(self, bind: Engine = engine, poll_seconds: float = JOB_LEADER_POLL_SECONDS):
+        self.bind = bind
+        self.poll_seconds = poll_seconds
+        self.instance = f"{socket.gethostname()}:{os.getpid()}"
+        self._scheduler: Optional[BackgroundScheduler] = None
+        self._leader_connection: Optional[Connection] = None
+        self._last_seen_run: Optional[int] = None
+        # Execuções de outros processos vistas ainda em andamento: o id é dado no início, não no fim
+        self._running_runs: Set[int] = set()
+
+    @property
+    def is_leader(self) -> bool:
+        return self._leader_connection is not None
+
+    def _drop_leadership(self) -> None:
+        if self._leader_connection is not None:
+            try:
+                self._leader_connection.invalidate()
+                self._leader_connection.close()
+            except Exception:
+                pass
+        self._leader_connection = None
+
+    def elect(self) -> bool:
+        """ Confirma a liderança (a conexão ainda responde) ou tenta assumi-la. """
+        if self._leader_connection is not None:
+            try:
+                self._leader_connection.execute(text("SELECT 1;"))
+                self._leader_connection.commit()
+                return True
+            except Exception as e:
+                logger.warning(f"Lost the job leader connection ({e}); leadership released.")
+                self._drop_leadership()
+
+        connection = self.bind.connect()
+        try:
+            if try_advisory_lock(connection, LEADER_LOCK):
+                self._leader_connection = connection
+                logger.info(f"{self.instance} is now the job leader.")
+                return True
+        except Exception as e:
+            logger.warning(f"Job leader election failed: {e}")
+        connection.close()
+        return False
+
+    def resign(self) -> None:
+        if self._leader_connection is not None:
+            try:
+                advisory_unlock(self._leader_connection, LEADER_LOCK)
+                self._leader_connection.close()
+            except Exception as e:
+                logger.warning(f"Error releasing job leadership: {e}")
+            self._leader_connection = None
+            logger.info(f"{self.instance} resigned as job leader.")
+
+    @contextmanager
+    def _history(self, job: str) -> Iterator[Dict[str, Any]]:
+        """ Registra a execução em job_history; o chamador preenche "result". """
+        with self.bind.connect() as connection:
+            run_id = connection.execute(text("""
+                INSERT INTO job_history (job, instance, status, started_at)
+                VALUES (:job, :instance, 'running', LOCALTIMESTAMP)
+                RETURNING id;
+            """), {"job": job, "instance": self.instance}).scalar()
+            connection.commit()
+
+        run: Dict[str, Any] = {"id": run_id, "result": None}
+        started = time.perf_counter()
+        status, error = "success", None
+        try:
+            yield run
+            if isinstance(run["result"], dict) and run["result"].get("error"):
+                status, error = "error", str(run["result"]["error"])
+        except Exception as e:
+            status, error = "error", str(e)
+            raise
+        finally:
+            with self.bind.connect() as connection:
+                connection.execute(text("""
+                    UPDATE job_history
+                    SET status = :status, finished_at = LOCALTIMESTAMP, duration_ms = :duration_ms,
+                        rows_affected = CAST(:rows AS JSONB), error = :error
+                    WHERE id = :id;
+                """), {
+                    "id": run_id, "status": status, "error": error,
+                    "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+                    "rows": json.dumps(job_rows(run["result"])),
+                })
+                connection.commit()
+
+    def run_exclusive(self, job: str, func: Callable, *args, lock: Optional[str] = None, **kwargs) -> Any:
+        """ Executa `func` se ninguém estiver com o lock do job; caso contrário pula e devolve None. """
+        lock = lock or job
+        connection = self.bind.connect()
+        try:
+            if not try_advisory_lock(connection, lock):
+                logger.info(f"Skipping {job}: {lock} is locked by another run.")
+                return None
+            try:
+                with self._history(job) as run:
+                    run["result"] = func(*args, **kwargs)
+                return run["result"]
+            finally:
+                advisory_unlock(connection, lock)
+        finally:
+            connection.close()
+
+    def run_as_leader(self, job: str, func: Callable, lock: Optional[str] = None) -> Any:
+        if not self.elect():
+            logger.debug(f"Skipping {job}: {self.instance} is not the job leader.")
+            return None
+        return self.run_exclusive(job, func, lock=lock)
+
+    def sync_caches(self) -> List[str]:
+        """ Invalida os caches locais pelas execuções concluídas em outros processos.
+
+        Um job longo pode terminar depois de outro que começou mais tarde, então
+        além dos ids acima do último visto são reconsultadas as execuções que
+        ainda estavam em andamento na leitura anterior.
+        """
+        with self.bind.connect() as connection:
+            if self._last_seen_run is None:
+                self._last_seen_run = connection.execute(text("SELECT COALESCE(MAX(id), 0) FROM job_history;")).scalar()
+                self._running_runs = {row[0] for row in connection.execute(text("""
+                    SELECT id FROM job_history
+                    WHERE id <= :last_seen AND status = 'running' AND instance <> :instance;
+                """), {"last_seen": self._last_seen_run, "instance": self.instance}).fetchall()}
+                return []
+            runs = connection.execute(text("""
+                SELECT id, job, status FROM job_history
+                WHERE (id > :last_seen OR id = ANY(:running)) AND instance <> :instance
+                ORDER BY id;
+            """), {
+                "last_seen": self._last_seen_run, "running": sorted(self._running_runs), "instance": self.instance,
+            }).fetchall()
+
+        jobs = []
+        sources = set()
+        for run_id, job, status in runs:
+            self._last_seen_run = max(self._last_seen_run, run_id)
+            if status == "running":
+                self._running_runs.add(run_id)
+                continue
+            self._running_runs.discard(run_id)
+            if status == "success":
+                sources.update(JOB_CACHE_SOURCES.get(job, ()))
+                jobs.append(job)
+        for source in sorted(sources):
+            result_cache.invalidate(source)
+        if jobs:
+            # As janelas pré-calculadas voltam a ser lidas da tabela
+            window_results.load([])
+        if sources:
+            sales_cube.reload()
+        return jobs
+
+    def _heartbeat(self) -> None:
+        try:
+            self.elect()
+            self.sync_caches()
+        except Exception as e:
+            logger.error(f"Job runner heartbeat failed: {e}")
+
+    def add_job(self, job: str, func: Callable, trigger: str, lock: Optional[str] = None, **trigger_args) -> None:
+        """ Agenda `func` neste processo; ela só executa de fato no líder. """
+        self.start()
+        self._scheduler.add_job(
+            self.run_as_leader, trigger, args=(job, func, lock), id=job,
+            replace_existing=True, max_instances=1, coalesce=True, **trigger_args,
+        )
+
+    def start(self) -> None:
+        if self._scheduler is None:
+            self._scheduler = BackgroundScheduler()
+            self._scheduler.add_job(self._heartbeat, "interval", seconds=self.poll_seconds, id="job_runner_heartbeat",
+                                    max_instances=1, coalesce=True)
+            self._scheduler.start()
+
+    def shutdown(self) -> None:
+        if self._scheduler is not None:
+            self._scheduler.shutdown(wait=False)
+            self._scheduler = None
+        self.resign()
+
+    def history(self, limit: int = 50, job: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self.bind.connect() as connection:
+            rows = connection.execute(text("""
+                SELECT id, job, instance, status, started_at, finished_at, duration_ms, rows_affected, error
+                FROM job_history
+                WHERE CAST(:job AS TEXT) IS NULL OR job = :job
+                ORDER BY id DESC
+                LIMIT :limit;
+            """), {"job": job, "limit": limit}).mappings().all()
+        return [dict(row) for row in rows]
+
+
+job_runner = JobRunner()
@@ -0,0 +1,245 @@
+"""Manutenção das partições mensais da tabela `sales`.
+
+Exemplos:
+    python -m app.jobs.manage_partitions --report
+    python -m app.jobs.manage_partitions --months-ahead 6
+    python -m app.jobs.manage_partitions --retention-months 48 --archive-mode merge
+"""
+import argparse
+import os
+import re
+from datetime import date
+from typing import Any, Dict, List, Optional
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.jobs.job_runner import job_runner
+from app.logger import logger
+from app.metrics import track_job
+
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+# 0 mantém todas as partições anexadas
+PARTITION_RETENTION_MONTHS = int(os.getenv("PARTITION_RETENTION_MONTHS", "0"))
+PARTITION_ARCHIVE_MODE = os.getenv("PARTITION_ARCHIVE_MODE", "detach")
+ARCHIVE_MODES = ("detach", "merge")
+
+BOUND_PATTERN = re.compile(r"FROM \('(\d{4}-\d{2}-\d{2})[^']*'\) TO \('(\d{4}-\d{2}-\d{2})[^']*'\)")
+
+
+def add_months(day: date, months: int) -> date:
+    """ Primeiro dia do mês deslocado `months` meses a partir do mês de `day`. """
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"sales_{month.year}_{month.month:02d}"
+
+
+def list_partitions(db: Session) -> List[Dict[str, Any]]:
+    """ Partições anexadas a `sales`, em ordem, com limites, tamanho e linhas estimadas. """
+    rows = db.execute(text("""
+        SELECT
+            c.relname,
+            pg_get_expr(c.relpartbound, c.oid),
+            pg_total_relation_size(c.oid),
+            GREATEST(c.reltuples, 0)::BIGINT
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'sales'::regclass;
+    """)).fetchall()
+
+    partitions = []
+    for name, bound, total_bytes, estimated_rows in rows:
+        match = BOUND_PATTERN.search(bound or "")
+        partitions.append({
+            "name": name,
+            "range_start": date.fromisoformat(match.group(1)) if match else None,
+            "range_end": date.fromisoformat(match.group(2)) if match else None,
+            "total_bytes": total_bytes,
+            "estimated_rows": estimated_rows,
+        })
+    return sorted(partitions, key=lambda p: (p["range_start"] is None, p["range_start"] or date.min))
+
+
+def attach_partition(db: Session, name: str, range_start: date, range_end: date) -> None:
+    """ Cria a tabela fora de `sales` e a anexa depois.
+
+    ATTACH PARTITION pega um lock mais fraco na tabela pai que CREATE TABLE
+    ... PARTITION OF, e o CHECK com os mesmos limites evita a varredura de
+    validação. Os índices de `sales` são criados na partição pelo ATTACH.
+    """
+    db.execute(text(f"CREATE TABLE IF NOT EXISTS {name} (LIKE sales INCLUDING DEFAULTS INCLUDING CONSTRAINTS);"))
+    db.execute(text(f"""
+        ALTER TABLE {name} ADD CONSTRAINT {name}_bounds
+        CHECK (datetime >= '{range_start}' AND datetime < '{range_end}');
+    """))
+    db.execute(text(f"""
+        ALTER TABLE sales ATTACH PARTITION {name}
+        FOR VALUES FROM ('{range_start}') TO ('{range_end}');
+    """))
+    db.execute(text(f"ALTER TABLE {name} DROP CONSTRAINT {name}_bounds;"))
+
+
+def create_future_partitions(db: Session, months_ahead: int = PARTITION_MONTHS_AHEAD,
+                             today: Optional[date] = None, dry_run: bool = False) -> List[str]:
+    """ Garante partições contínuas do fim da última partição até `months_ahead` meses à frente. """
+    today = today or date.today()
+    current = add_months(today, 0)
+
+    partitions = list_partitions(db)
+    covered_until = max((p["range_end"] for p in partitions if p["range_end"]), default=current)
+    return create_missing_partitions(db, min(covered_until, current), add_months(today, months_ahead + 1),
+                                     partitions, dry_run)
+
+
+def create_missing_partitions(db: Session, first_month: date, end_month: date,
+                              partitions: Optional[List[Dict[str, Any]]] = None, dry_run: bool = False) -> List[str]:
+    """ Cria as partições mensais que faltam do mês de `first_month` até antes de `end_month`. """
+    if partitions is None:
+        partitions = list_partitions(db)
+    month = add_months(first_month, 0)
+
+    created = []
+    while month < end_month:
+        if not _is_covered(partitions, month):
+            name = partition_name(month)
+            if not dry_run:
+                attach_partition(db, name, month, add_months(month, 1))
+            created.append(name)
+        month = add_months(month, 1)
+    return created
+
+
+def _is_covered(partitions: List[Dict[str, Any]], month: date) -> bool:
+    return any(p["range_start"] and p["range_start"] <= month < p["range_end"] for p in partitions)
+
+
+def archive_old_partitions(db: Session, retention_months: int = PARTITION_RETENTION_MONTHS,
+                           mode: str = PARTITION_ARCHIVE_MODE, today: Optional[date] = None,
+                           dry_run: bool = False) -> List[str]:
+    """ Trata as partições mensais anteriores a `retention_months` meses atrás.
+
+    - detach: desanexa as partições; as tabelas ficam no banco como arquivo.
+    - merge: junta os meses de cada ano fechado em uma única partição anual.
+
+    As tabelas de agregação não são afetadas: o DETACH não dispara os triggers do change log.
+    """
+    if retention_months <= 0:
+        return []
+    if mode not in ARCHIVE_MODES:
+        raise ValueError(f"Unknown archive mode '{mode}'. Use one of: {', '.join(ARCHIVE_MODES)}")
+
+    cutoff = add_months(today or date.today(), -retention_months)
+    monthly = [
+        p for p in list_partitions(db)
+        if p["range_start"] and p["range_end"] <= cutoff and p["range_end"] == add_months(p["range_start"], 1)
+    ]
+
+    if mode == "detach":
+        if not dry_run:
+            for partition in monthly:
+                db.execute(text(f"ALTER TABLE sales DETACH PARTITION {partition['name']};"))
+        return [partition["name"] for partition in monthly]
+
+    archived = []
+    years = sorted({p["range_start"].year for p in monthly if date(p["range_start"].year + 1, 1, 1) <= cutoff})
+    for year in years:
+        months = [p["name"] for p in monthly if p["range_start"].year == year]
+        if not dry_run:
+            merge_year(db, year, months)
+        archived.extend(months)
+    return archived
+
+
+def merge_year(db: Session, year: int, months: List[str]) -> None:
+    """ Substitui as partições mensais de `year` por uma partição anual `sales_<ano>`. """
+    name = f"sales_{year}"
+    db.execute(text(f"CREATE TABLE {name} (LIKE sales INCLUDING DEFAULTS INCLUDING CONSTRAINTS);"))
+    for month in months:
+        db.execute(text(f"INSERT INTO {name} SELECT * FROM {month};"))
+    for month in months:
+        db.execute(text(f"ALTER TABLE sales DETACH PARTITION {month};"))
+        db.execute(text(f"DROP TABLE {month};"))
+    attach_partition(db, name, date(year, 1, 1), date(year + 1, 1, 1))
+
+
+def partition_report(db: Session) -> List[Dict[str, Any]]:
+    return [
+        {**partition,
+         "range_start": partition["range_start"].isoformat() if partition["range_start"] else None,
+         "range_end": partition["range_end"].isoformat() if partition["range_end"] else None}
+        for partition in list_partitions(db)
+    ]
+
+
+@track_job("manage_partitions")
+def manage_partitions(months_ahead: int = PARTITION_MONTHS_AHEAD, retention_months: int = PARTITION_RETENTION_MONTHS,
+                      archive_mode: str = PARTITION_ARCHIVE_MODE, dry_run: bool = False) -> Dict[str, Any]:
+    """ Cria as partições futuras e arquiva as antigas em uma única transação. """
+    logger.info("Managing sales partitions...")
+    db = SessionLocal()
+    try:
+        created = create_future_partitions(db, months_ahead, dry_run=dry_run)
+        archived = archive_old_partitions(db, retention_months, archive_mode, dry_run=dry_run)
+        if dry_run:
+            db.rollback()
+        else:
+            db.commit()
+        partitions = partition_report(db)
+        logger.info(f"Sales partitions: {len(partitions)} attached, created {created}, archived ({archive_mode}) {archived}.")
+        return {"created": created, "archived": archived, "partitions": partitions}
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error managing sales partitions: {e}")
+        return {"created": [], "archived": [], "partitions": [], "error": str(e)}
+    finally:
+        db.close()
+
+
+def start_partition_scheduler():
+    """ Agenda a manutenção das partições no job runner: só o processo líder executa. """
+    job_runner.add_job("manage_partitions", manage_partitions, "cron", hour=2, minute=0)  # Roda todo dia às 02:00
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.jobs.manage_partitions",
+                                     description="Manutenção das partições mensais de sales.")
+    parser.add_argument("--months-ahead", type=int, default=PARTITION_MONTHS_AHEAD)
+    parser.add_argument("--retention-months", type=int, default=PARTITION_RETENTION_MONTHS,
+                        help="Meses mantidos anexados; 0 desativa o arquivamento.")
+    parser.add_argument("--archive-mode", choices=ARCHIVE_MODES, default=PARTITION_ARCHIVE_MODE)
+    parser.add_argument("--dry-run", action="store_true", help="Mostra o que seria feito sem alterar o banco.")
+    parser.add_argument("--report", action="store_true", help="Apenas lista as partições e seus tamanhos.")
+    args = parser.parse_args()
+
+    if args.report:
+        db = SessionLocal()
+        try:
+            partitions = partition_report(db)
+        finally:
+            db.close()
+    else:
+        if args.dry_run:
+            result = manage_partitions(args.months_ahead, args.retention_months, args.archive_mode, dry_run=True)
+        else:
+            result = job_runner.run_exclusive("manage_partitions", manage_partitions,
+                                              args.months_ahead, args.retention_months, args.archive_mode)
+            if result is None:
+                print("manage_partitions is already running elsewhere.")
+                return 1
+        if "error" in result:
+            return 1
+        print(f"created: {', '.join(result['created']) or '-'}")
+        print(f"archived: {', '.join(result['archived']) or '-'}")
+        partitions = result["partitions"]
+
+    print(f"{'partition':<16}{'from':>12}{'to':>12}{'rows':>14}{'size MB':>10}")
+    for partition in partitions:
+        print(f"{partition['name']:<16}{partition['range_start'] or '-':>12}{partition['range_end'] or '-':>12}"
+              f"{partition['estimated_rows']:>14}{partition['total_bytes'] / 1024 / 1024:>10.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
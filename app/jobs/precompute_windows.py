@@ -0,0 +1,96 @@
+import asyncio
+import inspect
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Any, Dict, List, Optional
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
+from app.database import ASYNC_DATABASE_URL, SessionLocal
+from app.logger import logger
+from app.metrics import track_job
+from app.services.sales_service import (
+    get_top_product, get_top_customer,
+    get_revenue_by_category, get_top_products, get_top_customers
+)
+from app.services.window_results import WindowRow, to_json, window_results
+from app.utils.date_utils import named_windows
+
+# Métricas por intervalo, com os parâmetros padrão dos endpoints. Só entram as
+# que já leem as tabelas agregadas; o total de vendas continua sendo ao vivo
+WINDOW_METRICS = {
+    "top-product": get_top_product,
+    "top-customer": get_top_customer,
+    "revenue-by-category": get_revenue_by_category,
+    "top-products": get_top_products,
+    "top-customers": get_top_customers,
+}
+
+
+async def compute_window_results(db: AsyncSession, today: Optional[date] = None) -> List[WindowRow]:
+    """ Calcula cada métrica para cada janela com as funções de serviço sem os decorators.
+
+    Resultados vazios (período sem dados ou erro) não são gravados: a
+    requisição cai na consulta normal.
+    """
+    rows: List[WindowRow] = []
+    for window, (start, end) in named_windows(today).items():
+        for metric, func in WINDOW_METRICS.items():
+            value = await inspect.unwrap(func)(db, start.isoformat(), end.isoformat())
+            if value is not None and value != []:
+                rows.append((window, metric, start, end, value))
+    return rows
+
+
+async def _compute_with_own_engine(today: Optional[date]) -> List[WindowRow]:
+    """ O job roda fora do event loop da API: usa um engine próprio, sem pool. """
+    engine = create_async_engine(ASYNC_DATABASE_URL, poolclass=NullPool)
+    try:
+        async with AsyncSession(engine) as db:
+            return await compute_window_results(db, today)
+    finally:
+        await engine.dispose()
+
+
+def save_window_results(rows: List[WindowRow]) -> int:
+    """ Substitui o conteúdo de window_results em uma transação. """
+    db = SessionLocal()
+    try:
+        db.execute(text("DELETE FROM window_results;"))
+        if rows:
+            db.execute(text("""
+                INSERT INTO window_results (window_name, metric, start_date, end_date, result, computed_at)
+                VALUES (:window, :metric, :start_date, :end_date, CAST(:result AS JSONB), now());
+            """), [
+                {"window": window, "metric": metric, "start_date": start, "end_date": end, "result": to_json(value)}
+                for window, metric, start, end, value in rows
+            ])
+        db.commit()
+        return len(rows)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+@track_job("refresh_window_results")
+def refresh_window_results(today: Optional[date] = None) -> Dict[str, Any]:
+    """ Pré-calcula as métricas das janelas conhecidas, grava na tabela e carrega em memória. """
+    logger.info("Precomputing results for the named date windows...")
+    try:
+        # Pode ser chamado de dentro de um event loop (startup): asyncio.run vai para outra thread
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            rows = executor.submit(asyncio.run, _compute_with_own_engine(today)).result()
+        saved = save_window_results(rows)
+        # Ida e volta pelo JSON: a memória guarda o mesmo valor que os outros processos leem da tabela
+        window_results.load(
+            (window, metric, start, end, json.loads(to_json(value)))
+            for window, metric, start, end, value in rows
+        )
+        logger.info(f"Precomputed {saved} window results.")
+        return {"rows": {"window_results": saved}}
+    except Exception as e:
+        logger.error(f"Error precomputing window results: {e}")
+        return {"rows": {}, "error": str(e)}
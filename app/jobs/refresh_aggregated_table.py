@@ -1,91 +1,306 @@
-from apscheduler.schedulers.background import BackgroundScheduler
+import os
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from typing import Any, Dict, Iterator, List, Optional
 from sqlalchemy import text
+from sqlalchemy.orm import Session
 from app.database import SessionLocal
 from app.logger import logger
+from app.metrics import track_job
+from app.jobs.job_runner import AGGREGATES_LOCK, job_runner
+from app.jobs.precompute_windows import refresh_window_results
+from app.services.result_cache import result_cache
+from app.services.sales_cube import sales_cube
+from app.services.rollup import ROLLUP_COLUMNS
+from app.services.top_customer_engine import TOP_CANDIDATES
 
-def update_product_sales_aggregated():
-    logger.info("Updating the sales aggregation table...")
-    
-    db = SessionLocal()
-    try:
-        db.execute(text("""
-            INSERT INTO product_sales_aggregated (sale_date, id_product, description, total_sold)
-            SELECT 
-                s.datetime::date AS sale_date,
-                ps.id_product,
-                p.description,
-                COUNT(ps.id_product) AS total_sold
-            FROM product_sales ps
-            JOIN sales s ON s.id = ps.id_sale
-            JOIN product p ON p.id = ps.id_product
-            WHERE s.datetime >= now() - interval '1 day'
-            GROUP BY sale_date, ps.id_product, p.description
-            ON CONFLICT (sale_date, id_product) 
-            DO UPDATE SET total_sold = EXCLUDED.total_sold;
-        """))
-        db.commit()
-        logger.info("Aggregation table updated successfully.")
-    except Exception as e:
-        logger.error(f"Error updating the aggregation table: {e}")
-    finally:
-        db.close()
+# Acima deste número de datas alteradas o refresh recalcula as partições em paralelo
+REFRESH_PARALLEL_THRESHOLD_DAYS = int(os.getenv("REFRESH_PARALLEL_THRESHOLD_DAYS", "62"))
 
-def update_category_revenue_aggregated():
-    logger.info("Updating the revenue aggregation table by category...")
+AGGREGATED_TABLES = (
+    "product_sales_aggregated",
+    "category_revenue_aggregated",
+    "customer_purchases_aggregated",
+)
 
-    db = SessionLocal()
+
+def claim_changed_dates(db: Session, aggregate: str) -> List[date]:
+    """ Retira do change log as datas alteradas desde o último refresh de `aggregate`.
+
+    A remoção acontece na mesma transação do recálculo: se o refresh falhar,
+    o rollback devolve as datas ao log.
+    """
+    rows = db.execute(text("""
+        DELETE FROM aggregate_changed_dates
+        WHERE aggregate = :aggregate
+        RETURNING sale_date;
+    """), {"aggregate": aggregate}).fetchall()
+    return sorted(row[0] for row in rows)
+
+
+def changed_dates_params(dates: List[date]) -> Dict[str, Any]:
+    """ Parâmetros para filtrar as vendas das datas alteradas mantendo o partition pruning. """
+    return {
+        "dates": dates,
+        "start_datetime": dates[0],
+        "end_datetime": dates[-1] + timedelta(days=1),
+    }
+
+
+@contextmanager
+def timed_stage(timings: Dict[str, float], name: str) -> Iterator[None]:
+    start = time.perf_counter()
     try:
-        db.execute(text("""
-            INSERT INTO category_revenue_aggregated (sale_date, id_category, category, total_revenue)
-            SELECT 
-                s.datetime::date AS sale_date,
-                c.id AS id_category,
-                c.description AS category,
-                SUM(p.price) AS total_revenue
-            FROM product_sales ps
-            JOIN sales s ON s.id = ps.id_sale
-            JOIN product p ON p.id = ps.id_product
-            JOIN category c ON c.id = p.id_category
-            WHERE s.datetime >= now() - interval '1 days'
-            GROUP BY sale_date, c.id, c.description
-            ON CONFLICT (sale_date, id_category) 
-            DO UPDATE SET total_revenue = EXCLUDED.total_revenue;
-        """))
-        db.commit()
-        logger.info("Revenue aggregation table updated successfully.")
-    except Exception as e:
-        logger.error(f"Error updating the revenue aggregation table: {e}")
+        yield
     finally:
-        db.close()
+        timings[name] = round((time.perf_counter() - start) * 1000, 2)
+
+
+def stage_changed_sales(db: Session, dates: List[date]) -> int:
+    """ Lê uma única vez as vendas (e seus itens) das datas alteradas para uma tabela temporária. """
+    db.execute(text("""
+        CREATE TEMP TABLE refresh_staging ON COMMIT DROP AS
+        SELECT
+            s.datetime::date AS sale_date,
+            s.id AS id_sale,
+            s.id_user,
+            ps.id_product,
+            p.description,
+            p.price,
+            c.id AS id_category,
+            c.description AS category
+        FROM sales s
+        LEFT JOIN product_sales ps ON ps.id_sale = s.id
+        LEFT JOIN product p ON p.id = ps.id_product
+        LEFT JOIN category c ON c.id = p.id_category
+        WHERE s.datetime >= :start_datetime AND s.datetime < :end_datetime
+          AND s.datetime::date = ANY(:dates);
+    """), changed_dates_params(dates))
+    db.execute(text("ANALYZE refresh_staging;"))
+    return db.execute(text("SELECT COUNT(*) FROM refresh_staging;")).scalar()
+
+
+def remove_daily_rows(db: Session, aggregate: str, dates: List[date]) -> None:
+    """ Remove as linhas diárias das datas alteradas, guardando-as em `<aggregate>_previous`
+    para que os rollups recebam apenas a diferença.
+    """
+    db.execute(text(f"CREATE TEMP TABLE {aggregate}_previous (LIKE {aggregate}) ON COMMIT DROP;"))
+    db.execute(text(f"""
+        WITH removed AS (
+            DELETE FROM {aggregate} WHERE sale_date = ANY(:dates) RETURNING *
+        )
+        INSERT INTO {aggregate}_previous SELECT * FROM removed;
+    """), {"dates": dates})
+
+
+def roll_up_changes(db: Session, aggregate: str, dates: List[date]) -> int:
+    """ Aplica aos rollups mensal e anual a diferença entre as linhas diárias novas e as removidas. """
+    key, label, measure = ROLLUP_COLUMNS[aggregate]
+    dimensions = f"{key}, {label}" if label else key
+    label_select = f"MAX({label}), " if label else ""
+    label_update = f", {label} = EXCLUDED.{label}" if label else ""
+    rows = 0
+    for period in ("month", "year"):
+        rollup = f"{aggregate}_{period}ly"
+        rows += db.execute(text(f"""
+            INSERT INTO {rollup} (sale_date, {dimensions}, {measure})
+            SELECT date_trunc('{period}', sale_date)::date, {key}, {label_select}SUM({measure})
+            FROM (
+                SELECT sale_date, {dimensions}, {measure} FROM {aggregate} WHERE sale_date = ANY(:dates)
+                UNION ALL
+                SELECT sale_date, {dimensions}, -{measure} FROM {aggregate}_previous
+            ) delta
+            GROUP BY 1, {key}
+            HAVING SUM({measure}) <> 0
+            ON CONFLICT (sale_date, {key}) DO UPDATE
+            SET {measure} = {rollup}.{measure} + EXCLUDED.{measure}{label_update};
+        """), {"dates": dates}).rowcount
+        db.execute(text(f"""
+            DELETE FROM {rollup}
+            WHERE sale_date = ANY(:periods) AND {measure} = 0;
+        """), {"periods": sorted({
+            d.replace(day=1) if period == "month" else d.replace(month=1, day=1) for d in dates
+        })})
+    return rows
+
 
-def update_top_customers_aggregated():
-    logger.info("###")
+def refresh_top_candidates(db: Session, dates: List[date]) -> int:
+    """ Recalcula as listas de maiores compradores dos meses e anos que contêm as datas alteradas. """
+    rows = 0
+    for period, periods in (
+        ("monthly", sorted({d.replace(day=1) for d in dates})),
+        ("yearly", sorted({d.replace(month=1, day=1) for d in dates})),
+    ):
+        db.execute(text(f"DELETE FROM customer_top_candidates_{period} WHERE sale_date = ANY(:periods);"), {"periods": periods})
+        rows += db.execute(text(f"""
+            INSERT INTO customer_top_candidates_{period} (sale_date, rank, id_user, total_purchases)
+            SELECT sale_date, rank, id_user, total_purchases
+            FROM (
+                SELECT sale_date, id_user, total_purchases,
+                       ROW_NUMBER() OVER (PARTITION BY sale_date ORDER BY total_purchases DESC, id_user) AS rank
+                FROM customer_purchases_aggregated_{period}
+                WHERE sale_date = ANY(:periods)
+            ) ranked
+            WHERE rank <= :limit;
+        """), {"periods": periods, "limit": TOP_CANDIDATES}).rowcount
+    return rows
+
+
+def update_sales_counters(db: Session, dates: List[date]) -> int:
+    """ Aplica ao contador mensal de vendas a diferença do agregado por cliente.
+
+    Cada venda tem um único cliente, então a soma de `total_purchases` das
+    linhas novas menos a das removidas é a variação do número de vendas.
+    """
+    rows = db.execute(text("""
+        INSERT INTO sales_counter_monthly (sale_date, total_sales)
+        SELECT date_trunc('month', sale_date)::date, SUM(total_purchases)
+        FROM (
+            SELECT sale_date, total_purchases FROM customer_purchases_aggregated WHERE sale_date = ANY(:dates)
+            UNION ALL
+            SELECT sale_date, -total_purchases FROM customer_purchases_aggregated_previous
+        ) delta
+        GROUP BY 1
+        HAVING SUM(total_purchases) <> 0
+        ON CONFLICT (sale_date) DO UPDATE
+        SET total_sales = sales_counter_monthly.total_sales + EXCLUDED.total_sales;
+    """), {"dates": dates}).rowcount
+    db.execute(text("""
+        DELETE FROM sales_counter_monthly
+        WHERE sale_date = ANY(:months) AND total_sales = 0;
+    """), {"months": sorted({d.replace(day=1) for d in dates})})
+    return rows
+
+
+def fan_out_product_sales(db: Session, dates: List[date]) -> int:
+    remove_daily_rows(db, "product_sales_aggregated", dates)
+    return db.execute(text("""
+        INSERT INTO product_sales_aggregated (sale_date, id_product, description, total_sold)
+        SELECT sale_date, id_product, description, COUNT(id_product) AS total_sold
+        FROM refresh_staging
+        WHERE id_product IS NOT NULL AND sale_date = ANY(:dates)
+        GROUP BY sale_date, id_product, description;
+    """), {"dates": dates}).rowcount
+
+
+def fan_out_category_revenue(db: Session, dates: List[date]) -> int:
+    remove_daily_rows(db, "category_revenue_aggregated", dates)
+    return db.execute(text("""
+        INSERT INTO category_revenue_aggregated (sale_date, id_category, category, total_revenue)
+        SELECT sale_date, id_category, category, SUM(price) AS total_revenue
+        FROM refresh_staging
+        WHERE id_category IS NOT NULL AND sale_date = ANY(:dates)
+        GROUP BY sale_date, id_category, category;
+    """), {"dates": dates}).rowcount
+
+
+def fan_out_customer_purchases(db: Session, dates: List[date]) -> int:
+    remove_daily_rows(db, "customer_purchases_aggregated", dates)
+    return db.execute(text("""
+        INSERT INTO customer_purchases_aggregated (sale_date, id_user, total_purchases)
+        SELECT sale_date, id_user, COUNT(DISTINCT id_sale) AS total_purchases
+        FROM refresh_staging
+        WHERE sale_date = ANY(:dates)
+        GROUP BY sale_date, id_user;
+    """), {"dates": dates}).rowcount
+
+
+FAN_OUT = {
+    "product_sales_aggregated": fan_out_product_sales,
+    "category_revenue_aggregated": fan_out_category_revenue,
+    "customer_purchases_aggregated": fan_out_customer_purchases,
+}
+
+
+@track_job("refresh_aggregated_tables")
+def refresh_aggregated_tables() -> Dict[str, Any]:
+    """ Atualiza as três tabelas de agregação com uma única leitura das vendas alteradas.
+
+    Retorna o tempo (ms) de cada etapa e as linhas gravadas por tabela.
+    """
+    logger.info("Refreshing aggregation tables...")
+    timings: Dict[str, float] = {}
+    rows: Dict[str, int] = {}
+    backfill: Optional[Dict[str, Any]] = None
 
     db = SessionLocal()
     try:
-        db.execute(text("""
-            INSERT INTO customer_purchases_aggregated (sale_date, id_user, total_purchases)
-            SELECT 
-                s.datetime::date AS sale_date,
-                s.id_user,
-                COUNT(s.id) AS total_purchases
-            FROM sales s
-            WHERE s.datetime >= now() - interval '7 days'
-            GROUP BY sale_date, s.id_user
-            ON CONFLICT (sale_date, id_user) 
-            DO UPDATE SET total_purchases = EXCLUDED.total_purchases;
-        """))
-        db.commit()
-        logger.info("###")
+        with timed_stage(timings, "total"):
+            with timed_stage(timings, "claim"):
+                changed = {aggregate: claim_changed_dates(db, aggregate) for aggregate in AGGREGATED_TABLES}
+            dates = sorted(set().union(*changed.values()))
+
+            if len(dates) > REFRESH_PARALLEL_THRESHOLD_DAYS:
+                from app.jobs.backfill_aggregated_tables import backfill_aggregated_tables, changed_partition_ranges
+                ranges = changed_partition_ranges(db, dates)
+                covered = [d for d in dates if any(start <= d < end for _, start, end in ranges)]
+                if len(covered) > REFRESH_PARALLEL_THRESHOLD_DAYS:
+                    # Carga grande (ex.: seed ou importação): devolve as datas ao log e recalcula
+                    # em paralelo só as partições que as contêm; cada partição retira as suas do log
+                    db.rollback()
+                    logger.info(f"{len(covered)} changed dates in {len(ranges)} partitions; "
+                                f"switching to the partition-parallel backfill.")
+                    with timed_stage(timings, "backfill"):
+                        backfill = backfill_aggregated_tables(dates=covered)
+                    # O que sobrou (datas fora das partições mensais ou de partições que falharam)
+                    # segue pelo caminho incremental, para nenhuma data voltar ao log
+                    with timed_stage(timings, "reclaim"):
+                        changed = {aggregate: claim_changed_dates(db, aggregate) for aggregate in AGGREGATED_TABLES}
+                    dates = sorted(set().union(*changed.values()))
+
+            if dates:
+                with timed_stage(timings, "stage"):
+                    rows["staging"] = stage_changed_sales(db, dates)
+                for aggregate in AGGREGATED_TABLES:
+                    if changed[aggregate]:
+                        with timed_stage(timings, aggregate):
+                            rows[aggregate] = FAN_OUT[aggregate](db, changed[aggregate])
+                        with timed_stage(timings, f"{aggregate}_rollup"):
+                            rows[f"{aggregate}_rollup"] = roll_up_changes(db, aggregate, changed[aggregate])
+                if changed["customer_purchases_aggregated"]:
+                    with timed_stage(timings, "customer_top_candidates"):
+                        rows["customer_top_candidates"] = refresh_top_candidates(db, changed["customer_purchases_aggregated"])
+                    with timed_stage(timings, "sales_counter_monthly"):
+                        rows["sales_counter_monthly"] = update_sales_counters(db, changed["customer_purchases_aggregated"])
+
+            with timed_stage(timings, "commit"):
+                db.commit()
+
+        for aggregate in AGGREGATED_TABLES:
+            if changed[aggregate]:
+                result_cache.invalidate(aggregate)
+        if changed["customer_purchases_aggregated"]:
+            result_cache.invalidate("sales_counter_monthly")
+
+        logger.info(f"Aggregation tables refreshed for {len(dates)} changed dates. Timings (ms): {timings}. Rows: {rows}")
+        result = {"dates": len(dates), "timings_ms": timings, "rows": rows}
+        if backfill is not None:
+            result["dates"] += backfill["dates"]
+            result["partitions"] = backfill["partitions"]
+            for table, count in backfill["rows"].items():
+                rows[table] = rows.get(table, 0) + count
+            if "error" in backfill:
+                result["error"] = backfill["error"]
+        return result
     except Exception as e:
-        logger.error(f"###: {e}")
+        db.rollback()
+        logger.error(f"Error refreshing the aggregation tables: {e}")
+        return {"dates": 0, "timings_ms": timings, "rows": rows, "error": str(e)}
     finally:
         db.close()
 
 
+def refresh_aggregates_and_windows() -> Dict[str, Any]:
+    """ Refresh das agregações, recarga do cubo em memória e pré-cálculo das janelas conhecidas. """
+    result = refresh_aggregated_tables()
+    if not result.get("error"):
+        sales_cube.reload()
+        refresh_window_results()
+    return result
+
+
 def start_aggregated_table_scheduler():
-    scheduler = BackgroundScheduler()
-    scheduler.add_job(update_product_sales_aggregated, "interval", hours=1, id="update_product_sales_aggregated")
-    scheduler.add_job(update_category_revenue_aggregated, "interval", hours=1, id="update_category_revenue_aggregated") 
-    scheduler.add_job(update_top_customers_aggregated, "interval" , hours=1, id="update_top_customer_aggregated")
-    scheduler.start()
\ No newline at end of file
+    """ Agenda o refresh de hora em hora no job runner: só o processo líder executa. """
+    job_runner.add_job("refresh_aggregated_tables", refresh_aggregates_and_windows, "interval",
+                       lock=AGGREGATES_LOCK, hours=1)
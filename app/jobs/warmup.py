@@ -0,0 +1,112 @@
+import asyncio
+import time
+from datetime import date
+from typing import Any, Dict, Optional
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.logger import logger
+from app.services.sales_cube import sales_cube
+from app.jobs.job_runner import AGGREGATES_LOCK, job_runner
+from app.jobs.manage_partitions import manage_partitions
+from app.jobs.precompute_windows import refresh_window_results
+from app.jobs.refresh_aggregated_table import AGGREGATED_TABLES, refresh_aggregates_and_windows
+
+
+class WarmupState:
+    """ Situação do aquecimento feito em segundo plano após o startup. """
+
+    def __init__(self):
+        self.status = "pending"
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.actions: Dict[str, Any] = {}
+        self.error: Optional[str] = None
+
+    def report(self) -> Dict[str, Any]:
+        duration = None
+        if self.started_at is not None:
+            duration = round((self.finished_at or time.time()) - self.started_at, 2)
+        return {"status": self.status, "duration_seconds": duration, "actions": self.actions, "error": self.error}
+
+
+warmup_state = WarmupState()
+
+
+def has_pending_changes(db: Session) -> bool:
+    return db.execute(text("SELECT EXISTS (SELECT 1 FROM aggregate_changed_dates);")).scalar()
+
+
+def has_current_windows(db: Session, today: Optional[date] = None) -> bool:
+    """ As janelas foram calculadas hoje (a janela "today" termina na data atual). """
+    return db.execute(text("""
+        SELECT EXISTS (
+            SELECT 1 FROM window_results WHERE window_name = 'today' AND end_date = :today
+        );
+    """), {"today": today or date.today()}).scalar()
+
+
+def warm_up(state: WarmupState = warmup_state) -> Dict[str, Any]:
+    """ Garante as partições e só recalcula o que estiver desatualizado.
+
+    Com vários workers subindo juntos, quem chega depois encontra o change log
+    vazio e as janelas do dia já gravadas, e não repete as varreduras.
+    """
+    state.status, state.started_at, state.finished_at, state.error = "running", time.time(), None, None
+    state.actions = {}
+    try:
+        # Pelo job runner: entre workers subindo juntos, só um executa cada etapa
+        partitions = job_runner.run_exclusive("manage_partitions", manage_partitions)
+        state.actions["partitions"] = "skipped" if partitions is None else {
+            key: partitions[key] for key in ("created", "archived", "error") if key in partitions
+        }
+
+        db = SessionLocal()
+        try:
+            pending = has_pending_changes(db)
+            windows = has_current_windows(db)
+        finally:
+            db.close()
+
+        if pending:
+            state.actions["refresh"] = job_runner.run_exclusive(
+                "refresh_aggregated_tables", refresh_aggregates_and_windows, lock=AGGREGATES_LOCK
+            ) or "skipped"
+        elif not windows:
+            state.actions["window_results"] = job_runner.run_exclusive(
+                "refresh_window_results", refresh_window_results
+            ) or "skipped"
+        else:
+            logger.info("Aggregates and window results are up to date; skipping the startup refresh.")
+        if state.actions.get("refresh") in (None, "skipped"):
+            # Sem refresh neste processo o cubo ainda não foi carregado
+            state.actions["cube"] = sales_cube.reload()
+        state.status = "done"
+    except Exception as e:
+        logger.error(f"Error during startup warm-up: {e}")
+        state.status, state.error = "failed", str(e)
+    finally:
+        state.finished_at = time.time()
+    logger.info(f"Startup warm-up {state.status} in {state.report()['duration_seconds']}s.")
+    return state.report()
+
+
+def start_warmup() -> asyncio.Task:
+    """ Roda o aquecimento em uma thread, sem segurar o startup da aplicação. """
+    return asyncio.create_task(asyncio.to_thread(warm_up))
+
+
+async def aggregate_freshness(db: AsyncSession) -> Dict[str, Any]:
+    """ Para cada tabela de agregação, quantas datas aguardam refresh e há quanto tempo. """
+    rows = (await db.execute(text("""
+        SELECT aggregate, COUNT(*), EXTRACT(EPOCH FROM LOCALTIMESTAMP - MIN(changed_at))
+        FROM aggregate_changed_dates
+        GROUP BY aggregate;
+    """))).fetchall()
+    pending = {aggregate: (count, stale) for aggregate, count, stale in rows}
+    freshness = {}
+    for aggregate in AGGREGATED_TABLES:
+        count, stale = pending.get(aggregate, (0, 0))
+        freshness[aggregate] = {"pending_dates": count, "stale_seconds": round(float(stale), 1)}
+    return freshness
@@ -0,0 +1,140 @@
+import time
+from functools import wraps
+from typing import Callable, Dict
+from fastapi import FastAPI, Request, Response
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+from starlette.routing import Match
+from app.database.pool import pool_wait_observers
+from app.utils.sql_utils import sql_shape
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Latência das requisições HTTP por rota.",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS,
+)
+SQL_LATENCY = Histogram(
+    "sql_statement_duration_seconds", "Tempo de execução de cada formato de SQL.",
+    ["engine", "statement"], buckets=LATENCY_BUCKETS,
+)
+POOL_CHECKED_OUT = Gauge("db_pool_checked_out", "Conexões em uso.", ["engine"])
+POOL_OVERFLOW = Gauge("db_pool_overflow", "Conexões abertas além de pool_size.", ["engine"])
+POOL_SIZE = Gauge("db_pool_size", "pool_size configurado.", ["engine"])
+POOL_WAIT = Histogram(
+    "db_pool_wait_seconds", "Tempo de espera por uma conexão do pool.",
+    ["engine"], buckets=LATENCY_BUCKETS,
+)
+POOL_TIMEOUTS = Counter("db_pool_timeouts_total", "Checkouts que estouraram pool_timeout.", ["engine"])
+JOB_DURATION = Histogram(
+    "job_duration_seconds", "Duração dos jobs agendados.",
+    ["job", "status"], buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 1800, 3600),
+)
+JOB_ROWS = Gauge("job_rows_affected", "Linhas gravadas pela última execução do job.", ["job", "table"])
+JOB_LAST_SUCCESS = Gauge("job_last_success_timestamp_seconds", "Fim da última execução bem-sucedida.", ["job"])
+ADMISSION_WAIT = Histogram(
+    "admission_wait_seconds", "Tempo na fila do controle de admissão.",
+    ["route"], buckets=LATENCY_BUCKETS,
+)
+ADMISSION_REJECTED = Counter("admission_rejected_total", "Requisições recusadas com 503 por sobrecarga.", ["route"])
+
+_engines: Dict[str, Engine] = {}
+
+
+def instrument_engine(engine: Engine, label: str) -> None:
+    """ Registra os eventos de execução e o pool de `engine` (para engines assíncronos use `.sync_engine`). """
+    _engines[label] = engine
+
+    # O início fica no contexto da execução, descartado junto com ela: um comando
+    # que falha não chega ao after_cursor_execute e não deixa nada na conexão
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context.metrics_started_at = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        SQL_LATENCY.labels(label, sql_shape(statement)).observe(time.perf_counter() - context.metrics_started_at)
+
+
+def _observe_pool_wait(pool, waited: float, timed_out: bool) -> None:
+    # engine.pool é recriado em dispose(), por isso a busca é feita a cada checkout
+    label = next((name for name, engine in _engines.items() if engine.pool is pool), None)
+    if label is None:
+        return
+    POOL_WAIT.labels(label).observe(waited)
+    if timed_out:
+        POOL_TIMEOUTS.labels(label).inc()
+
+
+pool_wait_observers.append(_observe_pool_wait)
+
+
+def _refresh_pool_gauges() -> None:
+    for label, engine in _engines.items():
+        pool = engine.pool
+        if not isinstance(pool, QueuePool):
+            continue
+        POOL_CHECKED_OUT.labels(label).set(pool.checkedout())
+        POOL_OVERFLOW.labels(label).set(max(pool.overflow(), 0))
+        POOL_SIZE.labels(label).set(pool.size())
+
+
+def track_job(name: str) -> Callable:
+    """ Mede duração e linhas afetadas de um job; o job pode retornar {"rows": {tabela: n}} ou um inteiro. """
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            status = "success"
+            try:
+                result = func(*args, **kwargs)
+                if isinstance(result, dict) and result.get("error"):
+                    status = "error"
+                return result
+            except Exception:
+                status = "error"
+                raise
+            finally:
+                JOB_DURATION.labels(name, status).observe(time.perf_counter() - started)
+                if status == "success":
+                    JOB_LAST_SUCCESS.labels(name).set(time.time())
+                    rows = result.get("rows") if isinstance(result, dict) else result
+                    if isinstance(rows, dict):
+                        for table, count in rows.items():
+                            JOB_ROWS.labels(name, table).set(count)
+                    elif isinstance(rows, int):
+                        JOB_ROWS.labels(name, "").set(rows)
+        return wrapper
+    return decorator
+
+
+def _route_template(request: Request) -> str:
+    for route in request.app.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+
+def setup_metrics(app: FastAPI) -> None:
+    """ Adiciona o middleware de latência por rota e o endpoint /metrics. """
+
+    @app.middleware("http")
+    async def _measure_request(request: Request, call_next):
+        started = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            REQUEST_LATENCY.labels(request.method, _route_template(request), str(status)).observe(
+                time.perf_counter() - started
+            )
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics() -> Response:
+        _refresh_pool_gauges()
+        return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
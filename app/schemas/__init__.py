@@ -0,0 +1,2 @@
+from .sales import SaleItemIn, SaleIn, BulkSalesIn, SalesAccepted
+from .batch import BatchQueryItem, BatchQueryIn, BatchQueryResult, BatchQueryOut
\ No newline at end of file
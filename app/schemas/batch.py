@@ -0,0 +1,22 @@
+from typing import Any, List, Literal
+from pydantic import BaseModel, Field
+
+MAX_BATCH_QUERIES = 500
+
+
+class BatchQueryItem(BaseModel):
+    metric: Literal["summary", "revenue-by-category", "top-product"]
+    start_date: str
+    end_date: str
+
+
+class BatchQueryIn(BaseModel):
+    queries: List[BatchQueryItem] = Field(min_length=1, max_length=MAX_BATCH_QUERIES)
+
+
+class BatchQueryResult(BatchQueryItem):
+    result: Any = None
+
+
+class BatchQueryOut(BaseModel):
+    results: List[BatchQueryResult]
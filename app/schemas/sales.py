@@ -0,0 +1,34 @@
+from datetime import datetime, timezone
+from typing import List, Optional
+from pydantic import BaseModel, Field, field_validator
+
+MAX_BULK_SALES = 10000
+
+
+class SaleItemIn(BaseModel):
+    id_product: int = Field(gt=0)
+    quantity: int = Field(1, ge=1, le=1000)
+
+
+class SaleIn(BaseModel):
+    id_user: int = Field(gt=0)
+    datetime: datetime
+    products: List[SaleItemIn] = Field(min_length=1)
+
+    @field_validator("datetime")
+    @classmethod
+    def naive_utc(cls, value: datetime) -> datetime:
+        """ A coluna é TIMESTAMP sem fuso: horários com fuso são convertidos para UTC. """
+        if value.tzinfo is not None:
+            return value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+
+
+class BulkSalesIn(BaseModel):
+    sales: List[SaleIn] = Field(min_length=1, max_length=MAX_BULK_SALES)
+
+
+class SalesAccepted(BaseModel):
+    status: str
+    accepted: int
+    sale_ids: Optional[List[int]] = None
@@ -2,4 +2,9 @@ from .sales_service import get_revenue_by_category
 from .sales_service import get_sales_summary
 from .sales_service import get_top_customer
 from .sales_service import get_top_product
+from .sales_service import get_top_products
+from .sales_service import get_top_customers
 from .sales_service import get_yearly_sales_average
+from .result_cache import result_cache, cached
+
+from .single_flight import coalescer, single_flight
\ No newline at end of file
@@ -0,0 +1,133 @@
+"""Export colunar (Parquet ou Arrow IPC) das tabelas de agregação.
+
+Exemplos:
+    python -m app.services.aggregate_export product_sales 2024-01-01 2024-12-31 --output product_sales.parquet
+    python -m app.services.aggregate_export customer_purchases 2020-01-01 2025-12-31 --granularity monthly --format arrow --output customers.arrow
+"""
+import argparse
+import os
+from datetime import date
+from typing import BinaryIO, Dict, Iterator, List, Tuple, Union
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import Engine
+from app.database import engine
+from app.logger import logger
+
+EXPORT_BATCH_ROWS = int(os.getenv("AGGREGATE_EXPORT_BATCH_ROWS", "100000"))
+
+# Nome público -> (tabela diária, colunas e tipos Arrow)
+AGGREGATE_EXPORTS: Dict[str, Tuple[str, List[Tuple[str, pa.DataType]]]] = {
+    "product_sales": ("product_sales_aggregated", [
+        ("sale_date", pa.date32()), ("id_product", pa.int32()),
+        ("description", pa.string()), ("total_sold", pa.int64()),
+    ]),
+    "category_revenue": ("category_revenue_aggregated", [
+        ("sale_date", pa.date32()), ("id_category", pa.int32()),
+        ("category", pa.string()), ("total_revenue", pa.decimal128(18, 2)),
+    ]),
+    "customer_purchases": ("customer_purchases_aggregated", [
+        ("sale_date", pa.date32()), ("id_user", pa.int32()), ("total_purchases", pa.int64()),
+    ]),
+}
+GRANULARITIES = {"daily": "", "monthly": "_monthly", "yearly": "_yearly"}
+EXPORT_FORMATS = {
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.file", "arrow"),
+}
+
+
+def export_schema(name: str) -> pa.Schema:
+    return pa.schema(AGGREGATE_EXPORTS[name][1])
+
+
+def export_query(name: str, granularity: str) -> str:
+    table, columns = AGGREGATE_EXPORTS[name]
+    return (
+        f"SELECT {', '.join(column for column, _ in columns)} "
+        f"FROM {table}{GRANULARITIES[granularity]} "
+        f"WHERE sale_date >= %(start)s AND sale_date <= %(end)s "
+        f"ORDER BY sale_date"
+    )
+
+
+def period_start(day: date, granularity: str) -> date:
+    """ Os rollups guardam o primeiro dia do período: o início do intervalo é arredondado para baixo. """
+    if granularity == "monthly":
+        return day.replace(day=1)
+    if granularity == "yearly":
+        return day.replace(month=1, day=1)
+    return day
+
+
+def rows_to_batch(rows: List[tuple], schema: pa.Schema) -> pa.RecordBatch:
+    """ Transpõe as tuplas do cursor direto em colunas Arrow, sem montar dicts por linha. """
+    columns = zip(*rows)
+    return pa.RecordBatch.from_arrays(
+        [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+        schema=schema,
+    )
+
+
+def iter_batches(name: str, start: date, end: date, granularity: str = "daily",
+                 batch_rows: int = EXPORT_BATCH_ROWS, bind: Engine = engine) -> Iterator[pa.RecordBatch]:
+    """ Lê a tabela por um cursor nomeado (no servidor), `batch_rows` linhas por vez. """
+    schema = export_schema(name)
+    connection = bind.raw_connection()
+    try:
+        with connection.cursor(name=f"export_{name}") as cursor:
+            cursor.itersize = batch_rows
+            cursor.execute(export_query(name, granularity), {"start": period_start(start, granularity), "end": end})
+            while True:
+                rows = cursor.fetchmany(batch_rows)
+                if not rows:
+                    break
+                yield rows_to_batch(rows, schema)
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def write_batches(batches: Iterator[pa.RecordBatch], schema: pa.Schema, sink: Union[str, BinaryIO],
+                  export_format: str = "parquet") -> int:
+    """ Grava os lotes em Parquet (zstd) ou Arrow IPC; devolve o número de linhas. """
+    rows = 0
+    if export_format == "parquet":
+        writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    else:
+        writer = pa.ipc.new_file(sink, schema)
+    try:
+        for batch in batches:
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    finally:
+        writer.close()
+    return rows
+
+
+def export_aggregate(name: str, start: date, end: date, sink: Union[str, BinaryIO], export_format: str = "parquet",
+                     granularity: str = "daily") -> int:
+    rows = write_batches(iter_batches(name, start, end, granularity), export_schema(name), sink, export_format)
+    logger.info(f"Exported {rows} rows of {name} ({granularity}) from {start} to {end} as {export_format}.")
+    return rows
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.services.aggregate_export",
+                                     description="Exporta uma tabela de agregação em Parquet ou Arrow IPC.")
+    parser.add_argument("table", choices=AGGREGATE_EXPORTS)
+    parser.add_argument("start_date", type=date.fromisoformat)
+    parser.add_argument("end_date", type=date.fromisoformat)
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="parquet")
+    parser.add_argument("--granularity", choices=GRANULARITIES, default="daily")
+    parser.add_argument("--output", help="Arquivo de saída (padrão: <tabela>_<início>_<fim>.<formato>).")
+    args = parser.parse_args()
+
+    output = args.output or f"{args.table}_{args.start_date}_{args.end_date}.{EXPORT_FORMATS[args.format][1]}"
+    rows = export_aggregate(args.table, args.start_date, args.end_date, output, args.format, args.granularity)
+    print(f"{rows} rows written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
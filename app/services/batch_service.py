@@ -0,0 +1,93 @@
+from collections import defaultdict
+from datetime import datetime, time
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import text
+from app.logger import logger
+from app.services.rollup import batch_rollup_source
+from app.utils.date_utils import parse_date, validate_dates
+
+DateRange = Tuple[str, str]
+
+
+async def batch_sales_summary(db: AsyncSession, ranges: List[DateRange]) -> List[int]:
+    """ Total de vendas de cada intervalo, com a mesma semântica de get_sales_summary. """
+    rows = (await db.execute(text("""
+        SELECT r.position, (
+            SELECT COUNT(s.id) FROM sales s
+            WHERE s.datetime BETWEEN r.range_start AND r.range_end
+        )
+        FROM unnest(CAST(:starts AS TIMESTAMP[]), CAST(:ends AS TIMESTAMP[]))
+             WITH ORDINALITY AS r(range_start, range_end, position);
+    """), {
+        "starts": [datetime.combine(parse_date(start), time.min) for start, _ in ranges],
+        "ends": [datetime.combine(parse_date(end), time.min) for _, end in ranges],
+    })).fetchall()
+    totals = {position: total for position, total in rows}
+    return [totals.get(position, 0) for position in range(1, len(ranges) + 1)]
+
+
+async def batch_revenue_by_category(db: AsyncSession, ranges: List[DateRange]) -> List[List[Dict[str, Any]]]:
+    source, params = batch_rollup_source(
+        "category_revenue_aggregated", "category, total_revenue",
+        [(parse_date(start), parse_date(end)) for start, end in ranges],
+    )
+    rows = (await db.execute(text(f"""
+        SELECT position, category, SUM(total_revenue) AS total_revenue
+        FROM {source} AS agg
+        GROUP BY position, category
+        HAVING SUM(total_revenue) > 0
+        ORDER BY position, total_revenue DESC, category;
+    """), params)).fetchall()
+    results: List[List[Dict[str, Any]]] = [[] for _ in ranges]
+    for position, category, total_revenue in rows:
+        results[position].append({"category": category, "total_revenue": total_revenue})
+    return results
+
+
+async def batch_top_product(db: AsyncSession, ranges: List[DateRange]) -> List[Any]:
+    source, params = batch_rollup_source(
+        "product_sales_aggregated", "id_product, total_sold",
+        [(parse_date(start), parse_date(end)) for start, end in ranges],
+    )
+    rows = (await db.execute(text(f"""
+        SELECT DISTINCT ON (agg.position) agg.position, agg.id_product,
+               COALESCE(product.description, CAST(agg.id_product AS TEXT)), SUM(agg.total_sold) AS total_sold
+        FROM {source} AS agg
+        LEFT JOIN product ON product.id = agg.id_product
+        GROUP BY agg.position, agg.id_product, product.description
+        HAVING SUM(agg.total_sold) > 0
+        ORDER BY agg.position, total_sold DESC, agg.id_product;
+    """), params)).fetchall()
+    results: List[Any] = [None] * len(ranges)
+    for position, id_product, description, total_sold in rows:
+        results[position] = {"product_id": id_product, "top_product": description, "total_sold": total_sold}
+    return results
+
+
+BATCH_METRICS: Dict[str, Callable[[AsyncSession, List[DateRange]], Awaitable[List[Any]]]] = {
+    "summary": batch_sales_summary,
+    "revenue-by-category": batch_revenue_by_category,
+    "top-product": batch_top_product,
+}
+
+
+async def run_batch(db: AsyncSession, queries: List[Tuple[str, str, str]]) -> List[Any]:
+    """ Responde uma lista de (métrica, início, fim) com uma consulta por métrica.
+
+    Os resultados voltam na ordem da requisição.
+    """
+    for _, start_date, end_date in queries:
+        validate_dates(start_date, end_date)
+
+    positions: Dict[str, List[int]] = defaultdict(list)
+    for index, (metric, _, _) in enumerate(queries):
+        positions[metric].append(index)
+
+    results: List[Any] = [None] * len(queries)
+    for metric, indexes in positions.items():
+        logger.info(f"Batch query: {len(indexes)} ranges of {metric}")
+        values = await BATCH_METRICS[metric](db, [queries[index][1:] for index in indexes])
+        for index, value in zip(indexes, values):
+            results[index] = value
+    return results
@@ -0,0 +1,65 @@
+import asyncio
+import os
+import time
+from typing import Any, Dict, Optional
+from app.database import AsyncSessionLocal
+from app.logger import logger
+from app.services.sales_service import (
+    get_sales_summary, get_top_product, get_top_customer,
+    get_revenue_by_category, get_yearly_sales_average
+)
+from app.utils.date_utils import validate_dates
+
+DASHBOARD_METRIC_TIMEOUT_SECONDS = float(os.getenv("DASHBOARD_METRIC_TIMEOUT_SECONDS", "5"))
+
+# Métricas por intervalo e as que não dependem do intervalo
+RANGE_METRICS = {
+    "summary": get_sales_summary,
+    "top_product": get_top_product,
+    "top_customer": get_top_customer,
+    "revenue_by_category": get_revenue_by_category,
+}
+GLOBAL_METRICS = {
+    "yearly_sales_average": get_yearly_sales_average,
+}
+# Conexões que um dashboard segura ao mesmo tempo (uma sessão por métrica)
+DASHBOARD_CONNECTIONS = len(RANGE_METRICS) + len(GLOBAL_METRICS)
+
+
+async def _run_metric(func, args: tuple, timeout: float) -> Any:
+    """ Cada métrica usa sua própria sessão, e portanto sua própria conexão do pool. """
+    async with AsyncSessionLocal() as db:
+        return await asyncio.wait_for(func(db, *args), timeout=timeout)
+
+
+async def get_dashboard(start_date: str, end_date: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+    """ Executa todas as métricas do dashboard em paralelo.
+
+    Uma métrica que falha ou passa de `timeout` segundos sai como None, com
+    o motivo em "errors", sem atrasar nem derrubar as demais.
+    """
+    validate_dates(start_date, end_date)
+    timeout = timeout or DASHBOARD_METRIC_TIMEOUT_SECONDS
+    calls = {name: (func, (start_date, end_date)) for name, func in RANGE_METRICS.items()}
+    calls.update({name: (func, ()) for name, func in GLOBAL_METRICS.items()})
+
+    started = time.perf_counter()
+    outcomes = await asyncio.gather(
+        *(_run_metric(func, args, timeout) for func, args in calls.values()),
+        return_exceptions=True,
+    )
+
+    metrics: Dict[str, Any] = {}
+    errors: Dict[str, str] = {}
+    for name, outcome in zip(calls, outcomes):
+        if isinstance(outcome, asyncio.TimeoutError):
+            logger.warning(f"Dashboard metric {name} timed out after {timeout}s.")
+            metrics[name], errors[name] = None, "timeout"
+        elif isinstance(outcome, Exception):
+            logger.error(f"Dashboard metric {name} failed: {outcome}")
+            metrics[name], errors[name] = None, "error"
+        else:
+            metrics[name] = outcome
+
+    logger.info(f"Dashboard from {start_date} to {end_date} built in {round((time.perf_counter() - started) * 1000, 2)} ms.")
+    return {"start_date": start_date, "end_date": end_date, "metrics": metrics, "errors": errors, "partial": bool(errors)}
@@ -0,0 +1,134 @@
+import os
+import time
+from collections import OrderedDict
+from functools import wraps
+from threading import Lock
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple
+from app.logger import logger
+
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "1024"))
+RESULT_CACHE_TTL_SECONDS = float(os.getenv("RESULT_CACHE_TTL_SECONDS", "3600"))
+
+
+class ResultCache:
+    """ Cache LRU/TTL de resultados das consultas sobre tabelas agregadas.
+
+    Cada entrada guarda a versão das tabelas de origem no momento em que foi
+    calculada. Os jobs de refresh chamam `invalidate(source)`, que incrementa a
+    versão daquela origem e remove apenas as entradas que dependem dela.
+    """
+
+    def __init__(self, max_entries: int = RESULT_CACHE_MAX_ENTRIES, ttl_seconds: float = RESULT_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.enabled = RESULT_CACHE_ENABLED
+        self._entries: "OrderedDict[Hashable, Tuple[Any, Tuple[Tuple[str, int], ...], float]]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _snapshot(self, sources: Iterable[str]) -> Tuple[Tuple[str, int], ...]:
+        return tuple((source, self._versions.get(source, 0)) for source in sources)
+
+    def snapshot(self, sources: Iterable[str]) -> Tuple[Tuple[str, int], ...]:
+        """ Versões atuais de `sources`; tirada antes da consulta, marca de que dados o resultado veio. """
+        with self._lock:
+            return self._snapshot(sources)
+
+    def _is_fresh(self, versions: Tuple[Tuple[str, int], ...], expires_at: float) -> bool:
+        if expires_at <= time.monotonic():
+            return False
+        return all(self._versions.get(source, 0) == version for source, version in versions)
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        with self._lock:
+            if not self.enabled:
+                self.misses += 1
+                return False, None
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, versions, expires_at = entry
+                if self._is_fresh(versions, expires_at):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._entries[key]
+                self.evictions += 1
+            self.misses += 1
+            return False, None
+
+    def set(self, key: Hashable, value: Any, sources: Iterable[str],
+            versions: Optional[Tuple[Tuple[str, int], ...]] = None) -> None:
+        """ Com `versions` (de `snapshot`), um resultado calculado antes de uma invalidação já nasce vencido. """
+        with self._lock:
+            if not self.enabled:
+                return
+            versions = versions if versions is not None else self._snapshot(sources)
+            self._entries[key] = (value, versions, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, source: str) -> int:
+        """ Incrementa a versão de `source` e descarta as entradas que dependem dela. """
+        with self._lock:
+            self._versions[source] = self._versions.get(source, 0) + 1
+            stale = [
+                key for key, (_, versions, _) in self._entries.items()
+                if any(name == source for name, _ in versions)
+            ]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+        logger.info(f"Result cache invalidated for {source}: {len(stale)} entries dropped.")
+        return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+            self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "versions": dict(self._versions),
+            }
+
+
+result_cache = ResultCache()
+
+
+def cached(*sources: str) -> Callable:
+    """ Decora uma função de serviço assíncrona `func(db, *args)` com o cache de resultados.
+
+    A chave é (nome da função, *args, *kwargs); a sessão não faz parte da chave.
+    Resultados `None` (erro ou período sem dados) não são armazenados.
+    """
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        async def wrapper(db, *args, **kwargs):
+            key = (func.__name__, *args, *sorted(kwargs.items()))
+            hit, value = result_cache.get(key)
+            if hit:
+                return value
+            versions = result_cache.snapshot(sources)
+            value = await func(db, *args, **kwargs)
+            if value is not None and value != []:
+                result_cache.set(key, value, sources, versions)
+            return value
+        return wrapper
+    return decorator
@@ -0,0 +1,61 @@
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+from app.utils.date_utils import decompose_date_range
+
+# (chave, rótulo, medida) de cada tabela agregada; os rollups mensais e anuais
+# usam os mesmos nomes de coluna, com sale_date = primeiro dia do período.
+ROLLUP_COLUMNS: Dict[str, Tuple[str, Optional[str], str]] = {
+    "product_sales_aggregated": ("id_product", "description", "total_sold"),
+    "category_revenue_aggregated": ("id_category", "category", "total_revenue"),
+    "customer_purchases_aggregated": ("id_user", None, "total_purchases"),
+}
+
+ROLLUP_LEVELS = (("yearly", "_yearly"), ("monthly", "_monthly"), ("daily", ""))
+
+
+def rollup_source(table: str, columns: str, start: date, end: date) -> Tuple[str, Dict[str, date]]:
+    """ Monta um subselect que cobre [start, end] lendo cada pedaço do nível mais grosso disponível.
+
+    Retorna o SQL (para ser usado em `FROM ... AS alias`) e os parâmetros de data.
+    """
+    pieces = decompose_date_range(start, end)
+    parts, params = [], {}
+    for level, suffix in ROLLUP_LEVELS:
+        for index, (first, last) in enumerate(pieces[level]):
+            name = f"{level}_{index}"
+            parts.append(
+                f"SELECT {columns} FROM {table}{suffix} "
+                f"WHERE sale_date BETWEEN :{name}_start AND :{name}_end"
+            )
+            params[f"{name}_start"] = first
+            params[f"{name}_end"] = last
+    return "(" + " UNION ALL ".join(parts) + ")", params
+
+
+def batch_rollup_source(table: str, columns: str, ranges: List[Tuple[date, date]]) -> Tuple[str, Dict[str, Any]]:
+    """ Como `rollup_source`, mas para vários intervalos em um único subselect.
+
+    Os pedaços de cada nível viram arrays (posição, início, fim) desaninhados
+    com unnest e ligados à tabela do nível; a coluna `position` indica a que
+    intervalo (índice em `ranges`) cada linha pertence.
+    """
+    pieces: Dict[str, List[Tuple[int, date, date]]] = {level: [] for level, _ in ROLLUP_LEVELS}
+    for position, (start, end) in enumerate(ranges):
+        for level, level_pieces in decompose_date_range(start, end).items():
+            pieces[level].extend((position, first, last) for first, last in level_pieces)
+
+    parts, params = [], {}
+    for level, suffix in ROLLUP_LEVELS:
+        if not pieces[level]:
+            continue
+        positions, starts, ends = zip(*pieces[level])
+        parts.append(
+            f"SELECT p.position, {columns} "
+            f"FROM unnest(CAST(:{level}_positions AS INTEGER[]), CAST(:{level}_starts AS DATE[]), "
+            f"CAST(:{level}_ends AS DATE[])) AS p(position, range_start, range_end) "
+            f"JOIN {table}{suffix} AS piece ON piece.sale_date BETWEEN p.range_start AND p.range_end"
+        )
+        params[f"{level}_positions"] = list(positions)
+        params[f"{level}_starts"] = list(starts)
+        params[f"{level}_ends"] = list(ends)
+    return "(" + " UNION ALL ".join(parts) + ")", params
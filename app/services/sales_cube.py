@@ -0,0 +1,187 @@
+import os
+import time
+from datetime import date
+from decimal import Decimal
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import Engine
+from app.database import engine
+from app.logger import logger
+from app.services.result_cache import result_cache
+
+SALES_CUBE_ENABLED = os.getenv("SALES_CUBE_ENABLED", "true").lower() == "true"
+# Limite de células (dias x itens) por cubo; acima disso a consulta continua no SQL.
+# Cada célula é um int64: 5M células são 40 MB por cubo, até 80 MB com os dois
+# cubos, e a conta vale para cada processo da API (cada worker carrega os seus)
+SALES_CUBE_MAX_CELLS = int(os.getenv("SALES_CUBE_MAX_CELLS", "5000000"))
+SALES_CUBE_FETCH_ROWS = int(os.getenv("SALES_CUBE_FETCH_ROWS", "200000"))
+
+EPOCH = date(1970, 1, 1)
+
+# Tabela diária -> (coluna que vira o eixo dos itens, expressão do valor como inteiro)
+CUBE_SOURCES = {
+    "product_sales_aggregated": ("id_product", "total_sold"),
+    # Receita em centavos: a soma continua exata e volta como Decimal com 2 casas
+    "category_revenue_aggregated": ("category", "ROUND(total_revenue * 100)"),
+}
+
+
+class DateCube:
+    """ Grade dias x itens com a soma acumulada ao longo das datas.
+
+    `prefix[i]` é o total de cada item nos dias anteriores ao i-ésimo dia do
+    eixo, então qualquer intervalo [start, end] é `prefix[fim + 1] - prefix[início]`.
+    """
+
+    def __init__(self, first_day: int, keys: np.ndarray, prefix: np.ndarray):
+        self.first_day = first_day
+        self.keys = keys
+        self.prefix = prefix
+
+    @classmethod
+    def from_rows(cls, days: np.ndarray, keys: np.ndarray, values: np.ndarray) -> "DateCube":
+        """ `days` em dias desde 1970-01-01; cada (dia, item) aparece no máximo uma vez. """
+        if len(days) == 0:
+            return cls(0, keys[:0], np.zeros((1, 0), dtype=np.int64))
+        first_day = int(days.min())
+        unique_keys, columns = np.unique(keys, return_inverse=True)
+        prefix = np.zeros((int(days.max()) - first_day + 2, len(unique_keys)), dtype=np.int64)
+        prefix[days - first_day + 1, columns] = values
+        np.cumsum(prefix, axis=0, out=prefix)
+        return cls(first_day, unique_keys, prefix)
+
+    def totals(self, start: date, end: date) -> np.ndarray:
+        first = max((start - EPOCH).days - self.first_day, 0)
+        last = min((end - EPOCH).days - self.first_day + 1, len(self.prefix) - 1)
+        if first >= last:
+            return np.zeros(len(self.keys), dtype=np.int64)
+        return self.prefix[last] - self.prefix[first]
+
+
+class SalesCube:
+    """ Cubos em memória de product_sales_aggregated e category_revenue_aggregated.
+
+    Recarregados após cada refresh. Só respondem enquanto a versão da tabela
+    no result_cache for a mesma do momento da carga: depois de uma
+    invalidação, e até a próxima carga, as funções de serviço voltam ao SQL.
+    """
+
+    def __init__(self, bind: Engine = engine, max_cells: int = SALES_CUBE_MAX_CELLS):
+        self.bind = bind
+        self.max_cells = max_cells
+        self.enabled = SALES_CUBE_ENABLED
+        self._cubes: Dict[str, Tuple[DateCube, Tuple[Tuple[str, int], ...]]] = {}
+        self._product_names: Dict[int, str] = {}
+        self._reload_lock = Lock()
+        self.hits = 0
+        self.fallbacks = 0
+        self.last_load_ms = 0.0
+
+    def _fetch(self, cursor, table: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        key_column, value_expression = CUBE_SOURCES[table]
+        cursor.execute(
+            f"SELECT sale_date - %(epoch)s, {key_column}, {value_expression} FROM {table}", {"epoch": EPOCH}
+        )
+        days, keys, values = [], [], []
+        while True:
+            rows = cursor.fetchmany(SALES_CUBE_FETCH_ROWS)
+            if not rows:
+                break
+            day_column, key_column_values, value_column = zip(*rows)
+            days.append(np.fromiter(day_column, dtype=np.int64, count=len(rows)))
+            keys.append(np.array(key_column_values))
+            values.append(np.fromiter(value_column, dtype=np.int64, count=len(rows)))
+        if not days:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        return np.concatenate(days), np.concatenate(keys), np.concatenate(values)
+
+    def _load(self, connection, table: str) -> Optional[DateCube]:
+        with connection.cursor(name=f"cube_{table}") as cursor:
+            cursor.itersize = SALES_CUBE_FETCH_ROWS
+            days, keys, values = self._fetch(cursor, table)
+        if len(days):
+            cells = (int(days.max()) - int(days.min()) + 2) * len(np.unique(keys))
+            if cells > self.max_cells:
+                logger.warning(f"{table} needs {cells} cells (limit {self.max_cells}); cube disabled.")
+                return None
+        return DateCube.from_rows(days, keys, values)
+
+    def reload(self) -> Dict[str, Any]:
+        """ Relê as tabelas diárias e troca os cubos de uma vez; devolve o tamanho de cada um. """
+        if not self.enabled:
+            return {}
+        with self._reload_lock:
+            started = time.perf_counter()
+            # Versões tiradas antes da leitura: um refresh durante a carga deixa o cubo vencido
+            versions = {table: result_cache.snapshot((table,)) for table in CUBE_SOURCES}
+            connection = self.bind.raw_connection()
+            try:
+                cubes = {table: self._load(connection, table) for table in CUBE_SOURCES}
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT id, description FROM product")
+                    product_names = dict(cursor.fetchall())
+                connection.commit()
+            except Exception as e:
+                logger.error(f"Error loading the sales cube: {e}")
+                return {"error": str(e)}
+            finally:
+                connection.close()
+
+            self._product_names = product_names
+            self._cubes = {table: (cube, versions[table]) for table, cube in cubes.items() if cube is not None}
+            self.last_load_ms = round((time.perf_counter() - started) * 1000, 2)
+            shapes = {table: list(cube.prefix.shape) for table, (cube, _) in self._cubes.items()}
+            logger.info(f"Sales cube loaded in {self.last_load_ms} ms: {shapes}")
+            return {"load_ms": self.last_load_ms, "shapes": shapes}
+
+    def _cube(self, table: str) -> Optional[DateCube]:
+        entry = self._cubes.get(table) if self.enabled else None
+        if entry is None or result_cache.snapshot((table,)) != entry[1]:
+            self.fallbacks += 1
+            return None
+        self.hits += 1
+        return entry[0]
+
+    def top_product(self, start: date, end: date) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        cube = self._cube("product_sales_aggregated")
+        if cube is None:
+            return False, None
+        totals = cube.totals(start, end)
+        # Como no SQL (HAVING SUM > 0): totais zerados ou negativos, por devoluções
+        # ou ajustes, não contam
+        if not len(totals) or totals.max() <= 0:
+            return True, None
+        best = int(np.argmax(totals))
+        id_product = int(cube.keys[best])
+        return True, {
+            "product_id": id_product,
+            "top_product": self._product_names.get(id_product, str(id_product)),
+            "total_sold": int(totals[best]),
+        }
+
+    def revenue_by_category(self, start: date, end: date) -> Tuple[bool, List[Dict[str, Any]]]:
+        cube = self._cube("category_revenue_aggregated")
+        if cube is None:
+            return False, []
+        totals = cube.totals(start, end)
+        order = np.argsort(-totals, kind="stable")
+        return True, [
+            {"category": str(cube.keys[index]), "total_revenue": Decimal(int(totals[index])).scaleb(-2)}
+            for index in order if totals[index] > 0
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "tables": {
+                table: {"shape": list(cube.prefix.shape), "megabytes": round(cube.prefix.nbytes / 1024 / 1024, 1)}
+                for table, (cube, _) in self._cubes.items()
+            },
+            "hits": self.hits,
+            "fallbacks": self.fallbacks,
+            "last_load_ms": self.last_load_ms,
+        }
+
+
+sales_cube = SalesCube()
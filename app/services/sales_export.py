@@ -0,0 +1,109 @@
+import csv
+import io
+import json
+import os
+from datetime import datetime, time, timedelta
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Tuple
+from sqlalchemy.sql import text
+from app.database import AsyncSessionLocal
+from app.logger import logger
+from app.utils.date_utils import parse_date
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "5000"))
+EXPORT_CHUNK_BYTES = int(os.getenv("EXPORT_CHUNK_BYTES", str(64 * 1024)))
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+CSV_HEADER = ("sale_id", "id_user", "datetime", "id_product")
+
+# Ordenado por (datetime, id): o índice de datetime de cada partição permite um
+# Merge Append sem ordenar o intervalo inteiro, e os itens de uma venda chegam juntos
+EXPORT_QUERY = text("""
+    SELECT s.id, s.id_user, s.datetime, ps.id_product
+    FROM sales s
+    LEFT JOIN product_sales ps ON ps.id_sale = s.id
+    WHERE s.datetime >= :start_datetime AND s.datetime < :end_datetime
+    ORDER BY s.datetime, s.id;
+""")
+
+
+def group_sale_rows(rows: Iterable[Tuple[int, int, datetime, Any]]) -> Iterator[Dict[str, Any]]:
+    """ Junta as linhas consecutivas de uma mesma venda em {"id", "id_user", "datetime", "products"}. """
+    sale = None
+    for id_sale, id_user, sale_datetime, id_product in rows:
+        if sale is None or sale["id"] != id_sale:
+            if sale is not None:
+                yield sale
+            sale = {"id": id_sale, "id_user": id_user, "datetime": sale_datetime.isoformat(), "products": []}
+        if id_product is not None:
+            sale["products"].append(id_product)
+    if sale is not None:
+        yield sale
+
+
+def ndjson_lines(sales: List[Dict[str, Any]]) -> str:
+    return "".join(json.dumps(sale, separators=(",", ":")) + "\n" for sale in sales)
+
+
+def csv_lines(sales: List[Dict[str, Any]]) -> str:
+    """ Uma linha por item vendido; vendas sem itens saem com id_product vazio. """
+    output = io.StringIO()
+    writer = csv.writer(output, lineterminator="\n")
+    for sale in sales:
+        for id_product in sale["products"] or [None]:
+            writer.writerow((sale["id"], sale["id_user"], sale["datetime"], id_product))
+    return output.getvalue()
+
+
+FORMATTERS: Dict[str, Callable[[List[Dict[str, Any]]], str]] = {
+    "ndjson": ndjson_lines,
+    "csv": csv_lines,
+}
+
+
+async def stream_sales(start_date: str, end_date: str, export_format: str = "ndjson") -> AsyncIterator[str]:
+    """ Gera o export de [start_date, end_date] em pedaços de ~EXPORT_CHUNK_BYTES.
+
+    Usa um cursor no servidor (`stream` com `yield_per`), então a memória fica
+    limitada a um lote de linhas independentemente do tamanho do intervalo. A
+    sessão é aberta aqui, e não por dependência, para durar até o fim da resposta.
+    """
+    formatter = FORMATTERS[export_format]
+    params = {
+        "start_datetime": datetime.combine(parse_date(start_date), time.min),
+        "end_datetime": datetime.combine(parse_date(end_date) + timedelta(days=1), time.min),
+    }
+    if export_format == "csv":
+        yield ",".join(CSV_HEADER) + "\n"
+
+    exported = 0
+    async with AsyncSessionLocal() as db:
+        try:
+            result = await db.stream(EXPORT_QUERY, params, execution_options={"yield_per": EXPORT_BATCH_SIZE})
+            pending: List[Dict[str, Any]] = []
+            pending_bytes = 0
+            carry: List[Tuple] = []
+            async for partition in result.partitions():
+                # A última venda do lote pode continuar no próximo: fica guardada até lá
+                rows = carry + list(partition)
+                last_sale = rows[-1][0]
+                carry = [row for row in rows if row[0] == last_sale]
+                for sale in group_sale_rows(row for row in rows if row[0] != last_sale):
+                    chunk = formatter([sale])
+                    pending.append(chunk)
+                    pending_bytes += len(chunk)
+                    exported += 1
+                if pending_bytes >= EXPORT_CHUNK_BYTES:
+                    yield "".join(pending)
+                    pending, pending_bytes = [], 0
+            for sale in group_sale_rows(carry):
+                pending.append(formatter([sale]))
+                exported += 1
+            if pending:
+                yield "".join(pending)
+            logger.info(f"Exported {exported} sales from {start_date} to {end_date} as {export_format}.")
+        except Exception as e:
+            logger.error(f"Internal error while exporting sales: {e}")
+            raise
@@ -0,0 +1,165 @@
+import asyncio
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from sqlalchemy import insert
+from app.database import AsyncSessionLocal
+from app.logger import logger
+from app.models.product_sales import ProductSales
+from app.models.sales import Sales
+
+INGEST_FLUSH_SIZE = int(os.getenv("INGEST_FLUSH_SIZE", "1000"))
+INGEST_FLUSH_INTERVAL_MS = float(os.getenv("INGEST_FLUSH_INTERVAL_MS", "200"))
+INGEST_MAX_PENDING = int(os.getenv("INGEST_MAX_PENDING", "50000"))
+# committed: responde depois do COMMIT do lote; buffered: responde ao entrar no buffer
+INGEST_DURABILITY = os.getenv("INGEST_DURABILITY", "committed")
+DURABILITY_MODES = ("committed", "buffered")
+
+
+class BufferFullError(Exception):
+    """ O buffer atingiu INGEST_MAX_PENDING vendas aguardando gravação. """
+
+
+class SalesWriteBuffer:
+    """ Acumula as vendas recebidas pela API e grava em lotes.
+
+    O lote é gravado quando atinge `flush_size` vendas ou a cada
+    `flush_interval_ms`, em uma única transação com INSERTs de várias linhas
+    em `sales` (ids devolvidos na ordem do lote) e em `product_sales`. Se o
+    lote falhar, cada requisição é regravada sozinha para que apenas a
+    inválida receba o erro.
+    """
+
+    def __init__(self, session_factory: Callable = AsyncSessionLocal, flush_size: int = INGEST_FLUSH_SIZE,
+                 flush_interval_ms: float = INGEST_FLUSH_INTERVAL_MS, max_pending: int = INGEST_MAX_PENDING):
+        self.session_factory = session_factory
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_pending = max_pending
+        self._pending: List[Tuple[List[Dict[str, Any]], Optional[asyncio.Future]]] = []
+        self._pending_sales = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._closing = False
+        self.flushed_sales = 0
+        self.flushed_batches = 0
+        self.failed_sales = 0
+        self.last_flush_ms = 0.0
+
+    @property
+    def pending(self) -> int:
+        return self._pending_sales
+
+    def _start(self) -> None:
+        if self._flusher is None or self._flusher.done():
+            self._wakeup = asyncio.Event()
+            self._flush_lock = asyncio.Lock()
+            self._flusher = asyncio.create_task(self._run())
+
+    async def submit(self, sales: List[Dict[str, Any]], wait: bool = True) -> Optional[List[int]]:
+        """ Enfileira as vendas; com `wait` aguarda o COMMIT e devolve os ids gerados. """
+        if self._pending_sales + len(sales) > self.max_pending:
+            raise BufferFullError(f"{self._pending_sales} sales already waiting to be written.")
+        self._start()
+        future = asyncio.get_running_loop().create_future() if wait else None
+        self._pending.append((sales, future))
+        self._pending_sales += len(sales)
+        if self._pending_sales >= self.flush_size:
+            self._wakeup.set()
+        return await future if future is not None else None
+
+    async def _run(self) -> None:
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing sales buffer: {e}")
+
+    async def flush(self) -> int:
+        """ Grava tudo o que está no buffer; devolve o número de vendas gravadas. """
+        if self._flush_lock is None:
+            return 0
+        async with self._flush_lock:
+            batch, self._pending, self._pending_sales = self._pending, [], 0
+            if not batch:
+                return 0
+            started = time.perf_counter()
+            try:
+                ids = await self._write([sale for sales, _ in batch for sale in sales])
+                written = len(ids)
+                for sales, future in batch:
+                    self._resolve(future, ids[:len(sales)])
+                    ids = ids[len(sales):]
+            except Exception as e:
+                logger.warning(f"Batch of {len(batch)} requests failed ({e}); retrying each request.")
+                written = 0
+                for sales, future in batch:
+                    try:
+                        self._resolve(future, await self._write(sales))
+                        written += len(sales)
+                    except Exception as error:
+                        self.failed_sales += len(sales)
+                        logger.error(f"Rejected {len(sales)} sales: {error}")
+                        if future is not None and not future.done():
+                            future.set_exception(error)
+            self.flushed_sales += written
+            self.flushed_batches += 1
+            self.last_flush_ms = round((time.perf_counter() - started) * 1000, 2)
+            return written
+
+    @staticmethod
+    def _resolve(future: Optional[asyncio.Future], ids: List[int]) -> None:
+        if future is not None and not future.done():
+            future.set_result(ids)
+
+    async def _write(self, sales: List[Dict[str, Any]]) -> List[int]:
+        async with self.session_factory() as db:
+            try:
+                result = await db.execute(
+                    insert(Sales).returning(Sales.id, sort_by_parameter_order=True),
+                    [{"id_user": sale["id_user"], "datetime": sale["datetime"]} for sale in sales],
+                )
+                ids = list(result.scalars().all())
+                # Os itens entram na mesma transação da venda: o change log registra
+                # a data pelo trigger de `sales`, e product_sales não tem trigger de INSERT
+                await db.execute(insert(ProductSales), [
+                    {"id_sale": id_sale, "id_product": item["id_product"]}
+                    for id_sale, sale in zip(ids, sales)
+                    for item in sale["products"]
+                    for _ in range(item.get("quantity", 1))
+                ])
+                await db.commit()
+                return ids
+            except Exception:
+                await db.rollback()
+                raise
+
+    async def close(self) -> None:
+        """ Grava o que restou no buffer e encerra a tarefa de flush. """
+        self._closing = True
+        if self._flusher is not None and not self._flusher.done():
+            self._wakeup.set()
+            await self._flusher
+        await self.flush()
+        self._closing = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": self._pending_sales,
+            "flushed_sales": self.flushed_sales,
+            "flushed_batches": self.flushed_batches,
+            "failed_sales": self.failed_sales,
+            "last_flush_ms": self.last_flush_ms,
+            "flush_size": self.flush_size,
+            "flush_interval_ms": self.flush_interval * 1000,
+            "durability": INGEST_DURABILITY,
+        }
+
+
+sales_write_buffer = SalesWriteBuffer()
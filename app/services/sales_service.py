@@ -1,42 +1,71 @@
-from typing import Optional, List, Dict, Union
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from datetime import date, datetime, time
+from typing import Optional, List, Dict, Tuple, Union
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select
 from sqlalchemy.sql import text
 from app.logger import logger  
 from app.models.sales import Sales
 from app.models.users import Users
-from app.utils.date_utils import validate_dates
+from app.services.result_cache import cached
+from app.services.single_flight import single_flight
+from app.services.window_results import precomputed
+from app.services.rollup import rollup_source
+from app.services.sales_cube import sales_cube
+from app.services.top_customer_engine import find_top_customer, find_top_customers
+from app.utils.date_utils import validate_dates, parse_date
 
-def get_sales_summary(db: Session, start_date: str, end_date: str) -> int:
+# Sem pré-cálculo: a contagem lê `sales` diretamente e deve refletir as vendas recém-inseridas
+@single_flight()
+async def get_sales_summary(db: AsyncSession, start_date: str, end_date: str) -> int:
     logger.info(f"Querying total sales from {start_date} to {end_date}")
     validate_dates(start_date, end_date)   
     try:
         total_sales = (
-            db.query(func.count(Sales.id))
-            .filter(Sales.datetime.between(start_date, end_date))
-            .scalar()
-        ) or None
+            await db.execute(
+                select(func.count(Sales.id))
+                .where(Sales.datetime.between(
+                    datetime.combine(parse_date(start_date), time.min),
+                    datetime.combine(parse_date(end_date), time.min),
+                ))
+            )
+        ).scalar() or None
         logger.info(f"Total sales found: {total_sales}")
         return total_sales
     except Exception as e:
         logger.error(f"Internal error while fetching total sales: {e}")
         return None
 
-def get_top_product(db: Session, start_date: str, end_date: str) -> Optional[Dict[str, Union[str, int]]]:
+@precomputed("top-product")
+@cached("product_sales_aggregated")
+@single_flight("product_sales_aggregated")
+async def get_top_product(db: AsyncSession, start_date: str, end_date: str) -> Optional[Dict[str, Union[str, int]]]:
     logger.info(f"Querying top product from {start_date} to {end_date}")
     validate_dates(start_date, end_date)   
     
     try:
-        result = db.execute(
-            text("""
-                SELECT id_product, description, SUM(total_sold) AS total_sold
-                FROM product_sales_aggregated
-                WHERE sale_date BETWEEN :start_date AND :end_date
-                GROUP BY id_product, description
-                ORDER BY total_sold DESC
+        hit, top_product = sales_cube.top_product(parse_date(start_date), parse_date(end_date))
+        if hit:
+            logger.info(f"Top product answered from the sales cube: {top_product}")
+            return top_product
+
+        source, params = rollup_source(
+            "product_sales_aggregated", "id_product, total_sold",
+            parse_date(start_date), parse_date(end_date)
+        )
+        # Mesmo critério do cubo: soma por produto, empate resolvido pelo menor id e
+        # o nome atual do produto
+        result = (await db.execute(
+            text(f"""
+                SELECT agg.id_product, COALESCE(product.description, CAST(agg.id_product AS TEXT)),
+                       SUM(agg.total_sold) AS total_sold
+                FROM {source} AS agg
+                LEFT JOIN product ON product.id = agg.id_product
+                GROUP BY agg.id_product, product.description
+                HAVING SUM(agg.total_sold) > 0
+                ORDER BY total_sold DESC, agg.id_product
                 LIMIT 1;
-            """), {"start_date": start_date, "end_date": end_date}
-        ).fetchone()
+            """), params
+        )).fetchone()
 
         if result:
             id_product, product_description, total_sold = result
@@ -49,25 +78,36 @@ def get_top_product(db: Session, start_date: str, end_date: str) -> Optional[Dic
         logger.error(f"Internal error while fetching top product: {e}")
         return None     
     
-def get_top_customer(db: Session, start_date: str, end_date: str) -> Optional[Dict[str, Union[str, int]]]:
+async def _scan_top_customer(db: AsyncSession, start_date: str, end_date: str) -> Optional[Tuple[int, int]]:
+    source, params = rollup_source(
+        "customer_purchases_aggregated", "id_user, total_purchases",
+        parse_date(start_date), parse_date(end_date)
+    )
+    return (await db.execute(
+        text(f"""
+            SELECT id_user, SUM(total_purchases) AS total_purchases
+            FROM {source} AS agg
+            GROUP BY id_user
+            ORDER BY total_purchases DESC, id_user
+            LIMIT 1;
+        """), params
+    )).fetchone()
+
+@precomputed("top-customer")
+@cached("customer_purchases_aggregated")
+@single_flight("customer_purchases_aggregated")
+async def get_top_customer(db: AsyncSession, start_date: str, end_date: str) -> Optional[Dict[str, Union[str, int]]]:
     logger.info(f"Consultando top customer de {start_date} a {end_date}")
     validate_dates(start_date, end_date)   
 
     try:
-        top_customer = db.execute(
-            text("""
-                SELECT id_user, SUM(total_purchases) AS total_purchases
-                FROM customer_purchases_aggregated
-                WHERE sale_date BETWEEN :start_date AND :end_date
-                GROUP BY id_user
-                ORDER BY total_purchases DESC
-                LIMIT 1;
-            """), {"start_date": start_date, "end_date": end_date}
-        ).fetchone()
+        top_customer = await find_top_customer(db, parse_date(start_date), parse_date(end_date))
+        if top_customer is None:
+            top_customer = await _scan_top_customer(db, start_date, end_date)
 
         if top_customer:
             id_user, total_purchases = top_customer
-            customer = db.query(Users).filter(Users.id == id_user).first()
+            customer = await db.get(Users, id_user)
 
             if customer:
                 result = {"top_customer": customer.name, "cpf": customer.cpf, "total_purchases": total_purchases}
@@ -80,20 +120,125 @@ def get_top_customer(db: Session, start_date: str, end_date: str) -> Optional[Di
         logger.error(f"Erro ao buscar top customer: {e}")
         return None
 
-def get_revenue_by_category(db: Session, start_date: str, end_date: str) -> List[Dict[str, Union[str, float]]]:
+def _competition_ranks(totals: List[Union[int, float]]) -> List[int]:
+    """ Ranking "1224": empates dividem a posição e a próxima posição é pulada. """
+    ranks = []
+    for position, total in enumerate(totals, start=1):
+        ranks.append(ranks[-1] if ranks and totals[position - 2] == total else position)
+    return ranks
+
+@precomputed("top-products")
+@cached("product_sales_aggregated")
+@single_flight("product_sales_aggregated")
+async def get_top_products(db: AsyncSession, start_date: str, end_date: str, k: int = 10, category_id: Optional[int] = None) -> List[Dict[str, Union[str, int]]]:
+    logger.info(f"Querying top {k} products from {start_date} to {end_date} (category: {category_id})")
+    validate_dates(start_date, end_date)
+
+    try:
+        source, params = rollup_source(
+            "product_sales_aggregated", "id_product, total_sold",
+            parse_date(start_date), parse_date(end_date)
+        )
+        category_filter = ""
+        if category_id is not None:
+            category_filter = "WHERE product.id_category = :category_id"
+            params["category_id"] = category_id
+        # Nome atual do produto, como em get_top_product e no cubo
+        rows = (await db.execute(
+            text(f"""
+                SELECT agg.id_product, COALESCE(product.description, CAST(agg.id_product AS TEXT)),
+                       SUM(agg.total_sold) AS total_sold
+                FROM {source} AS agg
+                LEFT JOIN product ON product.id = agg.id_product
+                {category_filter}
+                GROUP BY agg.id_product, product.description
+                ORDER BY total_sold DESC, agg.id_product
+                LIMIT :k;
+            """), {**params, "k": k}
+        )).fetchall()
+
+        ranks = _competition_ranks([total_sold for _, _, total_sold in rows])
+        result = [
+            {"rank": rank, "product_id": id_product, "product": description, "total_sold": total_sold}
+            for rank, (id_product, description, total_sold) in zip(ranks, rows)
+        ]
+        logger.info(f"Top {k} products found: {len(result)}")
+        return result
+    except Exception as e:
+        logger.error(f"Internal error while fetching top products: {e}")
+        return []
+
+@precomputed("top-customers")
+@cached("customer_purchases_aggregated")
+@single_flight("customer_purchases_aggregated")
+async def get_top_customers(db: AsyncSession, start_date: str, end_date: str, k: int = 10) -> List[Dict[str, Union[str, int]]]:
+    logger.info(f"Querying top {k} customers from {start_date} to {end_date}")
+    validate_dates(start_date, end_date)
+
+    try:
+        rows = await find_top_customers(db, parse_date(start_date), parse_date(end_date), k)
+        if rows is None:
+            source, params = rollup_source(
+                "customer_purchases_aggregated", "id_user, total_purchases",
+                parse_date(start_date), parse_date(end_date)
+            )
+            rows = (await db.execute(
+                text(f"""
+                    SELECT id_user, SUM(total_purchases) AS total_purchases
+                    FROM {source} AS agg
+                    GROUP BY id_user
+                    ORDER BY total_purchases DESC, id_user
+                    LIMIT :k;
+                """), {**params, "k": k}
+            )).fetchall()
+        if not rows:
+            return []
+
+        # Uma única consulta para os nomes dos K clientes
+        users = {
+            id_user: (name, cpf)
+            for id_user, name, cpf in (await db.execute(
+                select(Users.id, Users.name, Users.cpf).where(Users.id.in_([id_user for id_user, _ in rows]))
+            )).fetchall()
+        }
+        ranks = _competition_ranks([total_purchases for _, total_purchases in rows])
+        result = [
+            {"rank": rank, "customer_id": id_user, "customer": users[id_user][0], "cpf": users[id_user][1], "total_purchases": total_purchases}
+            for rank, (id_user, total_purchases) in zip(ranks, rows)
+            if id_user in users
+        ]
+        logger.info(f"Top {k} customers found: {len(result)}")
+        return result
+    except Exception as e:
+        logger.error(f"Internal error while fetching top customers: {e}")
+        return []
+
+@precomputed("revenue-by-category")
+@cached("category_revenue_aggregated")
+@single_flight("category_revenue_aggregated")
+async def get_revenue_by_category(db: AsyncSession, start_date: str, end_date: str) -> List[Dict[str, Union[str, float]]]:
     logger.info(f"Querying revenue by category from {start_date} to {end_date}")
     validate_dates(start_date, end_date)   
 
     try:
-        revenue = db.execute(
-            text("""
+        hit, result = sales_cube.revenue_by_category(parse_date(start_date), parse_date(end_date))
+        if hit:
+            logger.info(f"Revenue by category answered from the sales cube: {len(result)} categories")
+            return result
+
+        source, params = rollup_source(
+            "category_revenue_aggregated", "category, total_revenue",
+            parse_date(start_date), parse_date(end_date)
+        )
+        revenue = (await db.execute(
+            text(f"""
                 SELECT category, SUM(total_revenue) AS total_revenue
-                FROM category_revenue_aggregated
-                WHERE sale_date BETWEEN :start_date AND :end_date
+                FROM {source} AS agg
                 GROUP BY category
-                ORDER BY total_revenue DESC;
-            """), {"start_date": start_date, "end_date": end_date}
-        ).fetchall()
+                HAVING SUM(total_revenue) > 0
+                ORDER BY total_revenue DESC, category;
+            """), params
+        )).fetchall()
 
         result = [{"category": cat, "total_revenue": rev} for cat, rev in revenue]
         logger.info(f"Revenue by category found: {result}")
@@ -102,14 +247,32 @@ def get_revenue_by_category(db: Session, start_date: str, end_date: str) -> List
         logger.error(f"Internal error while fetching revenue by category: {e}")
         return []
 
-def get_yearly_sales_average(db: Session) -> List[Dict[str, Union[int, int]]]:
-    logger.info("Querying yearly sales average via MATERIALIZED VIEW")
+@cached("sales_counter_monthly")
+@single_flight("sales_counter_monthly")
+async def get_yearly_sales_average(db: AsyncSession, today: Optional[date] = None) -> List[Dict[str, Union[int, int]]]:
+    logger.info("Querying yearly sales average via monthly sales counters")
 
     try:
-        yearly_avg = db.execute(
-            text("SELECT year, total_sales FROM yearly_total_sales ORDER BY year")
-        ).fetchall()
-        result = [{"year": int(year), "avg_sales": (total_sales / 12) if total_sales else 0} for year, total_sales in yearly_avg]
+        # Só meses fechados: o mês corrente ainda está acumulando vendas e puxaria a
+        # média do ano para baixo. O divisor vai do primeiro ao último mês fechado com
+        # vendas no ano, então um ano parcial não é dividido por 12 e um mês sem
+        # vendas no meio do período conta como zero
+        current_month = (today or date.today()).replace(day=1)
+        yearly_avg = (await db.execute(text("""
+            SELECT
+                EXTRACT(YEAR FROM sale_date)::INT AS year,
+                SUM(total_sales) AS total_sales,
+                EXTRACT(MONTH FROM MIN(sale_date))::INT AS first_month,
+                EXTRACT(MONTH FROM MAX(sale_date))::INT AS last_month
+            FROM sales_counter_monthly
+            WHERE sale_date < :current_month
+            GROUP BY 1
+            ORDER BY 1;
+        """), {"current_month": current_month})).fetchall()
+        result = []
+        for year, total_sales, first_month, last_month in yearly_avg:
+            months = last_month - first_month + 1
+            result.append({"year": int(year), "avg_sales": (total_sales / months) if total_sales else 0, "months": months})
 
         if len(result) > 0:
             logger.info(f"Média de vendas anuais encontrada: {result}")
@@ -0,0 +1,67 @@
+import asyncio
+from functools import wraps
+from typing import Any, Awaitable, Callable, Dict, Hashable
+from app.services.result_cache import result_cache
+
+
+class SingleFlight:
+    """ Faz chamadas concorrentes com a mesma chave compartilharem uma única execução.
+
+    A primeira chamada executa a consulta; as que chegam enquanto ela está em
+    andamento aguardam o mesmo resultado (ou a mesma exceção). Nada é guardado
+    depois que a execução termina: isso fica a cargo do cache de resultados.
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self._flights: Dict[Hashable, asyncio.Task] = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._flights.get(key) is task:
+            del self._flights[key]
+
+    async def run(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Any:
+        if not self.enabled:
+            return await call()
+        task = self._flights.get(key)
+        if task is None:
+            task = asyncio.ensure_future(call())
+            self._flights[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+            self.executions += 1
+            # Quem iniciou aguarda a tarefa diretamente: se for cancelado, a consulta
+            # (que usa a sua sessão) é cancelada junto
+            return await task
+
+        self.coalesced += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            # A execução compartilhada foi cancelada com quem a iniciou: executa por conta própria
+            if task.cancelled() and not asyncio.current_task().cancelling():
+                return await call()
+            raise
+
+    def stats(self) -> Dict[str, int]:
+        return {"in_flight": len(self._flights), "executions": self.executions, "coalesced": self.coalesced}
+
+
+coalescer = SingleFlight()
+
+
+def single_flight(*sources: str) -> Callable:
+    """ Decora uma função de serviço assíncrona `func(db, *args)` com o SingleFlight.
+
+    A chave é a mesma do cache mais as versões de `sources`: depois de uma
+    invalidação, novas chamadas não se juntam a uma execução iniciada antes dela.
+    Deve ficar abaixo de `@cached`, para que só as chamadas que erraram o cache se juntem.
+    """
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        async def wrapper(db, *args, **kwargs):
+            key = (func.__name__, *args, *sorted(kwargs.items()), result_cache.snapshot(sources))
+            return await coalescer.run(key, lambda: func(db, *args, **kwargs))
+        return wrapper
+    return decorator
@@ -0,0 +1,109 @@
+from collections import defaultdict
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import text
+from app.logger import logger
+from app.services.rollup import rollup_source
+from app.utils.date_utils import decompose_date_range, next_month
+
+# Tamanho das listas de candidatos gravadas por mês e por ano. Fixo, e usado também
+# pela migration que cria as listas: `_thresholds` supõe que toda lista gravada foi
+# cortada neste tamanho, e uma lista maior ou menor daria um limite errado
+TOP_CANDIDATES = 100
+
+
+def _expand_periods(ranges: List[Tuple[date, date]], step) -> List[date]:
+    periods = []
+    for first, last in ranges:
+        current = first
+        while current <= last:
+            periods.append(current)
+            current = step(current)
+    return periods
+
+
+def _thresholds(lists: Dict[Tuple[str, object], List[int]]) -> int:
+    """ Soma dos limites superiores de um cliente ausente de todas as listas.
+
+    Em uma lista completa (N entradas) quem não aparece comprou no máximo o N-ésimo valor;
+    uma lista com menos de N entradas já contém todos os compradores do período.
+    """
+    return sum(min(values) for values in lists.values() if len(values) >= TOP_CANDIDATES)
+
+
+async def find_top_customers(db: AsyncSession, start: date, end: date, k: int = 1) -> Optional[List[Tuple[int, int]]]:
+    """ Tenta provar os `k` maiores compradores de [start, end] usando as listas de candidatos.
+
+    Cada ano e mês inteiro do intervalo contribui com sua lista pré-calculada; os dias avulsos
+    (no máximo ~2 meses parciais) são ranqueados na hora. O vencedor entre os candidatos é
+    exato quando seu total supera a soma dos limites das listas. Retorna [(id_user, total), ...]
+    ordenado por total e id_user, ou None quando o limite não permite decidir e a consulta
+    completa é necessária.
+    """
+    if k > TOP_CANDIDATES:
+        return None
+
+    pieces = decompose_date_range(start, end)
+    years = _expand_periods(pieces["yearly"], lambda d: d.replace(year=d.year + 1))
+    months = _expand_periods(pieces["monthly"], next_month)
+    if not years and not months:
+        return None
+
+    lists: Dict[Tuple[str, object], List[Tuple[int, int]]] = defaultdict(list)
+    for period, periods in (("yearly", years), ("monthly", months)):
+        if not periods:
+            continue
+        rows = (await db.execute(
+            text(f"""
+                SELECT sale_date, id_user, total_purchases
+                FROM customer_top_candidates_{period}
+                WHERE sale_date = ANY(:periods);
+            """), {"periods": periods}
+        )).fetchall()
+        for sale_date, id_user, total_purchases in rows:
+            lists[(period, sale_date)].append((id_user, total_purchases))
+
+    for index, (first, last) in enumerate(pieces["daily"]):
+        rows = (await db.execute(
+            text("""
+                SELECT id_user, SUM(total_purchases) AS total_purchases
+                FROM customer_purchases_aggregated
+                WHERE sale_date BETWEEN :start_date AND :end_date
+                GROUP BY id_user
+                ORDER BY total_purchases DESC
+                LIMIT :limit;
+            """), {"start_date": first, "end_date": last, "limit": TOP_CANDIDATES}
+        )).fetchall()
+        lists[("daily", index)].extend((id_user, total_purchases) for id_user, total_purchases in rows)
+
+    candidates = sorted({id_user for entries in lists.values() for id_user, _ in entries})
+    if not candidates:
+        return None
+
+    source, params = rollup_source("customer_purchases_aggregated", "id_user, total_purchases", start, end)
+    best = (await db.execute(
+        text(f"""
+            SELECT id_user, SUM(total_purchases) AS total_purchases
+            FROM {source} AS agg
+            WHERE id_user = ANY(:candidates)
+            GROUP BY id_user
+            ORDER BY total_purchases DESC, id_user
+            LIMIT :k;
+        """), {**params, "candidates": candidates, "k": k}
+    )).fetchall()
+
+    bound = _thresholds({key: [total for _, total in entries] for key, entries in lists.items()})
+    # Empate com o limite não basta: quem está fora das listas pode ter o mesmo total e id menor
+    if not best or (len(best) < k and bound > 0) or best[-1][1] <= bound:
+        logger.info(f"Top-K engine could not settle the top {k} (bound={bound}); falling back to full scan.")
+        return None
+
+    logger.info(f"Top-K engine settled the top {k} from {len(candidates)} candidates (bound={bound}).")
+    return [(id_user, total_purchases) for id_user, total_purchases in best]
+
+
+async def find_top_customer(db: AsyncSession, start: date, end: date) -> Optional[Tuple[int, int]]:
+    """ Atalho de `find_top_customers` para o maior comprador do período. """
+    top = await find_top_customers(db, start, end, k=1)
+    return top[0] if top else None
@@ -0,0 +1,149 @@
+import inspect
+import json
+import os
+import time
+from datetime import date
+from decimal import Decimal
+from functools import wraps
+from threading import Lock
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import text
+from app.logger import logger
+from app.utils.date_utils import named_windows, parse_date
+
+WINDOW_RESULTS_TTL_SECONDS = float(os.getenv("WINDOW_RESULTS_TTL_SECONDS", "60"))
+
+WindowKey = Tuple[str, str]
+WindowRow = Tuple[str, str, date, date, Any]
+
+
+def to_json(value: Any) -> str:
+    def default(item: Any) -> Any:
+        if isinstance(item, Decimal):
+            return float(item)
+        if isinstance(item, date):
+            return item.isoformat()
+        raise TypeError(f"{type(item).__name__} is not JSON serializable")
+    return json.dumps(value, default=default, separators=(",", ":"))
+
+
+def window_for(start_date: str, end_date: str, today: Optional[date] = None) -> Optional[str]:
+    """ Nome da janela pré-calculada que cobre exatamente [start_date, end_date], se houver. """
+    try:
+        requested = (parse_date(start_date), parse_date(end_date))
+    except (AttributeError, ValueError):
+        return None
+    for name, window in named_windows(today).items():
+        if window == requested:
+            return name
+    return None
+
+
+class WindowResults:
+    """ Resultados pré-calculados das métricas para as janelas de `named_windows`.
+
+    O job grava em `window_results` (chave primária (window_name, metric)) e
+    carrega a cópia em memória do próprio processo; os demais processos leem a
+    tabela e mantêm a linha em memória por `ttl_seconds`. Uma linha só vale
+    para o intervalo em que foi calculada: na virada do dia "today" deixa de
+    casar até o próximo cálculo.
+    """
+
+    def __init__(self, ttl_seconds: float = WINDOW_RESULTS_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.enabled = True
+        self._entries: Dict[WindowKey, Tuple[date, date, Any, float]] = {}
+        self._lock = Lock()
+        self.memory_hits = 0
+        self.table_hits = 0
+        self.misses = 0
+
+    def load(self, rows: Iterable[WindowRow]) -> None:
+        """ Substitui a cópia em memória pelas linhas recém-calculadas. """
+        expires_at = time.monotonic() + self.ttl_seconds
+        entries = {(window, metric): (start, end, value, expires_at) for window, metric, start, end, value in rows}
+        with self._lock:
+            self._entries = entries
+
+    def _from_memory(self, key: WindowKey, start: date, end: date) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[3] <= time.monotonic() or entry[:2] != (start, end):
+                return False, None
+            self.memory_hits += 1
+            return True, entry[2]
+
+    async def get(self, db: AsyncSession, window: str, metric: str, start: date, end: date) -> Tuple[bool, Any]:
+        if not self.enabled:
+            return False, None
+        hit, value = self._from_memory((window, metric), start, end)
+        if hit:
+            return hit, value
+        try:
+            row = (await db.execute(text("""
+                SELECT result FROM window_results
+                WHERE window_name = :window AND metric = :metric
+                  AND start_date = :start_date AND end_date = :end_date;
+            """), {"window": window, "metric": metric, "start_date": start, "end_date": end})).fetchone()
+        except Exception as e:
+            # Nada mais rodou nesta sessão ainda: o rollback só limpa a transação abortada
+            logger.warning(f"Could not read precomputed {metric} for {window}: {e}")
+            await db.rollback()
+            row = None
+        if row is None:
+            with self._lock:
+                self.misses += 1
+            return False, None
+
+        value = json.loads(row[0]) if isinstance(row[0], str) else row[0]
+        with self._lock:
+            self._entries[(window, metric)] = (start, end, value, time.monotonic() + self.ttl_seconds)
+            self.table_hits += 1
+        return True, value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.memory_hits = self.table_hits = self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "ttl_seconds": self.ttl_seconds,
+                "memory_hits": self.memory_hits,
+                "table_hits": self.table_hits,
+                "misses": self.misses,
+            }
+
+
+window_results = WindowResults()
+
+
+def precomputed(metric: str) -> Callable:
+    """ Decora uma função de serviço `func(db, start_date, end_date, ...)`.
+
+    Quando o intervalo é uma das janelas conhecidas e os demais parâmetros
+    estão no padrão, responde com o resultado pré-calculado; caso contrário
+    (ou se ainda não houver resultado) chama a função.
+    """
+    def decorator(func: Callable) -> Callable:
+        defaults = {
+            name: parameter.default
+            for name, parameter in list(inspect.signature(func).parameters.items())[3:]
+        }
+
+        @wraps(func)
+        async def wrapper(db, start_date, end_date, *args, **kwargs):
+            window = None
+            if not args and all(defaults.get(name) == value for name, value in kwargs.items()):
+                window = window_for(start_date, end_date)
+            if window is not None:
+                hit, value = await window_results.get(db, window, metric, parse_date(start_date), parse_date(end_date))
+                if hit:
+                    return value
+            return await func(db, start_date, end_date, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -1 +1,2 @@
-from .date_utils import is_date_valid, is_start_date_lte_end_date, is_end_date_lte_today
\ No newline at end of file
+from .date_utils import is_date_valid, is_start_date_lte_end_date, is_end_date_lte_today, parse_date, validate_dates, decompose_date_range, named_windows, resolve_date_range
+from .sql_utils import sql_shape
\ No newline at end of file
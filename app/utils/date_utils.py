@@ -1,4 +1,6 @@
-from datetime import datetime
+from calendar import monthrange
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
 from app.logger import logger  
 from fastapi import HTTPException
 
@@ -17,6 +19,9 @@ def is_start_date_lte_end_date(start_date: str, end_date: str) -> bool:
 def is_end_date_lte_today(end_date: str) -> bool:
     return datetime.strptime(end_date, "%Y-%m-%d") <= datetime.today()
 
+def parse_date(value: str) -> date:
+    return datetime.strptime(value.strip(), "%Y-%m-%d").date()
+
 def validate_dates(start_date: str, end_date: str):
     if not (is_date_valid(start_date) and is_date_valid(end_date)):
         logger.error(f"Data inválida: {start_date} - {end_date}")
@@ -28,4 +33,66 @@ def validate_dates(start_date: str, end_date: str):
 
     if not is_end_date_lte_today(end_date):
         logger.error(f"End date greater than today: {end_date}")
-        raise HTTPException(status_code=400, detail="The end date cannot be greater than today.")
\ No newline at end of file
+        raise HTTPException(status_code=400, detail="The end date cannot be greater than today.")
+
+def month_end(day: date) -> date:
+    return day.replace(day=monthrange(day.year, day.month)[1])
+
+def next_month(day: date) -> date:
+    return month_end(day) + timedelta(days=1)
+
+def _append_period(ranges: List[Tuple[date, date]], period_start: date, follows) -> None:
+    """ Estende o último intervalo quando o período é contíguo a ele, senão abre um novo. """
+    if ranges and follows(ranges[-1][1]) == period_start:
+        ranges[-1] = (ranges[-1][0], period_start)
+    else:
+        ranges.append((period_start, period_start))
+
+def decompose_date_range(start: date, end: date) -> Dict[str, List[Tuple[date, date]]]:
+    """ Divide [start, end] em anos inteiros, meses inteiros e dias avulsos.
+
+    Os intervalos de "yearly" e "monthly" trazem o primeiro dia de cada período
+    (como gravado em sale_date nos rollups); os de "daily" são datas comuns.
+    Todos os intervalos são inclusivos.
+    """
+    pieces: Dict[str, List[Tuple[date, date]]] = {"yearly": [], "monthly": [], "daily": []}
+    cursor = start
+    while cursor <= end:
+        if cursor.month == 1 and cursor.day == 1 and date(cursor.year, 12, 31) <= end:
+            _append_period(pieces["yearly"], cursor, lambda d: d.replace(year=d.year + 1))
+            cursor = date(cursor.year + 1, 1, 1)
+        elif cursor.day == 1 and month_end(cursor) <= end:
+            _append_period(pieces["monthly"], cursor, next_month)
+            cursor = next_month(cursor)
+        else:
+            last = min(end, month_end(cursor))
+            pieces["daily"].append((cursor, last))
+            cursor = last + timedelta(days=1)
+    return pieces
+
+def named_windows(today: Optional[date] = None) -> Dict[str, Tuple[date, date]]:
+    """ Intervalos (inclusivos) das janelas mais consultadas, relativos a `today`. """
+    today = today or date.today()
+    previous_month_end = today.replace(day=1) - timedelta(days=1)
+    return {
+        "today": (today, today),
+        "last_7_days": (today - timedelta(days=6), today),
+        "last_30_days": (today - timedelta(days=29), today),
+        "last_90_days": (today - timedelta(days=89), today),
+        "month_to_date": (today.replace(day=1), today),
+        "year_to_date": (today.replace(month=1, day=1), today),
+        "previous_month": (previous_month_end.replace(day=1), previous_month_end),
+    }
+
+def resolve_date_range(start_date: Optional[str], end_date: Optional[str], window: Optional[str]) -> Tuple[str, str]:
+    """ Converte `window=` no intervalo correspondente; sem janela, exige start_date e end_date. """
+    if window is not None:
+        windows = named_windows()
+        if window not in windows:
+            logger.error(f"Unknown window: {window}")
+            raise HTTPException(status_code=400, detail=f"Unknown window. Use one of: {', '.join(windows)}.")
+        start, end = windows[window]
+        return start.isoformat(), end.isoformat()
+    if start_date is None or end_date is None:
+        raise HTTPException(status_code=400, detail="Provide start_date and end_date, or a window.")
+    return start_date, end_date
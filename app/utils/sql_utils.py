@@ -0,0 +1,9 @@
+import re
+
+
+def sql_shape(statement: str, max_length: int = 160) -> str:
+    """ Normaliza o SQL para uso como label: sem literais numéricos/strings e sem espaços repetidos. """
+    shape = re.sub(r"'[^']*'", "?", statement)
+    shape = re.sub(r"\b\d+\b", "?", shape)
+    shape = re.sub(r"\s+", " ", shape).strip()
+    return shape[:max_length]
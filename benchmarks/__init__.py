@@ -0,0 +1,2 @@
+from .report import percentile, summarize, compare_results
+from .load import run_benchmark
\ No newline at end of file
@@ -0,0 +1,107 @@
+"""Benchmark de carga dos endpoints /sales.
+
+Exemplos:
+    python -m benchmarks run --seed-db --scale 0.01 --concurrency 50 --duration 30 --output results.json
+    python -m benchmarks run --url http://localhost:8000 --range-mix week:0.7,year:0.3 --baseline baseline.json
+    python -m benchmarks compare baseline.json results.json --tolerance 0.15
+"""
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+from datetime import date
+
+from benchmarks.load import DEFAULT_RANGE_MIX, ENDPOINTS, parse_range_mix, run_benchmark
+from benchmarks.report import compare_results
+
+
+def seed_database(scale: float, seed: int, end_date: date):
+    """ Popula o banco com o seeder do projeto e recalcula as agregações. """
+    subprocess.run(
+        [sys.executable, "seed_data.py", "--scale", str(scale), "--seed", str(seed), "--end-date", end_date.isoformat()],
+        check=True,
+    )
+    from app.jobs import refresh_aggregated_tables
+    refresh_aggregated_tables()
+
+
+def print_report(results: dict):
+    print(f"{'endpoint':<22}{'req':>8}{'err':>6}{'rps':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'pool p95':>10}")
+    for name, metrics in results["endpoints"].items():
+        pool = metrics.get("pool_wait_ms", {}).get("p95", "-")
+        print(f"{name:<22}{metrics['requests']:>8}{metrics['errors']:>6}{metrics['throughput_rps']:>10}"
+              f"{metrics['p50_ms']:>10}{metrics['p95_ms']:>10}{metrics['p99_ms']:>10}{pool:>10}")
+
+
+def print_regressions(regressions: list) -> int:
+    if not regressions:
+        print("No regressions against the baseline.")
+        return 0
+    for item in regressions:
+        print(f"REGRESSION {item['endpoint']} {item['metric']}: {item['baseline']} -> {item['current']} ({item['change_pct']:+}%)")
+    return 1
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmark de carga da API de vendas.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Executa a carga e grava os resultados em JSON.")
+    run.add_argument("--endpoints", default=",".join(ENDPOINTS), help="Endpoints separados por vírgula.")
+    run.add_argument("--concurrency", type=int, default=50)
+    run.add_argument("--duration", type=float, default=30.0, help="Segundos de carga por endpoint.")
+    run.add_argument("--range-mix", type=parse_range_mix,
+                     default=",".join(f"{name}:{weight}" for name, weight in DEFAULT_RANGE_MIX.items()),
+                     help="Pesos dos tipos de intervalo (ex.: week:0.5,year:0.5).")
+    run.add_argument("--end-date", type=date.fromisoformat, default=date.today())
+    run.add_argument("--history-days", type=int, default=5 * 365)
+    run.add_argument("--seed", type=int, default=42)
+    run.add_argument("--url", help="Servidor já em execução; sem ele a API roda no mesmo processo.")
+    run.add_argument("--use-cache", action="store_true",
+                     help="Mantém ligados o cache de resultados, o single-flight, as janelas pré-calculadas e o "
+                          "cubo em memória (modo local; com --url vale a configuração do servidor).")
+    run.add_argument("--seed-db", action="store_true", help="Popula o banco antes de medir.")
+    run.add_argument("--scale", type=float, default=0.01, help="Escala usada com --seed-db.")
+    run.add_argument("--output", help="Arquivo JSON de saída.")
+    run.add_argument("--baseline", help="JSON de uma execução anterior para comparar.")
+    run.add_argument("--tolerance", type=float, default=0.2)
+
+    compare = commands.add_parser("compare", help="Compara dois arquivos de resultado.")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument("--tolerance", type=float, default=0.2)
+
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        with open(args.baseline) as baseline, open(args.current) as current:
+            return print_regressions(compare_results(json.load(baseline), json.load(current), args.tolerance))
+
+    endpoints = [name.strip() for name in args.endpoints.split(",")]
+    unknown = [name for name in endpoints if name not in ENDPOINTS]
+    if unknown:
+        parser.error(f"Unknown endpoints: {', '.join(unknown)}")
+
+    if args.seed_db:
+        seed_database(args.scale, args.seed, args.end_date)
+
+    results = asyncio.run(run_benchmark(
+        endpoints, args.concurrency, args.duration, args.range_mix, args.end_date,
+        args.history_days, args.seed, args.url, args.use_cache,
+    ))
+    results["meta"]["scale"] = args.scale if args.seed_db else None
+    print_report(results)
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            return print_regressions(compare_results(json.load(baseline), results, args.tolerance))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
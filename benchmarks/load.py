@@ -0,0 +1,174 @@
+import asyncio
+import random
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.report import percentile, summarize
+
+ENDPOINTS = {
+    "summary": "/sales/summary",
+    "top-product": "/sales/top-product",
+    "top-customer": "/sales/top-customer",
+    "revenue-by-category": "/sales/revenue-by-category",
+    "monthly-average": "/sales/monthly-average",
+    "top-products": "/sales/top-products",
+    "top-customers": "/sales/top-customers",
+}
+RANGELESS_ENDPOINTS = {"monthly-average"}
+
+# Tamanho (em dias, além do primeiro) de cada tipo de intervalo sorteado
+RANGE_SPANS = {"day": 0, "week": 6, "month": 29, "quarter": 89, "year": 364, "multi-year": 1824}
+DEFAULT_RANGE_MIX = {"day": 0.2, "week": 0.3, "month": 0.3, "year": 0.15, "multi-year": 0.05}
+
+POOL_PROBE_INTERVAL_SECONDS = 0.1
+
+
+def parse_range_mix(value: str) -> Dict[str, float]:
+    """ Converte "week:0.5,year:0.5" em {"week": 0.5, "year": 0.5}. """
+    mix = {}
+    for item in value.split(","):
+        name, weight = item.split(":")
+        if name not in RANGE_SPANS:
+            raise ValueError(f"Unknown range '{name}'. Use one of: {', '.join(RANGE_SPANS)}")
+        mix[name] = float(weight)
+    return mix
+
+
+def random_range(rng: random.Random, mix: Dict[str, float], end_date: date, history_days: int) -> Tuple[date, date]:
+    span = RANGE_SPANS[rng.choices(list(mix), weights=list(mix.values()))[0]]
+    end = end_date - timedelta(days=rng.randrange(max(1, history_days - span)))
+    return end - timedelta(days=span), end
+
+
+async def _client_loop(client: httpx.AsyncClient, path: str, with_range: bool, rng: random.Random,
+                       mix: Dict[str, float], end_date: date, history_days: int, deadline: float,
+                       latencies: List[float], counters: Dict[str, int]):
+    while time.perf_counter() < deadline:
+        params = {}
+        if with_range:
+            start, end = random_range(rng, mix, end_date, history_days)
+            params = {"start_date": start.isoformat(), "end_date": end.isoformat()}
+        started = time.perf_counter()
+        try:
+            response = await client.get(path, params=params)
+        except httpx.HTTPError:
+            counters["errors"] += 1
+            continue
+        if response.status_code >= 500:
+            counters["errors"] += 1
+            continue
+        if response.status_code == 404:
+            counters["not_found"] += 1
+        latencies.append((time.perf_counter() - started) * 1000)
+
+
+async def _probe_pool(engine, stop: asyncio.Event, waits: List[float], checked_out: List[int]):
+    """ Mede quanto tempo leva para obter uma conexão do pool enquanto a carga roda. """
+    while not stop.is_set():
+        started = time.perf_counter()
+        async with engine.connect():
+            waits.append((time.perf_counter() - started) * 1000)
+        checked_out.append(engine.pool.checkedout())
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=POOL_PROBE_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_endpoint(client: httpx.AsyncClient, name: str, concurrency: int, duration: float,
+                       mix: Dict[str, float], end_date: date, history_days: int, seed: int,
+                       engine=None) -> Dict[str, Any]:
+    latencies: List[float] = []
+    counters = {"errors": 0, "not_found": 0}
+    waits: List[float] = []
+    checked_out: List[int] = []
+
+    stop = asyncio.Event()
+    probe = asyncio.create_task(_probe_pool(engine, stop, waits, checked_out)) if engine is not None else None
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*(
+        _client_loop(client, ENDPOINTS[name], name not in RANGELESS_ENDPOINTS,
+                     random.Random(f"{seed}:{name}:{worker}"), mix, end_date, history_days,
+                     deadline, latencies, counters)
+        for worker in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    if probe is not None:
+        await probe
+
+    result = summarize(latencies, counters["errors"], elapsed)
+    result["not_found"] = counters["not_found"]
+    if engine is not None:
+        result["pool_wait_ms"] = {
+            "p50": round(percentile(waits, 50), 2),
+            "p95": round(percentile(waits, 95), 2),
+            "p99": round(percentile(waits, 99), 2),
+        }
+        result["pool_checked_out_max"] = max(checked_out, default=0)
+    return result
+
+
+def disable_cache_layers() -> None:
+    """ Desliga tudo o que responde sem executar a consulta: cache de resultados,
+    single-flight, janelas pré-calculadas e o cubo em memória.
+    """
+    from app.services.result_cache import result_cache
+    from app.services.sales_cube import sales_cube
+    from app.services.single_flight import coalescer
+    from app.services.window_results import window_results
+
+    result_cache.enabled = False
+    coalescer.enabled = False
+    window_results.enabled = False
+    sales_cube.enabled = False
+
+
+async def run_benchmark(endpoints: List[str], concurrency: int = 50, duration: float = 30.0,
+                        range_mix: Optional[Dict[str, float]] = None, end_date: Optional[date] = None,
+                        history_days: int = 5 * 365, seed: int = 42, url: Optional[str] = None,
+                        use_cache: bool = False) -> Dict[str, Any]:
+    """ Executa a carga em cada endpoint, um de cada vez, e devolve o relatório.
+
+    Sem `url` a aplicação roda no mesmo processo (via ASGI) e o pool do engine assíncrono
+    é amostrado; com `url` a carga vai para um servidor já em execução.
+    """
+    mix = range_mix or DEFAULT_RANGE_MIX
+    end_date = end_date or date.today()
+    engine = None
+
+    if url is None:
+        from main import app
+        from app.database import async_engine
+
+        if not use_cache:
+            disable_cache_layers()
+        engine = async_engine
+        transport = httpx.ASGITransport(app=app)
+        client = httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None)
+    else:
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        client = httpx.AsyncClient(base_url=url, timeout=None, limits=limits)
+
+    results = {}
+    async with client:
+        for name in endpoints:
+            results[name] = await run_endpoint(client, name, concurrency, duration, mix, end_date,
+                                               history_days, seed, engine)
+    return {
+        "meta": {
+            "concurrency": concurrency,
+            "duration_seconds": duration,
+            "range_mix": mix,
+            "end_date": end_date.isoformat(),
+            "history_days": history_days,
+            "seed": seed,
+            "target": url or "in-process",
+            "cache_layers": use_cache,
+        },
+        "endpoints": results,
+    }
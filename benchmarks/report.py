@@ -0,0 +1,56 @@
+from typing import Any, Dict, List
+
+# Métricas comparadas com o baseline: (nome, True se maior é pior)
+COMPARED_METRICS = (
+    ("p50_ms", True),
+    ("p95_ms", True),
+    ("p99_ms", True),
+    ("throughput_rps", False),
+)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """ Percentil por interpolação linear (mesmo critério do numpy.percentile padrão). """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * pct / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize(latencies_ms: List[float], errors: int, elapsed_seconds: float) -> Dict[str, Any]:
+    return {
+        "requests": len(latencies_ms) + errors,
+        "errors": errors,
+        "throughput_rps": round(len(latencies_ms) / elapsed_seconds, 2) if elapsed_seconds else 0.0,
+        "mean_ms": round(sum(latencies_ms) / len(latencies_ms), 2) if latencies_ms else 0.0,
+        "p50_ms": round(percentile(latencies_ms, 50), 2),
+        "p95_ms": round(percentile(latencies_ms, 95), 2),
+        "p99_ms": round(percentile(latencies_ms, 99), 2),
+        "max_ms": round(max(latencies_ms), 2) if latencies_ms else 0.0,
+    }
+
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float = 0.2) -> List[Dict[str, Any]]:
+    """ Lista as métricas que pioraram mais que `tolerance` (fração) em relação ao baseline. """
+    regressions = []
+    for endpoint, metrics in current.get("endpoints", {}).items():
+        reference = baseline.get("endpoints", {}).get(endpoint)
+        if not reference:
+            continue
+        for metric, higher_is_worse in COMPARED_METRICS:
+            before, after = reference.get(metric, 0), metrics.get(metric, 0)
+            if not before:
+                continue
+            change = (after - before) / before
+            if (change > tolerance) if higher_is_worse else (change < -tolerance):
+                regressions.append({
+                    "endpoint": endpoint,
+                    "metric": metric,
+                    "baseline": before,
+                    "current": after,
+                    "change_pct": round(change * 100, 1),
+                })
+    return regressions
@@ -1,8 +1,13 @@
 from fastapi import FastAPI
 import uvicorn
 from contextlib import asynccontextmanager
-from app.controllers import sales_router
-from app.jobs import start_scheduler, start_aggregated_table_scheduler, update_product_sales_aggregated, update_category_revenue_aggregated, update_top_customers_aggregated
+from app.controllers import sales_router, admin_router, health_router
+from app.jobs import start_aggregated_table_scheduler, start_partition_scheduler, start_warmup
+from app.jobs.job_runner import job_runner
+from app.database import engine, async_engine
+from app.metrics import setup_metrics, instrument_engine
+from app.admission import AdmissionMiddleware
+from app.services.sales_ingestion import sales_write_buffer
 from app.logger import logger
 
 
@@ -10,25 +15,38 @@ from app.logger import logger
 async def lifespan(app: FastAPI):
     logger.info("Starting the application...")
 
-    # Atualiza a tabela de agregação imediatamente ao iniciar
-    logger.info("Running initial update of aggregation table...")
-    update_product_sales_aggregated()
-    update_category_revenue_aggregated()
-    update_top_customers_aggregated()
-
-    # Inicia os jobs agendados
-    start_scheduler()
+    # Agenda os jobs; entre todos os processos, só o líder eleito os executa
     start_aggregated_table_scheduler()
+    start_partition_scheduler()
     logger.info("Scheduler started.")
+
+    # Partições e refresh inicial rodam em segundo plano: a aplicação já
+    # atende enquanto isso, e /health/ready informa o andamento
+    warmup = start_warmup()
     
     yield  # Aqui a aplicação continua rodando
     logger.info("Stopping the application...")
+    if not warmup.done():
+        logger.warning("Startup warm-up still running during shutdown.")
+    job_runner.shutdown()
+    await sales_write_buffer.close()
+    await async_engine.dispose()
 
 
 app = FastAPI(lifespan=lifespan)
 
+# Limita as requisições simultâneas que chegam ao pool e recusa com 503 o excesso
+app.add_middleware(AdmissionMiddleware)
+
+# Métricas Prometheus em /metrics (adicionado depois, mede também os 503 da admissão)
+setup_metrics(app)
+instrument_engine(engine, "sync")
+instrument_engine(async_engine.sync_engine, "async")
+
 # Incluindo as rotas no FastAPI
 app.include_router(sales_router)
+app.include_router(admin_router)
+app.include_router(health_router)
 
 if __name__ == "__main__":
     uvicorn.run(app, host="127.0.0.1", port=8000)
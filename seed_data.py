@@ -1,86 +1,236 @@
-from faker import Faker
-from sqlalchemy.orm import Session
-from sqlalchemy.exc import IntegrityError, SQLAlchemyError
-from app.database import SessionLocal, engine
-from app.models import Category, Product, Users, Sales, ProductSales
-from datetime import datetime
+"""Popula o banco com dados fictícios usando COPY em vários processos.
+
+Uso:
+    python seed_data.py --scale 0.1 --seed 42 --workers 8
+
+Com --scale 1 são gerados 1.000.000 de usuários e 50.000.000 de vendas (as 50
+categorias e os 1.000 produtos não escalam). O mesmo --seed, --scale e
+--end-date geram sempre o mesmo dataset, independente do número de workers:
+cada lote de ids tem seu próprio gerador aleatório.
+
+Os triggers do change log ficam desligados nas conexões de carga; as tabelas
+de agregação são recalculadas uma única vez no final, com o backfill.
+"""
+import argparse
+import calendar
+import csv
+import io
+import os
 import random
+from datetime import date, datetime, time, timedelta
+from multiprocessing import Pool
+from typing import Tuple
+
+import psycopg2
+from faker import Faker
 from tqdm import tqdm  # Biblioteca para barra de progresso
 
-fake = Faker()
+from app.database import DATABASE_URL, SessionLocal
+from app.jobs.backfill_aggregated_tables import backfill_aggregated_tables
+from app.jobs.manage_partitions import add_months, create_missing_partitions
+
+# Volumes com scale = 1
+TOTAL_USERS = 1_000_000
+TOTAL_SALES = 50_000_000
+TOTAL_CATEGORIES = 50
+TOTAL_PRODUCTS = 1000
+MAX_PRODUCTS_PER_SALE = 10  # também define o espaço de ids de product_sales (id_sale * 10 + item)
+
+CHUNK_SIZE = 100_000  # Registros por lote/COPY
+
+_connection = None
+
+
+def _init_worker():
+    """ Cada processo abre sua própria conexão (conexões não podem ser herdadas pelo fork).
+
+    Com `session_replication_role = replica` os triggers do change log não
+    disparam a cada lote: o trigger de product_sales procuraria cada venda em
+    todas as partições de `sales`, e o custo do lote cresceria com a tabela.
+    """
+    global _connection
+    _connection = psycopg2.connect(DATABASE_URL)
+    with _connection.cursor() as cursor:
+        cursor.execute("SET session_replication_role = replica;")
+    _connection.commit()
+
 
-# Criar sessão para inserção otimizada
-SessionLocal.configure(bind=engine)
-db: Session = SessionLocal()
+def _copy(table: str, columns: str, buffer: io.StringIO):
+    buffer.seek(0)
+    with _connection.cursor() as cursor:
+        cursor.copy_expert(f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+    _connection.commit()
 
-# Parâmetros de otimização
-BATCH_SIZE = 1000  # Número de registros por inserção
-TOTAL_SALES = 50_000_000  # Total de vendas
 
-def seed_categories_and_products():
+def _chunk_rng(seed: int, kind: str, chunk: int) -> random.Random:
+    return random.Random(f"{seed}:{kind}:{chunk}")
+
+
+def seed_categories_and_products(seed: int):
     """Cria categorias e produtos no banco de dados."""
-    categories = [Category(description=fake.word()) for _ in range(50)]
-    db.bulk_save_objects(categories)
-    db.commit()
+    rng = random.Random(f"{seed}:products")
+    fake = Faker()
+    fake.seed_instance(seed)
+
+    categories = io.StringIO()
+    csv.writer(categories, lineterminator="\n").writerows(
+        (id_category, fake.word()) for id_category in range(1, TOTAL_CATEGORIES + 1)
+    )
+    products = io.StringIO()
+    csv.writer(products, lineterminator="\n").writerows(
+        (id_product, rng.randint(1, TOTAL_CATEGORIES), fake.word(), round(rng.uniform(1.0, 100.0), 2))
+        for id_product in range(1, TOTAL_PRODUCTS + 1)
+    )
+
+    _init_worker()
+    _copy("category", "id, description", categories)
+    _copy("product", "id, id_category, description, price", products)
+
+
+def _seed_users_chunk(args: Tuple[int, int, int]) -> int:
+    seed, first_id, last_id = args
+    fake = Faker()
+    fake.seed_instance(f"{seed}:users:{first_id}")
+
+    buffer = io.StringIO()
+    # CPF derivado do id: único e reprodutível
+    csv.writer(buffer, lineterminator="\n").writerows(
+        (id_user, fake.name(), f"{id_user:011d}") for id_user in range(first_id, last_id + 1)
+    )
+    _copy("users", "id, name, cpf", buffer)
+    return last_id - first_id + 1
+
+
+def _generate_sales_chunk(args: Tuple[int, int, int, int, datetime, int]) -> Tuple[io.StringIO, io.StringIO]:
+    """ Gera em CSV as vendas [first_id, last_id] e seus itens.
+
+    Os ids de venda são atribuídos aqui, então os itens não precisam esperar o banco
+    devolver `sale.id`; o id de cada item é id_sale * MAX_PRODUCTS_PER_SALE + posição.
+    """
+    seed, first_id, last_id, total_users, start, span_seconds = args
+    rng = _chunk_rng(seed, "sales", first_id)
+
+    sales = io.StringIO()
+    product_sales = io.StringIO()
+    for id_sale in range(first_id, last_id + 1):
+        sold_at = start + timedelta(seconds=rng.randrange(span_seconds))
+        sales.write(f"{id_sale},{rng.randint(1, total_users)},{sold_at:%Y-%m-%d %H:%M:%S}\n")
+        for item in range(rng.randint(1, MAX_PRODUCTS_PER_SALE)):
+            product_sales.write(f"{id_sale * MAX_PRODUCTS_PER_SALE + item},{id_sale},{rng.randint(1, TOTAL_PRODUCTS)}\n")
+    return sales, product_sales
+
 
-    products = [Product(description=fake.word(), price=round(random.uniform(1.0, 100.0), 2), id_category=random.randint(1, 50)) for _ in range(1000)]
-    db.bulk_save_objects(products)
-    db.commit()
+def _seed_sales_chunk(args: Tuple[int, int, int, int, datetime, int]) -> int:
+    """ Gera e carrega as vendas [first_id, last_id] e seus itens. """
+    sales, product_sales = _generate_sales_chunk(args)
+    _copy("sales", "id, id_user, datetime", sales)
+    _copy("product_sales", "id, id_sale, id_product", product_sales)
+    _, first_id, last_id, *_ = args
+    return last_id - first_id + 1
 
-def seed_users():
+
+def scaled_totals(scale: float) -> Tuple[int, int]:
+    """ Número de usuários e de vendas para o fator de escala. """
+    return max(1, int(TOTAL_USERS * scale)), max(1, int(TOTAL_SALES * scale))
+
+
+def _chunks(total: int):
+    for first_id in range(1, total + 1, CHUNK_SIZE):
+        yield first_id, min(first_id + CHUNK_SIZE - 1, total)
+
+
+def seed_users(pool: Pool, seed: int, total_users: int):
     print("Inserting users...")
     """Cria usuários no banco de dados."""
-    users = [Users(name=fake.name(), cpf=fake.unique.ssn()) for _ in tqdm(range(1_000_000), desc="Inserindo usuários", unit=" usuários")]
-    db.bulk_save_objects(users)
-    db.commit()
-
-def seed_sales():
-    """Cria vendas e produtos relacionados com tratamento de erros."""
-    sales_batch = []
-    products_sales_batch = []
-    
-    with tqdm(total=TOTAL_SALES, desc="Inserindo vendas", unit=" vendas") as pbar:
-        for _ in range(TOTAL_SALES):
-            try:
-                sale = Sales(
-                    id_user=random.randint(1, 1_000_000),
-                    datetime=fake.date_time_between(start_date="-5y", end_date="now"),
-                )
-                db.add(sale)
-                db.commit()  # Salva o registro da venda
-                
-                # Criar de 1 a 10 produtos para cada venda
-                num_products = random.randint(1, 10)
-                for _ in range(num_products):
-                    product_sale = ProductSales(
-                        id_sale=sale.id,  # ID correto gerado pelo banco
-                        id_product=random.randint(1, 1000),
-                    )
-                    products_sales_batch.append(product_sale)
-                
-                # Inserir produtos em lotes
-                if len(products_sales_batch) >= BATCH_SIZE:
-                    db.bulk_save_objects(products_sales_batch)
-                    db.commit()
-                    products_sales_batch.clear()
-                    pbar.update(BATCH_SIZE)
-            
-            except IntegrityError as e:
-                print(f"Integrity error ignored: {e}")
-            except SQLAlchemyError as e:
-                print(f"SQLAlchemy error ignored: {e}")
-            except Exception as e:
-                print(f"Unexpected error ignored: {e}")
-
-        # Inserir registros restantes
-        if products_sales_batch:
-            try:
-                db.bulk_save_objects(products_sales_batch)
-                db.commit()
-            except Exception as e:
-                print(f"Unexpected error ignored: {e}")
+    tasks = [(seed, first_id, last_id) for first_id, last_id in _chunks(total_users)]
+    with tqdm(total=total_users, desc="Inserindo usuários", unit=" usuários") as pbar:
+        for inserted in pool.imap_unordered(_seed_users_chunk, tasks):
+            pbar.update(inserted)
+
+
+def years_before(day: date, years: int) -> date:
+    """ Mesmo dia `years` anos antes; 29/02 vira 28/02 quando o ano não é bissexto. """
+    year = day.year - years
+    return day.replace(year=year, day=min(day.day, calendar.monthrange(year, day.month)[1]))
+
+
+def sales_window(end_date: date, years: int) -> Tuple[datetime, int]:
+    """ Início das vendas e o tamanho, em segundos, do período até o fim de `end_date`. """
+    start = datetime.combine(years_before(end_date, years), time.min)
+    span_seconds = int((datetime.combine(end_date + timedelta(days=1), time.min) - start).total_seconds())
+    return start, span_seconds
+
+
+def sales_tasks(seed: int, total_sales: int, total_users: int, end_date: date, years: int):
+    start, span_seconds = sales_window(end_date, years)
+    return [
+        (seed, first_id, last_id, total_users, start, span_seconds)
+        for first_id, last_id in _chunks(total_sales)
+    ]
+
+
+def ensure_sales_partitions(first_day: date, last_day: date):
+    """ Cria as partições mensais de `sales` que faltam no período, antes do COPY. """
+    db = SessionLocal()
+    try:
+        created = create_missing_partitions(db, first_day, add_months(last_day, 1))
+        db.commit()
+    finally:
+        db.close()
+    if created:
+        print(f"Created {len(created)} sales partitions ({created[0]} .. {created[-1]}).")
+
+
+def seed_sales(pool: Pool, seed: int, total_sales: int, total_users: int, end_date: date, years: int):
+    """Cria vendas e produtos relacionados direto na tabela particionada `sales`."""
+    ensure_sales_partitions(years_before(end_date, years), end_date)
+    tasks = sales_tasks(seed, total_sales, total_users, end_date, years)
+    with tqdm(total=total_sales, desc="Inserindo vendas", unit=" vendas") as pbar:
+        for inserted in pool.imap_unordered(_seed_sales_chunk, tasks):
+            pbar.update(inserted)
+
+
+def reset_sequences():
+    """ Alinha as sequences aos ids pré-atribuídos para que inserts futuros não colidam. """
+    _init_worker()
+    with _connection.cursor() as cursor:
+        for table in ("category", "product", "users", "sales", "product_sales"):
+            cursor.execute(f"""
+                SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE((SELECT MAX(id) FROM {table}), 1));
+            """)
+    _connection.commit()
+
+
+def rebuild_aggregates(workers: int):
+    """ Recalcula as tabelas de agregação de uma vez, já que a carga não passou pelo change log. """
+    print("Rebuilding aggregated tables...")
+    result = backfill_aggregated_tables(workers=workers)
+    if "error" in result:
+        raise SystemExit(f"Backfill failed: {result['error']}")
+    print(f"Aggregated {result['dates']} dates in {result['partitions']} partitions.")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Popula o banco com dados fictícios reprodutíveis.")
+    parser.add_argument("--scale", type=float, default=1.0, help="Fator de escala (1 = 1M usuários e 50M vendas).")
+    parser.add_argument("--seed", type=int, default=42, help="Semente do gerador aleatório.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Número de processos de carga.")
+    parser.add_argument("--end-date", type=date.fromisoformat, default=date.today(),
+                        help="Última data das vendas (YYYY-MM-DD); fixe-a para datasets reprodutíveis.")
+    parser.add_argument("--years", type=int, default=5, help="Anos de histórico de vendas.")
+    parser.add_argument("--skip-dimensions", action="store_true", help="Não carrega categorias, produtos e usuários.")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    print("Starting data seed...")
-    #seed_categories_and_products()
-    #seed_users()
-    seed_sales()
+    args = parse_args()
+    total_users, total_sales = scaled_totals(args.scale)
+
+    print(f"Starting data seed (scale={args.scale}, seed={args.seed}, workers={args.workers})...")
+    with Pool(processes=args.workers, initializer=_init_worker) as pool:
+        if not args.skip_dimensions:
+            seed_categories_and_products(args.seed)
+            seed_users(pool, args.seed, total_users)
+        seed_sales(pool, args.seed, total_sales, total_users, args.end_date, args.years)
+    reset_sequences()
+    rebuild_aggregates(args.workers)
@@ -0,0 +1,168 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import asyncio
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.admission import ADMISSION_WEIGHTS, CHEAP, HEAVY, AdmissionController, AdmissionMiddleware, Overloaded, match_rule
+from app.services.dashboard_service import DASHBOARD_CONNECTIONS
+
+
+async def test_admits_up_to_capacity_then_queues():
+    controller = AdmissionController(capacity=2, max_queue=10, queue_timeout=1)
+    await controller.acquire("/a", CHEAP, 10)
+    await controller.acquire("/a", CHEAP, 10)
+
+    waiting = asyncio.create_task(controller.acquire("/a", CHEAP, 10))
+    await asyncio.sleep(0)
+    assert not waiting.done()
+    assert controller.stats()["queued"] == 1
+
+    controller.release("/a")
+    await waiting
+    assert controller.stats()["active"] == 2
+    assert controller.stats()["queued"] == 0
+
+
+async def test_cheap_requests_are_admitted_before_heavy_ones():
+    controller = AdmissionController(capacity=1, max_queue=10, queue_timeout=1)
+    await controller.acquire("/sales/top-product", CHEAP, 10)
+    order = []
+
+    async def request(route, priority):
+        await controller.acquire(route, priority, 10)
+        order.append(route)
+        controller.release(route)
+
+    heavy = asyncio.create_task(request("/sales/summary", HEAVY))
+    await asyncio.sleep(0)
+    cheap = asyncio.create_task(request("/sales/top-product", CHEAP))
+    await asyncio.sleep(0)
+
+    controller.release("/sales/top-product")
+    await asyncio.gather(heavy, cheap)
+
+    assert order == ["/sales/top-product", "/sales/summary"]
+
+
+async def test_route_limit_does_not_block_other_routes():
+    controller = AdmissionController(capacity=10, max_queue=10, queue_timeout=1)
+    await controller.acquire("/sales/export", HEAVY, 1)
+
+    blocked = asyncio.create_task(controller.acquire("/sales/export", HEAVY, 1))
+    await asyncio.sleep(0)
+    await asyncio.wait_for(controller.acquire("/sales/top-product", CHEAP, 10), timeout=0.1)
+
+    assert not blocked.done()
+    controller.release("/sales/export")
+    await blocked
+    assert controller.stats()["active_by_route"] == {"/sales/export": 1, "/sales/top-product": 1}
+
+
+async def test_full_queue_is_rejected_immediately():
+    controller = AdmissionController(capacity=1, max_queue=1, queue_timeout=1)
+    await controller.acquire("/a", CHEAP, 10)
+    waiting = asyncio.create_task(controller.acquire("/a", CHEAP, 10))
+    await asyncio.sleep(0)
+
+    with pytest.raises(Overloaded):
+        await controller.acquire("/a", CHEAP, 10)
+
+    assert controller.rejected == 1
+    controller.release("/a")
+    await waiting
+
+
+async def test_queue_timeout_rejects_and_frees_the_waiter():
+    controller = AdmissionController(capacity=1, max_queue=10, queue_timeout=0.01)
+    await controller.acquire("/a", CHEAP, 10)
+
+    with pytest.raises(Overloaded):
+        await controller.acquire("/a", CHEAP, 10)
+
+    controller.release("/a")
+    stats = controller.stats()
+    assert stats["active"] == 0
+    assert stats["queued"] == 0
+    assert stats["rejected"] == 1
+
+
+async def test_weighted_requests_take_one_slot_per_connection():
+    controller = AdmissionController(capacity=6, max_queue=10, queue_timeout=1)
+    await controller.acquire("/sales/dashboard", HEAVY, 16, weight=5)
+    await controller.acquire("/sales/top-product", CHEAP, 64)
+    assert controller.stats()["active"] == 6
+
+    second = asyncio.create_task(controller.acquire("/sales/dashboard", HEAVY, 16, weight=5))
+    await asyncio.sleep(0)
+    assert not second.done()
+
+    controller.release("/sales/dashboard", weight=5)
+    await second
+    assert controller.stats()["active"] == 6
+    assert controller.stats()["active_by_route"] == {"/sales/dashboard": 1, "/sales/top-product": 1}
+
+
+async def test_weight_above_capacity_takes_every_slot():
+    controller = AdmissionController(capacity=3, max_queue=10, queue_timeout=1)
+
+    await controller.acquire("/sales/dashboard", HEAVY, 16, weight=5)
+
+    assert controller.stats()["active"] == 3
+    controller.release("/sales/dashboard", weight=5)
+    assert controller.stats()["active"] == 0
+
+
+def test_dashboard_weight_matches_its_metric_sessions():
+    assert DASHBOARD_CONNECTIONS == 5
+    assert ADMISSION_WEIGHTS[("GET", "/sales/dashboard")] == DASHBOARD_CONNECTIONS
+
+
+def make_app(controller):
+    app = FastAPI()
+    app.add_middleware(AdmissionMiddleware, controller=controller)
+
+    @app.get("/sales/summary")
+    def summary():
+        return {"total_sales": 1}
+
+    @app.get("/sales/aggregates/{table}/export")
+    def export(table: str):
+        return {"table": table}
+
+    @app.get("/health")
+    def health():
+        return {"status": "ok"}
+
+    return app
+
+
+def test_middleware_sheds_with_503_and_retry_after():
+    controller = AdmissionController(capacity=0, max_queue=0, queue_timeout=2)
+    client = TestClient(make_app(controller))
+
+    response = client.get("/sales/summary")
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "2"
+    assert client.get("/health").status_code == 200
+
+
+def test_middleware_releases_slot_after_response():
+    controller = AdmissionController(capacity=1, max_queue=0, queue_timeout=1)
+    client = TestClient(make_app(controller))
+
+    assert client.get("/sales/summary").status_code == 200
+    assert client.get("/sales/aggregates/product_sales/export").status_code == 200
+    assert controller.stats()["active"] == 0
+    assert controller.admitted == 2
+
+
+def test_match_rule_uses_route_template():
+    app = make_app(AdmissionController())
+    scope = {"type": "http", "method": "GET", "path": "/sales/aggregates/product_sales/export", "app": app}
+
+    assert match_rule(scope) == ("/sales/aggregates/{table}/export", (HEAVY, 4))
+    assert match_rule({**scope, "path": "/health"}) is None
@@ -0,0 +1,70 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from datetime import date
+from decimal import Decimal
+from unittest.mock import MagicMock
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+import pyarrow.parquet as pq
+from app.services.aggregate_export import (
+    export_query, export_schema, iter_batches, period_start, rows_to_batch, write_batches
+)
+
+PRODUCT_ROWS = [
+    (date(2024, 1, 1), 1, "Arroz", 10),
+    (date(2024, 1, 1), 2, "Feijão", 7),
+    (date(2024, 1, 2), 1, "Arroz", 3),
+]
+
+
+def test_rows_to_batch_builds_typed_columns():
+    batch = rows_to_batch(PRODUCT_ROWS, export_schema("product_sales"))
+
+    assert batch.num_rows == 3
+    assert batch.column(2).to_pylist() == ["Arroz", "Feijão", "Arroz"]
+    assert batch.schema.field("sale_date").type == pa.date32()
+
+
+def test_revenue_keeps_decimal_precision():
+    batch = rows_to_batch([(date(2024, 1, 1), 3, "Bebidas", Decimal("1234.56"))], export_schema("category_revenue"))
+
+    assert batch.column(3).to_pylist() == [Decimal("1234.56")]
+
+
+@pytest.mark.parametrize("export_format", ["parquet", "arrow"])
+def test_write_batches_round_trip(tmp_path, export_format):
+    schema = export_schema("product_sales")
+    path = str(tmp_path / f"out.{export_format}")
+
+    rows = write_batches(iter([rows_to_batch(PRODUCT_ROWS[:2], schema), rows_to_batch(PRODUCT_ROWS[2:], schema)]),
+                         schema, path, export_format)
+
+    table = pq.read_table(path) if export_format == "parquet" else pa.ipc.open_file(path).read_all()
+    assert rows == 3
+    assert table.column("total_sold").to_pylist() == [10, 7, 3]
+
+
+def test_export_query_reads_rollup_for_granularity():
+    assert "FROM customer_purchases_aggregated_monthly " in export_query("customer_purchases", "monthly")
+    assert "FROM product_sales_aggregated WHERE" in export_query("product_sales", "daily")
+    assert period_start(date(2024, 5, 17), "monthly") == date(2024, 5, 1)
+    assert period_start(date(2024, 5, 17), "yearly") == date(2024, 1, 1)
+
+
+def test_iter_batches_uses_named_cursor_batches():
+    cursor = MagicMock()
+    cursor.fetchmany.side_effect = [PRODUCT_ROWS[:2], PRODUCT_ROWS[2:], []]
+    connection = MagicMock()
+    connection.cursor.return_value.__enter__.return_value = cursor
+    bind = MagicMock()
+    bind.raw_connection.return_value = connection
+
+    batches = list(iter_batches("product_sales", date(2024, 1, 1), date(2024, 1, 31), batch_rows=2, bind=bind))
+
+    assert [batch.num_rows for batch in batches] == [2, 1]
+    assert connection.cursor.call_args.kwargs["name"] == "export_product_sales"
+    cursor.execute.assert_called_once()
+    connection.close.assert_called_once()
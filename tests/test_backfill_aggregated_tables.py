@@ -0,0 +1,160 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from datetime import date, timedelta
+from unittest.mock import MagicMock, patch
+from app.jobs.backfill_aggregated_tables import (
+    backfill_aggregated_tables, changed_partition_ranges, months_between, partition_ranges
+)
+from app.jobs.refresh_aggregated_table import refresh_aggregated_tables
+
+
+PARTITIONS = [
+    {"name": "sales_2024_01", "range_start": date(2024, 1, 1), "range_end": date(2024, 2, 1)},
+    {"name": "sales_2024_02", "range_start": date(2024, 2, 1), "range_end": date(2024, 3, 1)},
+    {"name": "sales_2024_03", "range_start": date(2024, 3, 1), "range_end": date(2024, 4, 1)},
+]
+
+
+@patch("app.jobs.backfill_aggregated_tables.list_partitions", return_value=PARTITIONS)
+def test_partition_ranges_clips_to_requested_dates(list_partitions):
+    ranges = partition_ranges(MagicMock(), date(2024, 1, 20), date(2024, 2, 10))
+
+    assert ranges == [
+        ("sales_2024_01", date(2024, 1, 20), date(2024, 2, 1)),
+        ("sales_2024_02", date(2024, 2, 1), date(2024, 2, 11)),
+    ]
+    assert len(partition_ranges(MagicMock())) == 3
+
+
+def test_months_between_includes_partial_months():
+    assert months_between(date(2024, 1, 20), date(2024, 3, 2)) == [date(2024, 1, 1), date(2024, 2, 1), date(2024, 3, 1)]
+    assert months_between(date(2024, 1, 1), date(2025, 1, 1))[-1] == date(2024, 12, 1)
+
+
+@patch("app.jobs.backfill_aggregated_tables.SessionLocal")
+@patch("app.jobs.backfill_aggregated_tables.backfill_partition")
+@patch("app.jobs.backfill_aggregated_tables.list_partitions", return_value=PARTITIONS)
+def test_backfill_runs_every_partition_then_rebuilds_years(list_partitions, backfill_partition, session_local):
+    backfill_partition.side_effect = lambda name, start, end: {
+        "partition": name, "dates": (end - start).days, "rows": {"product_sales_aggregated": 10}, "elapsed_ms": 1.0,
+    }
+    db = MagicMock()
+    db.execute.return_value.rowcount = 3
+    session_local.return_value = db
+
+    result = backfill_aggregated_tables(workers=2)
+
+    assert backfill_partition.call_count == 3
+    assert result["partitions"] == 3
+    assert result["dates"] == 91
+    assert result["rows"]["product_sales_aggregated"] == 30
+    assert "error" not in result
+    statements = [str(call.args[0]) for call in db.execute.call_args_list]
+    assert any("INSERT INTO product_sales_aggregated_yearly" in sql for sql in statements)
+    yearly = next(call for call in db.execute.call_args_list if "DELETE FROM product_sales_aggregated_yearly" in str(call.args[0]))
+    assert yearly.args[1] == {"years": [date(2024, 1, 1)]}
+    db.commit.assert_called_once()
+
+
+@patch("app.jobs.backfill_aggregated_tables.SessionLocal")
+@patch("app.jobs.backfill_aggregated_tables.backfill_partition")
+@patch("app.jobs.backfill_aggregated_tables.list_partitions", return_value=PARTITIONS)
+def test_backfill_reports_failed_partitions(list_partitions, backfill_partition, session_local):
+    def run(name, start, end):
+        if name == "sales_2024_02":
+            raise RuntimeError("boom")
+        return {"partition": name, "dates": (end - start).days, "rows": {}, "elapsed_ms": 1.0}
+
+    backfill_partition.side_effect = run
+    session_local.return_value = MagicMock()
+
+    result = backfill_aggregated_tables(workers=3)
+
+    assert result["partitions"] == 2
+    assert "sales_2024_02: boom" in result["error"]
+
+
+@patch("app.jobs.backfill_aggregated_tables.list_partitions", return_value=PARTITIONS)
+def test_changed_partition_ranges_skips_partitions_without_changes(list_partitions):
+    dates = [date(2023, 6, 1), date(2024, 1, 5), date(2024, 1, 20), date(2024, 3, 31)]
+
+    assert changed_partition_ranges(MagicMock(), dates) == [
+        ("sales_2024_01", date(2024, 1, 5), date(2024, 1, 21)),
+        ("sales_2024_03", date(2024, 3, 31), date(2024, 4, 1)),
+    ]
+
+
+@patch("app.jobs.backfill_aggregated_tables.SessionLocal")
+@patch("app.jobs.backfill_aggregated_tables.backfill_partition")
+@patch("app.jobs.backfill_aggregated_tables.list_partitions", return_value=PARTITIONS)
+def test_backfill_for_dates_only_touches_their_partitions(list_partitions, backfill_partition, session_local):
+    backfill_partition.side_effect = lambda name, start, end: {
+        "partition": name, "dates": (end - start).days, "rows": {}, "elapsed_ms": 1.0,
+    }
+    session_local.return_value = MagicMock()
+
+    result = backfill_aggregated_tables(dates=[date(2024, 1, 5), date(2024, 3, 2)])
+
+    assert sorted(call.args[0] for call in backfill_partition.call_args_list) == ["sales_2024_01", "sales_2024_03"]
+    assert result["dates"] == 2
+
+
+@patch("app.jobs.backfill_aggregated_tables.list_partitions", return_value=PARTITIONS)
+@patch("app.jobs.backfill_aggregated_tables.backfill_aggregated_tables")
+@patch("app.jobs.refresh_aggregated_table.SessionLocal")
+def test_refresh_switches_to_backfill_for_large_changes(session_local, backfill, list_partitions):
+    # 91 datas nas partições de 2024 e 9 em abril, que não tem partição mensal
+    dates = [date(2024, 1, 1) + timedelta(days=offset) for offset in range(100)]
+    covered, leftover = dates[:91], dates[91:]
+    claims = [dates] * 3 + [leftover] * 3
+    default = MagicMock()
+    default.scalar.return_value = 0
+    default.rowcount = 0
+
+    def execute(statement, params=None):
+        if "DELETE FROM aggregate_changed_dates" in str(statement):
+            result = MagicMock()
+            result.fetchall.return_value = [(d,) for d in claims.pop(0)]
+            return result
+        return default
+
+    db = MagicMock()
+    db.execute.side_effect = execute
+    session_local.return_value = db
+    backfill.return_value = {"dates": 91, "partitions": 3, "timings_ms": {}, "rows": {"product_sales_aggregated": 5}}
+
+    result = refresh_aggregated_tables()
+
+    backfill.assert_called_once_with(dates=covered)
+    db.rollback.assert_called_once()
+    db.commit.assert_called_once()
+    assert claims == []
+    staging = next(call for call in db.execute.call_args_list if "CREATE TEMP TABLE refresh_staging" in str(call.args[0]))
+    assert staging.args[1]["dates"] == leftover
+    assert result["dates"] == 100
+    assert result["partitions"] == 3
+    assert result["rows"]["product_sales_aggregated"] == 5
+    assert "error" not in result
+
+
+@patch("app.jobs.backfill_aggregated_tables.list_partitions", return_value=[])
+@patch("app.jobs.backfill_aggregated_tables.backfill_aggregated_tables")
+@patch("app.jobs.refresh_aggregated_table.SessionLocal")
+def test_refresh_keeps_dates_outside_partitions_incremental(session_local, backfill, list_partitions):
+    dates = [date(2024, 1, 1) + timedelta(days=offset) for offset in range(100)]
+    claimed = MagicMock()
+    claimed.fetchall.return_value = [(d,) for d in dates]
+    claimed.scalar.return_value = 0
+    claimed.rowcount = 0
+    db = MagicMock()
+    db.execute.return_value = claimed
+    session_local.return_value = db
+
+    result = refresh_aggregated_tables()
+
+    backfill.assert_not_called()
+    db.rollback.assert_not_called()
+    db.commit.assert_called_once()
+    assert result["dates"] == 100
@@ -0,0 +1,84 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from datetime import date, datetime
+from unittest.mock import AsyncMock, MagicMock
+import pytest
+from fastapi import HTTPException
+from app.services.batch_service import run_batch
+from app.services.rollup import batch_rollup_source
+
+
+def result(rows):
+    mock = MagicMock()
+    mock.fetchall.return_value = rows
+    return mock
+
+
+def test_batch_rollup_source_tags_pieces_with_range_position():
+    sql, params = batch_rollup_source("category_revenue_aggregated", "category, total_revenue", [
+        (date(2024, 1, 1), date(2024, 12, 31)),
+        (date(2024, 3, 5), date(2024, 4, 30)),
+    ])
+
+    assert sql.count("UNION ALL") == 2
+    assert "JOIN category_revenue_aggregated_yearly AS piece" in sql
+    assert params["yearly_positions"] == [0]
+    assert params["monthly_positions"] == [1]
+    assert params["monthly_starts"] == [date(2024, 4, 1)]
+    assert params["daily_positions"] == [1]
+    assert params["daily_ends"] == [date(2024, 3, 31)]
+
+
+def test_batch_rollup_source_skips_empty_levels():
+    sql, params = batch_rollup_source("product_sales_aggregated", "id_product, total_sold", [
+        (date(2024, 1, 1), date(2024, 1, 7)),
+    ])
+
+    assert "UNION ALL" not in sql
+    assert set(params) == {"daily_positions", "daily_starts", "daily_ends"}
+
+
+async def test_run_batch_uses_one_statement_per_metric_in_request_order():
+    db = AsyncMock()
+    db.execute.side_effect = [
+        result([(1, 10), (2, 0)]),
+        result([(0, "Bebidas", 50.0), (0, "Limpeza", 20.0)]),
+    ]
+
+    results = await run_batch(db, [
+        ("summary", "2024-01-01", "2024-01-07"),
+        ("revenue-by-category", "2024-01-01", "2024-01-31"),
+        ("summary", "2024-01-08", "2024-01-14"),
+    ])
+
+    assert db.execute.call_count == 2
+    assert results == [
+        10,
+        [{"category": "Bebidas", "total_revenue": 50.0}, {"category": "Limpeza", "total_revenue": 20.0}],
+        0,
+    ]
+    summary_params = db.execute.call_args_list[0].args[1]
+    assert summary_params["starts"] == [datetime(2024, 1, 1), datetime(2024, 1, 8)]
+
+
+async def test_run_batch_top_product_leaves_empty_ranges_as_none():
+    db = AsyncMock()
+    db.execute.return_value = result([(1, 7, "Arroz", 30)])
+
+    results = await run_batch(db, [
+        ("top-product", "2024-01-01", "2024-01-07"),
+        ("top-product", "2024-02-01", "2024-02-07"),
+    ])
+
+    assert results == [None, {"product_id": 7, "top_product": "Arroz", "total_sold": 30}]
+
+
+async def test_run_batch_validates_every_range_before_querying():
+    db = AsyncMock()
+
+    with pytest.raises(HTTPException):
+        await run_batch(db, [("summary", "2024-01-01", "2024-01-07"), ("summary", "2024-02-10", "2024-02-01")])
+
+    db.execute.assert_not_called()
@@ -0,0 +1,94 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import random
+from datetime import date
+
+import httpx
+import pytest
+from unittest.mock import patch
+from benchmarks.load import disable_cache_layers, parse_range_mix, random_range, run_endpoint
+from benchmarks.report import compare_results, percentile, summarize
+
+
+def test_percentile_interpolates():
+    values = [float(v) for v in range(1, 101)]
+
+    assert percentile(values, 50) == pytest.approx(50.5)
+    assert percentile(values, 99) == pytest.approx(99.01)
+    assert percentile([], 95) == 0.0
+
+
+def test_summarize_counts_errors_and_throughput():
+    summary = summarize([10.0, 20.0, 30.0, 40.0], errors=1, elapsed_seconds=2.0)
+
+    assert summary["requests"] == 5
+    assert summary["errors"] == 1
+    assert summary["throughput_rps"] == 2.0
+    assert summary["p50_ms"] == 25.0
+
+
+def test_compare_results_flags_latency_and_throughput_regressions():
+    baseline = {"endpoints": {"summary": {"p50_ms": 10, "p95_ms": 20, "p99_ms": 30, "throughput_rps": 100}}}
+    current = {"endpoints": {"summary": {"p50_ms": 10.5, "p95_ms": 30, "p99_ms": 31, "throughput_rps": 70}}}
+
+    regressions = compare_results(baseline, current, tolerance=0.2)
+
+    assert [(item["endpoint"], item["metric"]) for item in regressions] == [
+        ("summary", "p95_ms"), ("summary", "throughput_rps"),
+    ]
+
+
+def test_random_range_respects_mix_and_end_date():
+    rng = random.Random(1)
+    for _ in range(50):
+        start, end = random_range(rng, parse_range_mix("week:1"), date(2024, 6, 30), 365)
+        assert (end - start).days == 6
+        assert end <= date(2024, 6, 30)
+
+
+def test_parse_range_mix_rejects_unknown_range():
+    with pytest.raises(ValueError):
+        parse_range_mix("decade:1")
+
+
+async def test_run_endpoint_collects_latencies():
+    seen = []
+
+    def handler(request):
+        seen.append(dict(request.url.params))
+        return httpx.Response(200, json={"total_sales": 1})
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://test") as client:
+        result = await run_endpoint(client, "summary", concurrency=2, duration=0.05,
+                                    mix={"day": 1.0}, end_date=date(2024, 6, 30), history_days=30, seed=1)
+
+    assert result["requests"] > 0
+    assert result["errors"] == 0
+    assert seen and seen[0]["start_date"] == seen[0]["end_date"]
+
+
+async def test_disable_cache_layers_turns_off_every_layer():
+    from app.services.result_cache import result_cache
+    from app.services.sales_cube import sales_cube
+    from app.services.single_flight import coalescer
+    from app.services.window_results import window_results
+
+    with patch.object(result_cache, "enabled", True), patch.object(coalescer, "enabled", True), \
+            patch.object(window_results, "enabled", True), patch.object(sales_cube, "enabled", True):
+        disable_cache_layers()
+
+        assert not result_cache.enabled
+        assert not coalescer.enabled
+        assert not window_results.enabled
+        assert sales_cube.stats()["enabled"] is False
+        assert await window_results.get(None, "last_7_days", "summary", date(2024, 6, 24), date(2024, 6, 30)) == (False, None)
+        calls = []
+
+        async def query():
+            calls.append(1)
+            return 1
+
+        assert await coalescer.run("key", query) == 1
+        assert coalescer.stats()["executions"] == 0
@@ -0,0 +1,86 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+import pytest
+from fastapi import HTTPException
+from app.services import dashboard_service
+from app.services.dashboard_service import get_dashboard
+
+
+@pytest.fixture
+def sessions():
+    """ Uma sessão falsa diferente por métrica. """
+    created = []
+
+    def factory():
+        session = MagicMock()
+        db = AsyncMock()
+        created.append(db)
+        session.__aenter__ = AsyncMock(return_value=db)
+        session.__aexit__ = AsyncMock(return_value=False)
+        return session
+
+    with patch("app.services.dashboard_service.AsyncSessionLocal", side_effect=factory):
+        yield created
+
+
+def patch_metrics(monkeypatch, **overrides):
+    defaults = {
+        "summary": AsyncMock(return_value=120),
+        "top_product": AsyncMock(return_value={"top_product": "Arroz"}),
+        "top_customer": AsyncMock(return_value={"top_customer": "Ana"}),
+        "revenue_by_category": AsyncMock(return_value=[{"category": "Bebidas", "total_revenue": 10.0}]),
+    }
+    defaults.update(overrides)
+    monkeypatch.setattr(dashboard_service, "RANGE_METRICS", defaults)
+    monkeypatch.setattr(dashboard_service, "GLOBAL_METRICS", {
+        "yearly_sales_average": AsyncMock(return_value=[{"year": 2024, "avg_sales": 10.0, "months": 12}]),
+    })
+    return defaults
+
+
+async def test_dashboard_runs_each_metric_on_its_own_session(monkeypatch, sessions):
+    metrics = patch_metrics(monkeypatch)
+
+    result = await get_dashboard("2024-01-01", "2024-01-31")
+
+    assert result["partial"] is False
+    assert result["metrics"]["summary"] == 120
+    assert result["metrics"]["yearly_sales_average"][0]["year"] == 2024
+    assert len(sessions) == 5
+    assert len({id(call.args[0]) for metric in metrics.values() for call in metric.call_args_list}) == 4
+    metrics["summary"].assert_awaited_once_with(metrics["summary"].call_args.args[0], "2024-01-01", "2024-01-31")
+
+
+async def test_slow_metric_times_out_without_blocking_the_rest(monkeypatch, sessions):
+    async def slow(db, start_date, end_date):
+        await asyncio.sleep(10)
+
+    patch_metrics(monkeypatch, top_customer=slow)
+
+    result = await asyncio.wait_for(get_dashboard("2024-01-01", "2024-01-31", timeout=0.05), timeout=1)
+
+    assert result["partial"] is True
+    assert result["errors"] == {"top_customer": "timeout"}
+    assert result["metrics"]["top_customer"] is None
+    assert result["metrics"]["top_product"] == {"top_product": "Arroz"}
+
+
+async def test_failing_metric_is_reported(monkeypatch, sessions):
+    patch_metrics(monkeypatch, summary=AsyncMock(side_effect=RuntimeError("boom")))
+
+    result = await get_dashboard("2024-01-01", "2024-01-31")
+
+    assert result["errors"] == {"summary": "error"}
+    assert result["metrics"]["revenue_by_category"]
+
+
+async def test_dashboard_validates_dates_first(monkeypatch, sessions):
+    patch_metrics(monkeypatch)
+
+    with pytest.raises(HTTPException):
+        await get_dashboard("2024-02-01", "2024-01-01")
+    assert sessions == []
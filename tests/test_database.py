@@ -0,0 +1,17 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.database.database import (
+    DB_ASYNC_MAX_OVERFLOW, DB_ASYNC_POOL_SIZE, DB_SYNC_MAX_OVERFLOW, DB_SYNC_POOL_SIZE, check_connection_budget
+)
+
+
+def test_connection_budget_is_split_between_workers():
+    assert check_connection_budget(100, max_connections=900, workers=8)
+    assert not check_connection_budget(100, max_connections=900, workers=10)
+
+
+def test_default_pools_fit_several_workers():
+    per_process = DB_SYNC_POOL_SIZE + DB_SYNC_MAX_OVERFLOW + DB_ASYNC_POOL_SIZE + DB_ASYNC_MAX_OVERFLOW
+    assert check_connection_budget(per_process, max_connections=900, workers=4)
@@ -0,0 +1,217 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import json
+from unittest.mock import MagicMock, patch
+import pytest
+from app.jobs import job_runner as job_runner_module
+from app.jobs.job_runner import JobRunner
+
+
+class FakeConnection:
+    """ Conexão que responde aos SQL do runner conforme o estado de FakeDatabase. """
+
+    def __init__(self, database):
+        self.database = database
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def execute(self, statement, params=None):
+        sql = str(statement)
+        params = params or {}
+        self.database.statements.append((sql, params))
+        result = MagicMock()
+        if "pg_try_advisory_lock" in sql:
+            acquired = params["name"] not in self.database.locks
+            if acquired:
+                self.database.locks[params["name"]] = self
+            result.scalar.return_value = acquired
+        elif "pg_advisory_unlock" in sql:
+            self.database.locks.pop(params["name"], None)
+        elif "INSERT INTO job_history" in sql:
+            self.database.next_id += 1
+            self.database.history[self.database.next_id] = {"job": params["job"], "instance": params["instance"]}
+            result.scalar.return_value = self.database.next_id
+        elif "UPDATE job_history" in sql:
+            self.database.history[params["id"]].update(params)
+        elif "MAX(id)" in sql:
+            result.scalar.return_value = self.database.next_id
+        elif "SELECT id FROM job_history" in sql:
+            result.fetchall.return_value = [
+                (run_id,) for run_id, run in self.database.history.items()
+                if run_id <= params["last_seen"] and run.get("status") == "running"
+                and run["instance"] != params["instance"]
+            ]
+        elif "SELECT id, job, status FROM job_history" in sql:
+            result.fetchall.return_value = [
+                (run_id, run["job"], run["status"]) for run_id, run in sorted(self.database.history.items())
+                if (run_id > params["last_seen"] or run_id in params["running"])
+                and run["instance"] != params["instance"]
+            ]
+        elif sql.strip() == "SELECT 1;" and self.database.broken:
+            self.database.broken = False
+            raise RuntimeError("connection lost")
+        return result
+
+    def commit(self):
+        pass
+
+    def invalidate(self):
+        # Como no Postgres: os locks de sessão caem junto com a conexão
+        self.database.locks = {name: owner for name, owner in self.database.locks.items() if owner is not self}
+
+    def close(self):
+        self.closed = True
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.locks = {}
+        self.history = {}
+        self.statements = []
+        self.next_id = 0
+        self.broken = False
+
+    def start_run(self, job, instance="other-host:1"):
+        """ Execução iniciada por outro processo. """
+        self.next_id += 1
+        self.history[self.next_id] = {"job": job, "instance": instance, "status": "running"}
+        return self.next_id
+
+    def connect(self):
+        return FakeConnection(self)
+
+
+@pytest.fixture
+def database():
+    return FakeDatabase()
+
+
+def test_run_exclusive_records_history_and_releases_lock(database):
+    runner = JobRunner(bind=database)
+
+    result = runner.run_exclusive("refresh", lambda: {"rows": {"product_sales_aggregated": 7}})
+
+    assert result == {"rows": {"product_sales_aggregated": 7}}
+    run = database.history[1]
+    assert run["status"] == "success"
+    assert json.loads(run["rows"]) == {"product_sales_aggregated": 7}
+    assert run["duration_ms"] >= 0
+    assert database.locks == {}
+
+
+def test_run_exclusive_skips_when_lock_is_held(database):
+    database.locks["aggregated_tables"] = object()
+    runner = JobRunner(bind=database)
+    func = MagicMock()
+
+    assert runner.run_exclusive("backfill", func, lock="aggregated_tables") is None
+    func.assert_not_called()
+    assert database.history == {}
+
+
+def test_run_exclusive_records_failures(database):
+    runner = JobRunner(bind=database)
+
+    def failing():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        runner.run_exclusive("refresh", failing)
+
+    assert database.history[1]["status"] == "error"
+    assert database.history[1]["error"] == "boom"
+    assert database.locks == {}
+
+
+def test_run_exclusive_marks_error_results(database):
+    runner = JobRunner(bind=database)
+
+    runner.run_exclusive("refresh", lambda: {"rows": {}, "error": "partial failure"})
+
+    assert database.history[1]["status"] == "error"
+    assert database.history[1]["error"] == "partial failure"
+
+
+def test_only_one_runner_becomes_leader(database):
+    first, second = JobRunner(bind=database), JobRunner(bind=database)
+
+    assert first.elect()
+    assert not second.elect()
+    func = MagicMock(return_value=1)
+    assert second.run_as_leader("refresh", func) is None
+    func.assert_not_called()
+
+    first.resign()
+    assert second.elect()
+
+
+def test_leader_that_loses_its_connection_reelects_on_a_new_one(database):
+    runner = JobRunner(bind=database)
+    runner.elect()
+    old_connection = runner._leader_connection
+    database.broken = True
+
+    assert runner.elect()
+
+    assert runner._leader_connection is not old_connection
+    assert old_connection.closed
+
+
+def test_sync_caches_invalidates_sources_of_runs_from_other_instances(database):
+    runner = JobRunner(bind=database)
+    database.next_id = 10
+
+    with patch.object(job_runner_module, "result_cache") as cache, \
+         patch.object(job_runner_module, "window_results") as windows, \
+         patch.object(job_runner_module, "sales_cube") as cube:
+        assert runner.sync_caches() == []
+        for job in ("refresh_aggregated_tables", "manage_partitions"):
+            database.history[database.start_run(job)]["status"] = "success"
+        assert runner.sync_caches() == ["refresh_aggregated_tables", "manage_partitions"]
+
+    invalidated = {call.args[0] for call in cache.invalidate.call_args_list}
+    assert invalidated == set(job_runner_module.JOB_CACHE_SOURCES["refresh_aggregated_tables"])
+    windows.load.assert_called_once_with([])
+    cube.reload.assert_called_once()
+    assert runner._last_seen_run == 12
+
+
+def test_sync_caches_picks_up_a_long_run_that_finishes_after_a_later_one(database):
+    runner = JobRunner(bind=database)
+
+    with patch.object(job_runner_module, "result_cache") as cache, \
+         patch.object(job_runner_module, "window_results"), \
+         patch.object(job_runner_module, "sales_cube") as cube:
+        runner.sync_caches()
+        refresh = database.start_run("refresh_aggregated_tables")
+        partitions = database.start_run("manage_partitions")
+        database.history[partitions]["status"] = "success"
+        assert runner.sync_caches() == ["manage_partitions"]
+        cache.invalidate.assert_not_called()
+
+        database.history[refresh]["status"] = "success"
+        assert runner.sync_caches() == ["refresh_aggregated_tables"]
+        assert runner.sync_caches() == []
+
+    invalidated = {call.args[0] for call in cache.invalidate.call_args_list}
+    assert invalidated == set(job_runner_module.JOB_CACHE_SOURCES["refresh_aggregated_tables"])
+    cube.reload.assert_called_once()
+
+
+def test_sync_caches_tracks_runs_already_in_progress_at_startup(database):
+    refresh = database.start_run("refresh_aggregated_tables")
+    runner = JobRunner(bind=database)
+
+    with patch.object(job_runner_module, "result_cache"), \
+         patch.object(job_runner_module, "window_results"), \
+         patch.object(job_runner_module, "sales_cube"):
+        assert runner.sync_caches() == []
+        database.history[refresh]["status"] = "success"
+        assert runner.sync_caches() == ["refresh_aggregated_tables"]
@@ -0,0 +1,112 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from datetime import date
+from unittest.mock import MagicMock
+import pytest
+from app.jobs.manage_partitions import (
+    add_months, archive_old_partitions, create_future_partitions, create_missing_partitions, list_partitions
+)
+
+
+def bound(start: str, end: str) -> str:
+    return f"FOR VALUES FROM ('{start} 00:00:00') TO ('{end} 00:00:00')"
+
+
+def session_with(*partitions):
+    db = MagicMock()
+    listing = MagicMock()
+    listing.fetchall.return_value = list(partitions)
+    db.execute.side_effect = [listing] + [MagicMock()] * 200
+    return db
+
+
+def executed(db):
+    return [str(call.args[0]) for call in db.execute.call_args_list[1:]]
+
+
+def test_add_months_crosses_years():
+    assert add_months(date(2025, 11, 15), 3) == date(2026, 2, 1)
+    assert add_months(date(2026, 1, 31), -1) == date(2025, 12, 1)
+    assert add_months(date(2026, 10, 18), 0) == date(2026, 10, 1)
+
+
+def test_list_partitions_parses_bounds_in_order():
+    db = session_with(
+        ("sales_2025_12", bound("2025-12-01", "2026-01-01"), 8192, 10),
+        ("sales_2025_11", bound("2025-11-01", "2025-12-01"), 4096, 5),
+    )
+
+    partitions = list_partitions(db)
+
+    assert [p["name"] for p in partitions] == ["sales_2025_11", "sales_2025_12"]
+    assert partitions[1]["range_end"] == date(2026, 1, 1)
+    assert partitions[0]["total_bytes"] == 4096
+
+
+def test_create_future_partitions_fills_gap_up_to_horizon():
+    db = session_with(("sales_2025_12", bound("2025-12-01", "2026-01-01"), 0, 0))
+
+    created = create_future_partitions(db, months_ahead=2, today=date(2026, 3, 10))
+
+    assert created == ["sales_2026_01", "sales_2026_02", "sales_2026_03", "sales_2026_04", "sales_2026_05"]
+    statements = executed(db)
+    assert sum("ATTACH PARTITION" in sql for sql in statements) == 5
+    assert any("ATTACH PARTITION sales_2026_05" in sql and "TO ('2026-06-01')" in sql for sql in statements)
+
+
+def test_create_future_partitions_is_idempotent():
+    db = session_with(("sales_2026_04", bound("2026-03-01", "2026-06-01"), 0, 0))
+
+    assert create_future_partitions(db, months_ahead=1, today=date(2026, 4, 2)) == []
+
+
+def test_create_future_partitions_dry_run_does_not_execute_ddl():
+    db = session_with()
+
+    created = create_future_partitions(db, months_ahead=0, today=date(2026, 10, 18), dry_run=True)
+
+    assert created == ["sales_2026_10"]
+    assert executed(db) == []
+
+
+def test_create_missing_partitions_fills_past_months():
+    db = session_with(("sales_2024_02", bound("2024-02-01", "2024-03-01"), 0, 0))
+
+    created = create_missing_partitions(db, date(2023, 12, 15), add_months(date(2024, 3, 31), 1))
+
+    assert created == ["sales_2023_12", "sales_2024_01", "sales_2024_03"]
+    assert sum("ATTACH PARTITION" in sql for sql in executed(db)) == 3
+
+
+def test_archive_old_partitions_detaches_months_before_cutoff():
+    db = session_with(
+        ("sales_2020_01", bound("2020-01-01", "2020-02-01"), 0, 0),
+        ("sales_2020_02", bound("2020-02-01", "2020-03-01"), 0, 0),
+        ("sales_2026_01", bound("2026-01-01", "2026-02-01"), 0, 0),
+    )
+
+    archived = archive_old_partitions(db, retention_months=60, mode="detach", today=date(2025, 2, 15))
+
+    assert archived == ["sales_2020_01"]
+    assert executed(db) == ["ALTER TABLE sales DETACH PARTITION sales_2020_01;"]
+
+
+def test_archive_old_partitions_merges_only_closed_years():
+    months = [(f"sales_2020_{m:02d}", bound(f"2020-{m:02d}-01", str(add_months(date(2020, m, 1), 1))), 0, 0)
+              for m in range(1, 13)]
+    db = session_with(*months, ("sales_2021_01", bound("2021-01-01", "2021-02-01"), 0, 0))
+
+    archived = archive_old_partitions(db, retention_months=1, mode="merge", today=date(2021, 3, 1))
+
+    assert archived == [name for name, *_ in months]
+    statements = executed(db)
+    assert statements[0].startswith("CREATE TABLE sales_2020 ")
+    assert any("ATTACH PARTITION sales_2020" in sql and "TO ('2021-01-01')" in sql for sql in statements)
+    assert not any("sales_2021_01" in sql for sql in statements)
+
+
+def test_archive_old_partitions_rejects_unknown_mode():
+    with pytest.raises(ValueError):
+        archive_old_partitions(session_with(), retention_months=12, mode="drop")
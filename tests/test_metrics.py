@@ -0,0 +1,99 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine, text
+from app.metrics import instrument_engine, setup_metrics, sql_shape, track_job
+
+
+def test_sql_shape_strips_literals_and_whitespace():
+    statement = """
+        SELECT id   FROM sales
+        WHERE datetime >= '2024-01-01' AND id = 42
+    """
+
+    assert sql_shape(statement) == "SELECT id FROM sales WHERE datetime >= ? AND id = ?"
+    assert len(sql_shape("SELECT " + "x, " * 200, max_length=40)) == 40
+
+
+def test_track_job_records_duration_and_rows():
+    @track_job("test_job_rows")
+    def job():
+        return {"rows": {"product_sales_aggregated": 7}}
+
+    job()
+
+    assert REGISTRY.get_sample_value("job_duration_seconds_count", {"job": "test_job_rows", "status": "success"}) == 1
+    assert REGISTRY.get_sample_value("job_rows_affected", {"job": "test_job_rows", "table": "product_sales_aggregated"}) == 7
+    assert REGISTRY.get_sample_value("job_last_success_timestamp_seconds", {"job": "test_job_rows"}) > 0
+
+
+def test_track_job_marks_errors():
+    @track_job("test_job_error")
+    def failing_job():
+        return {"rows": {}, "error": "boom"}
+
+    @track_job("test_job_raise")
+    def raising_job():
+        raise RuntimeError("boom")
+
+    failing_job()
+    with pytest.raises(RuntimeError):
+        raising_job()
+
+    assert REGISTRY.get_sample_value("job_duration_seconds_count", {"job": "test_job_error", "status": "error"}) == 1
+    assert REGISTRY.get_sample_value("job_duration_seconds_count", {"job": "test_job_raise", "status": "error"}) == 1
+    assert REGISTRY.get_sample_value("job_last_success_timestamp_seconds", {"job": "test_job_raise"}) is None
+
+
+def test_instrument_engine_times_statements():
+    engine = create_engine("sqlite://")
+    instrument_engine(engine, "test_sqlite")
+
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+    assert REGISTRY.get_sample_value(
+        "sql_statement_duration_seconds_count", {"engine": "test_sqlite", "statement": "SELECT ?"}
+    ) == 1
+
+
+def test_instrument_engine_survives_failed_statements():
+    engine = create_engine("sqlite://", pool_size=1)
+    instrument_engine(engine, "test_sqlite_errors")
+
+    for _ in range(3):
+        with engine.connect() as conn:
+            with pytest.raises(Exception):
+                conn.execute(text("SELECT * FROM missing_table"))
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        assert "query_started_at" not in conn.info
+
+    assert REGISTRY.get_sample_value(
+        "sql_statement_duration_seconds_count", {"engine": "test_sqlite_errors", "statement": "SELECT ?"}
+    ) == 1
+
+
+def test_metrics_endpoint_uses_route_template():
+    app = FastAPI()
+    setup_metrics(app)
+
+    @app.get("/items/{item_id}")
+    def read_item(item_id: int):
+        return {"id": item_id}
+
+    client = TestClient(app)
+    client.get("/items/1")
+    client.get("/items/2")
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert 'route="/items/{item_id}"' in response.text
+    assert REGISTRY.get_sample_value(
+        "http_request_duration_seconds_count", {"method": "GET", "route": "/items/{item_id}", "status": "200"}
+    ) == 2
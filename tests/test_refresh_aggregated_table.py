@@ -0,0 +1,62 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from datetime import date
+from unittest.mock import MagicMock, patch
+from app.jobs.refresh_aggregated_table import changed_dates_params, refresh_aggregated_tables
+
+
+def claimed(*dates):
+    result = MagicMock()
+    result.fetchall.return_value = [(d,) for d in dates]
+    return result
+
+
+def test_changed_dates_params_bounds_cover_every_date():
+    params = changed_dates_params([date(2024, 1, 3), date(2024, 1, 10)])
+
+    assert params["start_datetime"] == date(2024, 1, 3)
+    assert params["end_datetime"] == date(2024, 1, 11)
+    assert params["dates"] == [date(2024, 1, 3), date(2024, 1, 10)]
+
+
+@patch("app.jobs.refresh_aggregated_table.SessionLocal")
+def test_refresh_aggregated_tables_without_changes(session_local):
+    db = MagicMock()
+    db.execute.return_value = claimed()
+    session_local.return_value = db
+
+    result = refresh_aggregated_tables()
+
+    assert result["dates"] == 0
+    assert db.execute.call_count == 3
+    db.commit.assert_called_once()
+    db.close.assert_called_once()
+
+
+@patch("app.jobs.refresh_aggregated_table.SessionLocal")
+def test_refresh_aggregated_tables_stages_once_for_all_tables(session_local):
+    db = MagicMock()
+    default = MagicMock()
+    default.scalar.return_value = 42
+    default.rowcount = 7
+    db.execute.side_effect = [
+        claimed(date(2024, 1, 10), date(2024, 1, 3)),
+        claimed(date(2024, 1, 3)),
+        claimed(date(2024, 1, 3)),
+    ] + [default] * 50
+    session_local.return_value = db
+
+    result = refresh_aggregated_tables()
+
+    statements = [str(call.args[0]) for call in db.execute.call_args_list]
+    assert sum("CREATE TEMP TABLE refresh_staging" in sql for sql in statements) == 1
+    assert sum("FROM sales s" in sql for sql in statements) == 1
+    assert result["dates"] == 2
+    assert result["rows"]["staging"] == 42
+    assert result["rows"]["customer_purchases_aggregated"] == 7
+    assert sum("INSERT INTO sales_counter_monthly" in sql for sql in statements) == 1
+    assert {"claim", "stage", "product_sales_aggregated", "commit", "total"} <= set(result["timings_ms"])
+    db.commit.assert_called_once()
+    assert "customer_purchases_aggregated_rollup" in result["rows"]
@@ -0,0 +1,73 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.services.result_cache import ResultCache
+
+
+def test_result_cache_hit_and_miss():
+    cache = ResultCache(max_entries=10, ttl_seconds=60)
+    assert cache.get(("f", "2024-01-01")) == (False, None)
+
+    cache.set(("f", "2024-01-01"), {"a": 1}, ["product_sales_aggregated"])
+
+    assert cache.get(("f", "2024-01-01")) == (True, {"a": 1})
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_disabled_result_cache_never_stores_or_serves():
+    cache = ResultCache(max_entries=10, ttl_seconds=60)
+    cache.set("a", 1, ["t"])
+    cache.enabled = False
+
+    cache.set("b", 2, ["t"])
+
+    assert cache.get("a") == (False, None)
+    assert cache.stats()["size"] == 1
+    cache.enabled = True
+    assert cache.get("b") == (False, None)
+
+
+def test_result_cache_evicts_least_recently_used():
+    cache = ResultCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", 1, ["t"])
+    cache.set("b", 2, ["t"])
+    cache.get("a")
+    cache.set("c", 3, ["t"])
+
+    assert cache.get("b") == (False, None)
+    assert cache.get("a") == (True, 1)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_result_cache_expires_entries():
+    cache = ResultCache(max_entries=10, ttl_seconds=0)
+    cache.set("a", 1, ["t"])
+
+    assert cache.get("a") == (False, None)
+
+
+def test_result_cache_invalidate_only_drops_dependent_entries():
+    cache = ResultCache(max_entries=10, ttl_seconds=60)
+    cache.set("product", 1, ["product_sales_aggregated"])
+    cache.set("customer", 2, ["customer_purchases_aggregated"])
+
+    dropped = cache.invalidate("product_sales_aggregated")
+
+    assert dropped == 1
+    assert cache.get("product") == (False, None)
+    assert cache.get("customer") == (True, 2)
+    assert cache.stats()["versions"] == {"product_sales_aggregated": 1}
+
+
+def test_result_cache_entry_computed_before_invalidation_is_stale():
+    cache = ResultCache(max_entries=10, ttl_seconds=60)
+    versions = cache.snapshot(["product_sales_aggregated"])
+
+    # Refresh termina enquanto a consulta ainda roda
+    cache.invalidate("product_sales_aggregated")
+    cache.set("product", 1, ["product_sales_aggregated"], versions)
+
+    assert cache.get("product") == (False, None)
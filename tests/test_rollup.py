@@ -0,0 +1,46 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from datetime import date
+from app.services.rollup import rollup_source
+from app.utils.date_utils import decompose_date_range
+
+
+def test_decompose_date_range_splits_years_months_and_days():
+    pieces = decompose_date_range(date(2020, 3, 15), date(2025, 2, 10))
+
+    assert pieces["yearly"] == [(date(2021, 1, 1), date(2024, 1, 1))]
+    assert pieces["monthly"] == [
+        (date(2020, 4, 1), date(2020, 12, 1)),
+        (date(2025, 1, 1), date(2025, 1, 1)),
+    ]
+    assert pieces["daily"] == [
+        (date(2020, 3, 15), date(2020, 3, 31)),
+        (date(2025, 2, 1), date(2025, 2, 10)),
+    ]
+
+
+def test_decompose_date_range_inside_one_month():
+    pieces = decompose_date_range(date(2024, 1, 5), date(2024, 1, 7))
+
+    assert pieces == {"yearly": [], "monthly": [], "daily": [(date(2024, 1, 5), date(2024, 1, 7))]}
+
+
+def test_decompose_date_range_whole_year():
+    pieces = decompose_date_range(date(2024, 1, 1), date(2024, 12, 31))
+
+    assert pieces == {"yearly": [(date(2024, 1, 1), date(2024, 1, 1))], "monthly": [], "daily": []}
+
+
+def test_rollup_source_reads_each_piece_from_coarsest_table():
+    source, params = rollup_source("product_sales_aggregated", "id_product, total_sold", date(2023, 12, 20), date(2025, 2, 28))
+
+    assert "FROM product_sales_aggregated_yearly WHERE" in source
+    assert "FROM product_sales_aggregated_monthly WHERE" in source
+    assert "FROM product_sales_aggregated WHERE" in source
+    assert source.count("UNION ALL") == 2
+    assert params["yearly_0_start"] == date(2024, 1, 1)
+    assert params["monthly_0_start"] == date(2025, 1, 1)
+    assert params["monthly_0_end"] == date(2025, 2, 1)
+    assert params["daily_0_start"] == date(2023, 12, 20)
@@ -0,0 +1,172 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+import numpy as np
+import pytest
+from app.services.result_cache import result_cache
+from app.services.sales_cube import EPOCH, DateCube, SalesCube
+
+
+@pytest.fixture(autouse=True)
+def clear_result_cache():
+    result_cache.clear()
+    yield
+    result_cache.clear()
+
+
+def day(value: date) -> int:
+    return (value - EPOCH).days
+
+
+def test_date_cube_matches_brute_force_sums():
+    rng = random.Random(7)
+    first = date(2024, 1, 1)
+    rows = {
+        (first + timedelta(days=rng.randrange(120)), rng.randrange(1, 20)): rng.randrange(1, 50)
+        for _ in range(600)
+    }
+    days = np.array([day(sale_date) for sale_date, _ in rows])
+    keys = np.array([key for _, key in rows])
+    values = np.array(list(rows.values()))
+    cube = DateCube.from_rows(days, keys, values)
+
+    for _ in range(50):
+        start = first + timedelta(days=rng.randrange(-10, 130))
+        end = start + timedelta(days=rng.randrange(0, 60))
+        expected = {key: 0 for key in cube.keys.tolist()}
+        for (sale_date, key), value in rows.items():
+            if start <= sale_date <= end:
+                expected[key] += value
+        assert dict(zip(cube.keys.tolist(), cube.totals(start, end).tolist())) == expected
+
+
+def test_date_cube_outside_the_axis_is_zero():
+    cube = DateCube.from_rows(np.array([day(date(2024, 1, 5))]), np.array([1]), np.array([3]))
+
+    assert cube.totals(date(2023, 1, 1), date(2023, 12, 31)).tolist() == [0]
+    assert cube.totals(date(2024, 2, 1), date(2024, 2, 2)).tolist() == [0]
+    assert cube.totals(date(2024, 1, 1), date(2024, 1, 31)).tolist() == [3]
+
+
+class FakeCursor:
+    def __init__(self, tables, products):
+        self.tables = tables
+        self.products = products
+        self.rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def execute(self, sql, params=None):
+        if "FROM product_sales_aggregated" in sql:
+            self.rows = self.tables["product_sales_aggregated"]
+        elif "FROM category_revenue_aggregated" in sql:
+            self.rows = self.tables["category_revenue_aggregated"]
+        else:
+            self.rows = self.products
+
+    def fetchmany(self, size):
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        return rows
+
+    def fetchall(self):
+        return self.fetchmany(len(self.rows))
+
+
+class FakeRawConnection:
+    def __init__(self, tables, products):
+        self.tables = tables
+        self.products = products
+
+    def cursor(self, name=None):
+        return FakeCursor(self.tables, self.products)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeEngine:
+    def __init__(self, tables, products):
+        self.connection = FakeRawConnection(tables, products)
+
+    def raw_connection(self):
+        return self.connection
+
+
+def loaded_cube(max_cells=1000):
+    d1, d2, d3 = day(date(2024, 1, 1)), day(date(2024, 1, 2)), day(date(2024, 1, 3))
+    tables = {
+        "product_sales_aggregated": [(d1, 1, 5), (d1, 2, 3), (d2, 2, 4), (d3, 1, 1)],
+        "category_revenue_aggregated": [(d1, "Books", 1050), (d2, "Games", 2000), (d3, "Books", 1)],
+    }
+    cube = SalesCube(bind=FakeEngine(tables, [(1, "Pen"), (2, "Notebook")]), max_cells=max_cells)
+    cube.reload()
+    return cube
+
+
+def test_top_product_from_cube():
+    cube = loaded_cube()
+
+    assert cube.top_product(date(2024, 1, 1), date(2024, 1, 3)) == (
+        True, {"product_id": 2, "top_product": "Notebook", "total_sold": 7}
+    )
+    assert cube.top_product(date(2024, 1, 1), date(2024, 1, 1))[1]["product_id"] == 1
+    assert cube.top_product(date(2025, 1, 1), date(2025, 1, 31)) == (True, None)
+
+
+def test_cube_ignores_totals_cancelled_by_adjustments():
+    d1, d2 = day(date(2024, 1, 1)), day(date(2024, 1, 2))
+    tables = {
+        "product_sales_aggregated": [(d1, 1, 2), (d2, 1, -2), (d2, 2, -1)],
+        "category_revenue_aggregated": [(d1, "Books", 500), (d2, "Books", -500), (d2, "Games", 100)],
+    }
+    cube = SalesCube(bind=FakeEngine(tables, [(1, "Pen"), (2, "Notebook")]), max_cells=1000)
+    cube.reload()
+
+    # Mesmo resultado do SQL, que filtra com HAVING SUM(...) > 0
+    assert cube.top_product(date(2024, 1, 1), date(2024, 1, 2)) == (True, None)
+    assert cube.revenue_by_category(date(2024, 1, 1), date(2024, 1, 2)) == (
+        True, [{"category": "Games", "total_revenue": Decimal("1.00")}]
+    )
+
+
+def test_revenue_by_category_from_cube_keeps_cents():
+    cube = loaded_cube()
+
+    hit, revenue = cube.revenue_by_category(date(2024, 1, 1), date(2024, 1, 3))
+
+    assert hit
+    assert revenue == [
+        {"category": "Games", "total_revenue": Decimal("20.00")},
+        {"category": "Books", "total_revenue": Decimal("10.51")},
+    ]
+    assert cube.revenue_by_category(date(2024, 1, 3), date(2024, 1, 3))[1] == [
+        {"category": "Books", "total_revenue": Decimal("0.01")}
+    ]
+
+
+def test_cube_falls_back_after_invalidation():
+    cube = loaded_cube()
+
+    result_cache.invalidate("product_sales_aggregated")
+
+    assert cube.top_product(date(2024, 1, 1), date(2024, 1, 3)) == (False, None)
+    assert cube.revenue_by_category(date(2024, 1, 1), date(2024, 1, 3))[0]
+    assert cube.stats()["fallbacks"] == 1
+
+
+def test_cube_over_the_cell_limit_is_disabled():
+    cube = loaded_cube(max_cells=3)
+
+    assert cube.top_product(date(2024, 1, 1), date(2024, 1, 3)) == (False, None)
+    assert cube.stats()["tables"] == {}
@@ -0,0 +1,81 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import json
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock, patch
+import pytest
+from app.services.sales_export import csv_lines, group_sale_rows, ndjson_lines, stream_sales
+
+ROWS = [
+    (1, 10, datetime(2024, 1, 1, 8), 100),
+    (1, 10, datetime(2024, 1, 1, 8), 101),
+    (2, 11, datetime(2024, 1, 1, 9), None),
+    (3, 12, datetime(2024, 1, 2, 7), 100),
+    (3, 12, datetime(2024, 1, 2, 7), 100),
+]
+
+
+def test_group_sale_rows_joins_product_lines():
+    sales = list(group_sale_rows(ROWS))
+
+    assert sales == [
+        {"id": 1, "id_user": 10, "datetime": "2024-01-01T08:00:00", "products": [100, 101]},
+        {"id": 2, "id_user": 11, "datetime": "2024-01-01T09:00:00", "products": []},
+        {"id": 3, "id_user": 12, "datetime": "2024-01-02T07:00:00", "products": [100, 100]},
+    ]
+    assert list(group_sale_rows([])) == []
+
+
+def test_formatters():
+    sales = list(group_sale_rows(ROWS[:3]))
+
+    assert [json.loads(line)["id"] for line in ndjson_lines(sales).splitlines()] == [1, 2]
+    assert csv_lines(sales).splitlines() == [
+        "1,10,2024-01-01T08:00:00,100",
+        "1,10,2024-01-01T08:00:00,101",
+        "2,11,2024-01-01T09:00:00,",
+    ]
+
+
+def streaming_session(batches):
+    result = MagicMock()
+
+    async def partitions():
+        for batch in batches:
+            yield batch
+
+    result.partitions = partitions
+    db = AsyncMock()
+    db.stream.return_value = result
+    session = MagicMock()
+    session.__aenter__ = AsyncMock(return_value=db)
+    session.__aexit__ = AsyncMock(return_value=False)
+    return session, db
+
+
+@pytest.mark.parametrize("split", [1, 2, 4])
+async def test_stream_sales_keeps_sales_split_across_batches_together(split):
+    session, db = streaming_session([ROWS[:split], ROWS[split:]])
+
+    with patch("app.services.sales_export.AsyncSessionLocal", return_value=session):
+        body = "".join([chunk async for chunk in stream_sales("2024-01-01", "2024-01-02")])
+
+    sales = [json.loads(line) for line in body.splitlines()]
+    assert [sale["id"] for sale in sales] == [1, 2, 3]
+    assert sales[0]["products"] == [100, 101]
+    params = db.stream.call_args.args[1]
+    assert params["end_datetime"] == datetime(2024, 1, 3)
+    assert db.stream.call_args.kwargs["execution_options"]["yield_per"] > 0
+
+
+async def test_stream_sales_csv_starts_with_header():
+    session, _ = streaming_session([ROWS])
+
+    with patch("app.services.sales_export.AsyncSessionLocal", return_value=session):
+        body = "".join([chunk async for chunk in stream_sales("2024-01-01", "2024-01-02", "csv")])
+
+    lines = body.splitlines()
+    assert lines[0] == "sale_id,id_user,datetime,id_product"
+    assert len(lines) == 6
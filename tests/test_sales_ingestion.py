@@ -0,0 +1,160 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import asyncio
+from datetime import datetime, timezone
+from itertools import count
+from unittest.mock import AsyncMock, MagicMock
+import pytest
+from pydantic import ValidationError
+from app.models.product_sales import ProductSales
+from app.schemas import SaleIn
+from app.services.sales_ingestion import BufferFullError, SalesWriteBuffer
+
+
+def sale(id_user=1, products=(10,)):
+    return {"id_user": id_user, "datetime": datetime(2026, 10, 18, 12), "products": [
+        {"id_product": product, "quantity": 1} for product in products
+    ]}
+
+
+class FakeSessions:
+    """ Fábrica de sessões que gera ids sequenciais e falha para o usuário `bad_user`. """
+
+    def __init__(self, bad_user=None):
+        self.ids = count(1)
+        self.bad_user = bad_user
+        self.calls = []
+        self.commits = 0
+
+    def __call__(self):
+        db = AsyncMock()
+
+        async def execute(statement, rows):
+            self.calls.append((str(statement), rows))
+            if self.bad_user is not None and any(row.get("id_user") == self.bad_user for row in rows):
+                raise ValueError("unknown user")
+            result = MagicMock()
+            result.scalars.return_value.all.return_value = [next(self.ids) for _ in rows]
+            return result
+
+        async def commit():
+            self.commits += 1
+
+        db.execute.side_effect = execute
+        db.commit.side_effect = commit
+        session = MagicMock()
+        session.__aenter__ = AsyncMock(return_value=db)
+        session.__aexit__ = AsyncMock(return_value=False)
+        return session
+
+
+async def test_concurrent_requests_share_one_transaction():
+    sessions = FakeSessions()
+    buffer = SalesWriteBuffer(sessions, flush_size=1000, flush_interval_ms=20)
+
+    first, second = await asyncio.gather(
+        buffer.submit([sale(1, (10, 11))]),
+        buffer.submit([sale(2), sale(3)]),
+    )
+    await buffer.close()
+
+    assert first == [1]
+    assert second == [2, 3]
+    assert sessions.commits == 1
+    product_rows = sessions.calls[1][1]
+    assert product_rows[:2] == [{"id_sale": 1, "id_product": 10}, {"id_sale": 1, "id_product": 11}]
+    assert buffer.stats()["flushed_sales"] == 3
+
+
+async def test_flushes_when_size_threshold_is_reached():
+    sessions = FakeSessions()
+    buffer = SalesWriteBuffer(sessions, flush_size=2, flush_interval_ms=60_000)
+
+    ids = await asyncio.wait_for(buffer.submit([sale(1), sale(2)]), timeout=1)
+    await buffer.close()
+
+    assert ids == [1, 2]
+
+
+async def test_quantity_expands_into_product_lines():
+    sessions = FakeSessions()
+    buffer = SalesWriteBuffer(sessions, flush_size=1, flush_interval_ms=10)
+
+    await buffer.submit([{**sale(), "products": [{"id_product": 7, "quantity": 3}]}])
+    await buffer.close()
+
+    assert sessions.calls[1][1] == [{"id_sale": 1, "id_product": 7}] * 3
+
+
+async def test_failed_batch_only_rejects_the_invalid_request():
+    sessions = FakeSessions(bad_user=99)
+    buffer = SalesWriteBuffer(sessions, flush_size=1000, flush_interval_ms=20)
+
+    good, bad = await asyncio.gather(
+        buffer.submit([sale(1)]),
+        buffer.submit([sale(99)]),
+        return_exceptions=True,
+    )
+    await buffer.close()
+
+    assert isinstance(good, list) and len(good) == 1
+    assert isinstance(bad, ValueError)
+    assert buffer.stats()["failed_sales"] == 1
+
+
+async def test_buffered_mode_returns_before_commit_and_close_flushes():
+    sessions = FakeSessions()
+    buffer = SalesWriteBuffer(sessions, flush_size=1000, flush_interval_ms=60_000)
+
+    assert await buffer.submit([sale()], wait=False) is None
+    assert buffer.pending == 1
+    await buffer.close()
+
+    assert buffer.pending == 0
+    assert sessions.commits == 1
+
+
+async def test_rejects_when_buffer_is_full():
+    buffer = SalesWriteBuffer(FakeSessions(), flush_size=1000, flush_interval_ms=60_000, max_pending=2)
+
+    await buffer.submit([sale(), sale()], wait=False)
+    with pytest.raises(BufferFullError):
+        await buffer.submit([sale()], wait=False)
+    await buffer.close()
+
+
+async def test_items_are_written_for_the_new_sale_ids():
+    sessions = FakeSessions()
+    buffer = SalesWriteBuffer(sessions, flush_size=1, flush_interval_ms=10)
+
+    ids = await buffer.submit([sale(1, (10, 11)), sale(2, (12,))])
+    await buffer.close()
+
+    (sales_sql, _), (items_sql, items) = sessions.calls
+    assert "INSERT INTO sales" in sales_sql
+    assert "INSERT INTO product_sales" in items_sql
+    assert items == [
+        {"id_sale": ids[0], "id_product": 10},
+        {"id_sale": ids[0], "id_product": 11},
+        {"id_sale": ids[1], "id_product": 12},
+    ]
+    assert sessions.commits == 1
+
+
+def test_product_sales_has_no_foreign_key_to_sales():
+    # A `sales` particionada não tem chave única só em id; a FK antiga apontava para sales_old
+    referenced = {key.column.table.name for key in ProductSales.__table__.foreign_keys}
+
+    assert referenced == {"product"}
+
+
+def test_sale_schema_normalizes_timezone_and_requires_products():
+    parsed = SaleIn(id_user=1, datetime="2026-10-18T12:00:00-03:00", products=[{"id_product": 5}])
+
+    assert parsed.datetime == datetime(2026, 10, 18, 15, 0)
+    assert parsed.datetime.tzinfo is None
+    assert parsed.products[0].quantity == 1
+    with pytest.raises(ValidationError):
+        SaleIn(id_user=1, datetime=datetime.now(timezone.utc), products=[])
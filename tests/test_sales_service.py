@@ -3,8 +3,9 @@ import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))) 
 
 import pytest
+from datetime import date
 from fastapi import HTTPException
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock
 from app.models.sales import Sales
 from app.models.product_sales import ProductSales
 from app.models.product import Product
@@ -17,43 +18,58 @@ from app.services import (
     get_top_customer,
     get_revenue_by_category,
     get_yearly_sales_average,
+    get_top_products,
+    get_top_customers,
+    result_cache,
 )
 
+@pytest.fixture
+def full_scan_top_customer(monkeypatch):
+    monkeypatch.setattr("app.services.sales_service.find_top_customer", AsyncMock(return_value=None))
+
+@pytest.fixture(autouse=True)
+def clear_result_cache():
+    result_cache.clear()
+    yield
+    result_cache.clear()
+
 @pytest.fixture
 def db_session():
-    return MagicMock()
+    session = AsyncMock()
+    session.execute.return_value = MagicMock()
+    return session
 
-def test_get_sales_summary_query(db_session):
-    db_session.query().filter().scalar.return_value = 10
+async def test_get_sales_summary_query(db_session):
+    db_session.execute.return_value.scalar.return_value = 10
 
-    total_sales = get_sales_summary(db_session, "2024-01-01", "2024-01-31")
+    total_sales = await get_sales_summary(db_session, "2024-01-01", "2024-01-31")
 
     assert total_sales == 10
-    
-    assert db_session.query().filter.called_once_with(Sales.datetime.between("2024-01-01", "2024-01-31"))
-    assert db_session.query().filter().scalar.called_once()
+
+    db_session.execute.assert_awaited_once()
+    db_session.execute.return_value.scalar.assert_called_once()
 
 
-def test_get_sales_summary_invalid_dates(db_session):
-    db_session.query().filter().scalar.return_value = 10
+async def test_get_sales_summary_invalid_dates(db_session):
+    db_session.execute.return_value.scalar.return_value = 10
     with pytest.raises(HTTPException) as exc_info:
-        get_sales_summary(db_session, "2024-0A-31", "2024-01-01")
+        await get_sales_summary(db_session, "2024-0A-31", "2024-01-01")
 
     assert exc_info.value.status_code == 400
     assert "Date format is invalid" in str(exc_info.value.detail)
 
-    db_session.query().filter().scalar.assert_not_called()
+    db_session.execute.assert_not_called()
 
-def test_get_sales_summary_exception(db_session):
-    db_session.query().filter().scalar.side_effect = Exception("Database Error")
-    total_sales = get_sales_summary(db_session, "2024-01-01", "2024-01-31")
+async def test_get_sales_summary_exception(db_session):
+    db_session.execute.side_effect = Exception("Database Error")
+    total_sales = await get_sales_summary(db_session, "2024-01-01", "2024-01-31")
     assert total_sales == None
 
-def test_get_top_product_success(db_session):
+async def test_get_top_product_success(db_session):
     mock_result = (1, "Product A", 100)
     db_session.execute.return_value.fetchone.return_value = mock_result
 
-    result = get_top_product(db_session, "2024-01-01", "2024-01-31")
+    result = await get_top_product(db_session, "2024-01-01", "2024-01-31")
 
     assert result == {
         "product_id": 1,
@@ -63,121 +79,146 @@ def test_get_top_product_success(db_session):
     db_session.execute.assert_called_once()
     db_session.execute.return_value.fetchone.assert_called_once()
 
-def test_get_top_product_no_product_found(db_session):
+async def test_get_top_product_breaks_ties_like_the_cube(db_session):
+    db_session.execute.return_value.fetchone.return_value = (1, "Product A", 100)
+
+    await get_top_product(db_session, "2024-01-01", "2024-01-31")
+
+    sql = " ".join(str(db_session.execute.call_args.args[0]).split())
+    assert "GROUP BY agg.id_product, product.description" in sql
+    assert "HAVING SUM(agg.total_sold) > 0 ORDER BY total_sold DESC, agg.id_product" in sql
+
+async def test_get_top_product_no_product_found(db_session):
     db_session.execute.return_value.fetchone.return_value = None
-    result = get_top_product(db_session, "2024-01-01", "2024-01-31")
+    result = await get_top_product(db_session, "2024-01-01", "2024-01-31")
 
     assert result is None
     db_session.execute.assert_called_once()
     db_session.execute.return_value.fetchone.assert_called_once()
 
-def test_get_top_product_invalid_dates(db_session):
+async def test_get_top_product_invalid_dates(db_session):
     db_session.execute.return_value.fetchone.return_value = None
 
     with pytest.raises(HTTPException) as exc_info:
-        get_top_product(db_session, "2024-0A-31", "2024-01-01")
+        await get_top_product(db_session, "2024-0A-31", "2024-01-01")
 
     assert exc_info.value.status_code == 400
     assert "Date format is invalid" in str(exc_info.value.detail)
 
     db_session.execute.assert_not_called()
 
-def test_get_top_product_database_error(db_session):
+async def test_get_top_product_database_error(db_session):
     db_session.execute.side_effect = Exception("Database Error")
 
-    result = get_top_product(db_session, "2024-01-01", "2024-01-31")
+    result = await get_top_product(db_session, "2024-01-01", "2024-01-31")
 
     assert result is None
 
     db_session.execute.assert_called_once()
 
-def test_get_yearly_sales_average_success(db_session):
-    mock_result = [(2022, 1200), (2023, 2400)]
+async def test_get_yearly_sales_average_success(db_session):
+    mock_result = [(2022, 1200, 1, 12), (2023, 2400, 3, 12)]
     db_session.execute.return_value.fetchall.return_value = mock_result
 
-    result = get_yearly_sales_average(db_session)
+    result = await get_yearly_sales_average(db_session)
 
     expected_result = [
-        {"year": 2022, "avg_sales": 100.0},  
-        {"year": 2023, "avg_sales": 200.0},  
+        {"year": 2022, "avg_sales": 100.0, "months": 12},  
+        {"year": 2023, "avg_sales": 240.0, "months": 10},  
     ]
     assert result == expected_result
 
     db_session.execute.assert_called_once()
     db_session.execute.return_value.fetchall.assert_called_once()
 
-def test_get_yearly_sales_average_no_data_found(db_session):
+async def test_get_yearly_sales_average_leaves_out_the_open_month(db_session):
+    # Outubro de 2026 ainda está aberto: o banco devolve só janeiro a setembro
+    db_session.execute.return_value.fetchall.return_value = [(2025, 12000, 1, 12), (2026, 9000, 1, 9)]
+
+    result = await get_yearly_sales_average(db_session, today=date(2026, 10, 18))
+
+    assert result == [
+        {"year": 2025, "avg_sales": 1000.0, "months": 12},
+        {"year": 2026, "avg_sales": 1000.0, "months": 9},
+    ]
+    statement, params = db_session.execute.call_args.args
+    assert "WHERE sale_date < :current_month" in str(statement)
+    assert params == {"current_month": date(2026, 10, 1)}
+
+async def test_get_yearly_sales_average_no_data_found(db_session):
     db_session.execute.return_value.fetchall.return_value = []
 
-    result = get_yearly_sales_average(db_session)
+    result = await get_yearly_sales_average(db_session)
 
     assert result is None
 
     db_session.execute.assert_called_once()
     db_session.execute.return_value.fetchall.assert_called_once()
 
-def test_get_yearly_sales_average_database_error(db_session):
+async def test_get_yearly_sales_average_database_error(db_session):
     db_session.execute.side_effect = Exception("Database Error")
 
-    result = get_yearly_sales_average(db_session)
+    result = await get_yearly_sales_average(db_session)
 
     assert result is None
 
     db_session.execute.assert_called_once()
 
-def test_get_revenue_by_category_success(db_session):
+async def test_get_revenue_by_category_success(db_session):
     mock_result = [("Electronics", 5000.0), ("Clothing", 3000.0)]
     db_session.execute.return_value.fetchall.return_value = mock_result
 
-    result = get_revenue_by_category(db_session, "2024-01-01", "2024-01-31")
+    result = await get_revenue_by_category(db_session, "2024-01-01", "2024-01-31")
 
     expected_result = [
         {"category": "Electronics", "total_revenue": 5000.0},
         {"category": "Clothing", "total_revenue": 3000.0},
     ]
     assert result == expected_result
+    # Mesmo critério do cubo: só categorias com receita positiva
+    assert "HAVING SUM(total_revenue) > 0" in str(db_session.execute.call_args.args[0])
 
     db_session.execute.assert_called_once()
     db_session.execute.return_value.fetchall.assert_called_once()
 
-def test_get_revenue_by_category_no_data_found(db_session):
+async def test_get_revenue_by_category_no_data_found(db_session):
     db_session.execute.return_value.fetchall.return_value = []
 
-    result = get_revenue_by_category(db_session, "2024-01-01", "2024-01-31")
+    result = await get_revenue_by_category(db_session, "2024-01-01", "2024-01-31")
 
     assert result == []
 
     db_session.execute.assert_called_once()
     db_session.execute.return_value.fetchall.assert_called_once()
 
-def test_get_revenue_by_category_invalid_dates(db_session):
+async def test_get_revenue_by_category_invalid_dates(db_session):
     db_session.execute.return_value.fetchall.return_value = []
 
     with pytest.raises(HTTPException) as exc_info:
-        get_revenue_by_category(db_session, "2024-0A-31", "2024-01-01")
+        await get_revenue_by_category(db_session, "2024-0A-31", "2024-01-01")
 
     assert exc_info.value.status_code == 400
     assert "Date format is invalid" in str(exc_info.value.detail)
 
     db_session.execute.assert_not_called()
 
-def test_get_revenue_by_category_database_error(db_session):
+async def test_get_revenue_by_category_database_error(db_session):
     db_session.execute.side_effect = Exception("Database Error")
 
-    result = get_revenue_by_category(db_session, "2024-01-01", "2024-01-31")
+    result = await get_revenue_by_category(db_session, "2024-01-01", "2024-01-31")
 
     assert result == []
 
     db_session.execute.assert_called_once()
 
-def test_get_top_customer_success(db_session):
+async def test_get_top_customer_success(db_session, full_scan_top_customer):
     mock_top_customer = (1, 500)  
     mock_customer = Users(id=1, name="John Doe", cpf="12345678901")
     
     db_session.execute.return_value.fetchone.return_value = mock_top_customer
-    db_session.query.return_value.filter.return_value.first.return_value = mock_customer
+    db_session.get.return_value = mock_customer
 
-    result = get_top_customer(db_session, "2024-01-01", "2024-01-31")
+    result = await get_top_customer(db_session, "2024-01-01", "2024-01-31")
 
     expected_result = {
         "top_customer": "John Doe",
@@ -186,32 +227,111 @@ def test_get_top_customer_success(db_session):
     }
     assert result == expected_result
     db_session.execute.assert_called_once()
-    db_session.query.return_value.filter.return_value.first.assert_called_once()
+    db_session.get.assert_awaited_once_with(Users, 1)
+    # Mesmo desempate do motor de top-K e de /sales/top-customers
+    assert "ORDER BY total_purchases DESC, id_user" in " ".join(str(db_session.execute.call_args.args[0]).split())
 
-def test_get_top_customer_no_customer_found(db_session):
+async def test_get_top_customer_no_customer_found(db_session, full_scan_top_customer):
     db_session.execute.return_value.fetchone.return_value = None
 
-    result = get_top_customer(db_session, "2024-01-01", "2024-01-31")
+    result = await get_top_customer(db_session, "2024-01-01", "2024-01-31")
     assert result is None
 
     db_session.execute.assert_called_once()
-    db_session.query.return_value.filter.return_value.first.assert_not_called()
+    db_session.get.assert_not_called()
 
-def test_get_top_customer_invalid_dates(db_session):
+async def test_get_top_customer_invalid_dates(db_session):
     db_session.execute.return_value.fetchone.return_value = None
 
     with pytest.raises(HTTPException) as exc_info:
-        get_top_customer(db_session, "2024-0A-31", "2024-01-01")
+        await get_top_customer(db_session, "2024-0A-31", "2024-01-01")
 
     assert exc_info.value.status_code == 400
     assert "Date format is invalid" in str(exc_info.value.detail)
 
     db_session.execute.assert_not_called()
 
-def test_get_top_customer_database_error(db_session):
+async def test_get_top_customer_database_error(db_session):
     db_session.execute.side_effect = Exception("Database Error")
 
-    result = get_top_customer(db_session, "2024-01-01", "2024-01-31")
+    result = await get_top_customer(db_session, "2024-01-01", "2024-01-31")
 
     assert result is None
-    db_session.execute.assert_called_once()
\ No newline at end of file
+    db_session.execute.assert_called_once()
+
+async def test_get_top_product_is_served_from_cache(db_session):
+    db_session.execute.return_value.fetchone.return_value = (1, "Product A", 100)
+
+    first = await get_top_product(db_session, "2024-01-01", "2024-01-31")
+    second = await get_top_product(db_session, "2024-01-01", "2024-01-31")
+
+    assert first == second
+    db_session.execute.assert_awaited_once()
+    assert result_cache.stats()["hits"] == 1
+
+async def test_get_top_product_cache_dropped_after_refresh(db_session):
+    db_session.execute.return_value.fetchone.return_value = (1, "Product A", 100)
+    await get_top_product(db_session, "2024-01-01", "2024-01-31")
+
+    result_cache.invalidate("product_sales_aggregated")
+    db_session.execute.return_value.fetchone.return_value = (2, "Product B", 150)
+    result = await get_top_product(db_session, "2024-01-01", "2024-01-31")
+
+    assert result["product_id"] == 2
+    assert db_session.execute.await_count == 2
+
+async def test_get_top_customer_uses_top_k_engine(db_session, monkeypatch):
+    monkeypatch.setattr("app.services.sales_service.find_top_customer", AsyncMock(return_value=(1, 500)))
+    db_session.get.return_value = Users(id=1, name="John Doe", cpf="12345678901")
+
+    result = await get_top_customer(db_session, "2024-01-01", "2024-01-31")
+
+    assert result == {"top_customer": "John Doe", "cpf": "12345678901", "total_purchases": 500}
+    db_session.execute.assert_not_called()
+
+async def test_get_top_products_ranks_ties_deterministically(db_session):
+    db_session.execute.return_value.fetchall.return_value = [
+        (3, "Product C", 100), (5, "Product E", 100), (1, "Product A", 80),
+    ]
+
+    result = await get_top_products(db_session, "2024-01-05", "2024-01-20", k=3)
+
+    assert [(item["rank"], item["product_id"]) for item in result] == [(1, 3), (1, 5), (3, 1)]
+    params = db_session.execute.call_args.args[1]
+    assert params["k"] == 3
+    assert "category_id" not in params
+
+async def test_get_top_products_with_category_filter(db_session):
+    db_session.execute.return_value.fetchall.return_value = [(3, "Product C", 100)]
+
+    await get_top_products(db_session, "2024-01-05", "2024-01-20", k=5, category_id=7)
+
+    statement, params = db_session.execute.call_args.args
+    sql = " ".join(str(statement).split())
+    assert "WHERE product.id_category = :category_id" in sql
+    assert "LEFT JOIN product ON product.id = agg.id_product" in sql
+    assert "MAX(description)" not in sql
+    assert params["category_id"] == 7
+
+async def test_get_top_customers_resolves_names_in_one_query(db_session, monkeypatch):
+    monkeypatch.setattr("app.services.sales_service.find_top_customers", AsyncMock(return_value=[(2, 30), (1, 20)]))
+    db_session.execute.return_value.fetchall.return_value = [(1, "John Doe", "111"), (2, "Jane Roe", "222")]
+
+    result = await get_top_customers(db_session, "2024-01-01", "2024-01-31", k=2)
+
+    assert result == [
+        {"rank": 1, "customer_id": 2, "customer": "Jane Roe", "cpf": "222", "total_purchases": 30},
+        {"rank": 2, "customer_id": 1, "customer": "John Doe", "cpf": "111", "total_purchases": 20},
+    ]
+    db_session.execute.assert_awaited_once()
+    db_session.get.assert_not_called()
+
+async def test_get_top_product_answered_by_sales_cube(db_session, monkeypatch):
+    cube = MagicMock()
+    cube.top_product.return_value = (True, {"product_id": 2, "top_product": "Notebook", "total_sold": 7})
+    monkeypatch.setattr("app.services.sales_service.sales_cube", cube)
+
+    top_product = await get_top_product(db_session, "2024-01-01", "2024-01-31")
+
+    assert top_product == {"product_id": 2, "top_product": "Notebook", "total_sold": 7}
+    db_session.execute.assert_not_called()
@@ -0,0 +1,72 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from datetime import date, datetime
+from unittest.mock import patch
+import pytest
+import seed_data
+from seed_data import MAX_PRODUCTS_PER_SALE, _generate_sales_chunk, sales_tasks, scaled_totals, years_before
+
+
+def generate(seed, scale, end_date=date(2026, 10, 18)):
+    total_users, total_sales = scaled_totals(scale)
+    chunks = [_generate_sales_chunk(task) for task in sales_tasks(seed, total_sales, total_users, end_date, 5)]
+    return [(sales.getvalue(), items.getvalue()) for sales, items in chunks]
+
+
+@patch.object(seed_data, "CHUNK_SIZE", 200)
+def test_sales_chunks_are_deterministic_for_seed_and_scale():
+    first = generate(seed=42, scale=0.00002)
+
+    assert len(first) == 5
+    assert generate(seed=42, scale=0.00002) == first
+    assert generate(seed=7, scale=0.00002) != first
+    assert len(generate(seed=42, scale=0.00004)) == 10
+
+
+@patch.object(seed_data, "CHUNK_SIZE", 200)
+def test_sales_and_item_ids_are_unique_across_chunks():
+    sale_ids, item_ids = [], []
+    for sales, items in generate(seed=42, scale=0.00002):
+        sale_ids += [int(line.split(",")[0]) for line in sales.splitlines()]
+        for line in items.splitlines():
+            id_item, id_sale, _ = map(int, line.split(","))
+            assert id_item // MAX_PRODUCTS_PER_SALE == id_sale
+            item_ids.append(id_item)
+
+    assert sale_ids == list(range(1, 1001))
+    assert len(set(item_ids)) == len(item_ids)
+
+
+def test_sales_stay_inside_the_requested_window():
+    sales, _ = _generate_sales_chunk(sales_tasks(1, 500, 10, date(2024, 2, 29), 1)[0])
+
+    sold_at = [datetime.fromisoformat(line.split(",")[2]) for line in sales.getvalue().splitlines()]
+    assert min(sold_at) >= datetime(2023, 2, 28)
+    assert max(sold_at) < datetime(2024, 3, 1)
+
+
+def test_years_before_clamps_leap_day():
+    assert years_before(date(2024, 2, 29), 1) == date(2023, 2, 28)
+    assert years_before(date(2024, 2, 29), 4) == date(2020, 2, 29)
+    assert years_before(date(2026, 10, 18), 5) == date(2021, 10, 18)
+
+
+@patch("seed_data.psycopg2.connect")
+def test_worker_connections_skip_change_log_triggers(connect):
+    seed_data._init_worker()
+
+    cursor = connect.return_value.cursor.return_value.__enter__.return_value
+    cursor.execute.assert_called_once_with("SET session_replication_role = replica;")
+
+
+@patch("seed_data.backfill_aggregated_tables")
+def test_rebuild_aggregates_runs_one_backfill(backfill):
+    backfill.return_value = {"dates": 10, "partitions": 1, "rows": {}}
+    seed_data.rebuild_aggregates(4)
+    backfill.assert_called_once_with(workers=4)
+
+    backfill.return_value = {"dates": 0, "partitions": 0, "rows": {}, "error": "sales_2024_01: boom"}
+    with pytest.raises(SystemExit):
+        seed_data.rebuild_aggregates(4)
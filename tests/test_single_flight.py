@@ -0,0 +1,115 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import asyncio
+import pytest
+from app.services.result_cache import cached, result_cache
+from app.services.single_flight import SingleFlight, coalescer, single_flight
+
+
+@pytest.fixture(autouse=True)
+def clear_result_cache():
+    result_cache.clear()
+    yield
+    result_cache.clear()
+
+
+async def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = 0
+
+    async def query():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"total": 42}
+
+    results = await asyncio.gather(*(flight.run("key", query) for _ in range(20)))
+
+    assert calls == 1
+    assert all(result == {"total": 42} for result in results)
+    assert flight.stats() == {"in_flight": 0, "executions": 1, "coalesced": 19}
+
+
+async def test_sequential_calls_are_not_coalesced():
+    flight = SingleFlight()
+
+    async def query():
+        return 1
+
+    await flight.run("key", query)
+    await flight.run("key", query)
+
+    assert flight.stats()["executions"] == 2
+
+
+async def test_exception_is_shared_by_every_waiter():
+    flight = SingleFlight()
+
+    async def query():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    results = await asyncio.gather(*(flight.run("key", query) for _ in range(3)), return_exceptions=True)
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+async def test_follower_runs_alone_when_leader_is_cancelled():
+    flight = SingleFlight()
+    calls = 0
+
+    async def query():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return calls
+
+    leader = asyncio.create_task(flight.run("key", query))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(flight.run("key", query))
+    await asyncio.sleep(0.01)
+    leader.cancel()
+
+    assert await follower == 2
+    assert leader.cancelled()
+
+
+async def test_decorator_key_ignores_session_and_changes_after_invalidation():
+    calls = 0
+
+    @single_flight("product_sales_aggregated")
+    async def service(db, start_date, end_date):
+        nonlocal calls
+        calls += 1
+        execution = calls
+        await asyncio.sleep(0.02)
+        return execution
+
+    first = asyncio.create_task(service(object(), "2024-01-01", "2024-01-31"))
+    await asyncio.sleep(0)
+    second = asyncio.create_task(service(object(), "2024-01-01", "2024-01-31"))
+    await asyncio.sleep(0)
+    result_cache.invalidate("product_sales_aggregated")
+    third = asyncio.create_task(service(object(), "2024-01-01", "2024-01-31"))
+
+    assert await first == await second == 1
+    assert await third == 2
+
+
+async def test_cached_result_computed_before_invalidation_is_not_served():
+    release = asyncio.Event()
+
+    @cached("product_sales_aggregated")
+    async def service(db, start_date):
+        await release.wait()
+        return {"value": "old"}
+
+    pending = asyncio.create_task(service(None, "2024-01-01"))
+    await asyncio.sleep(0)
+    result_cache.invalidate("product_sales_aggregated")
+    release.set()
+    await pending
+
+    assert result_cache.get(("service", "2024-01-01")) == (False, None)
@@ -0,0 +1,93 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import json
+from datetime import date
+import pytest
+from sqlalchemy import create_engine, text
+from app.database.slow_query_log import SlowQueryLog, is_read_only, to_pyformat
+
+
+def test_is_read_only_only_accepts_selects():
+    assert is_read_only("SELECT 1")
+    assert is_read_only("  WITH x AS (SELECT 1) SELECT * FROM x")
+    assert not is_read_only("WITH removed AS (DELETE FROM t RETURNING *) SELECT * FROM removed")
+    assert not is_read_only("INSERT INTO t VALUES (1)")
+
+
+def test_to_pyformat_converts_asyncpg_placeholders():
+    sql, params = to_pyformat("SELECT * FROM sales WHERE datetime BETWEEN $1 AND $2 AND x LIKE '%a'", ("a", "b"))
+
+    assert sql == "SELECT * FROM sales WHERE datetime BETWEEN %(p1)s AND %(p2)s AND x LIKE '%%a'"
+    assert params == {"p1": "a", "p2": "b"}
+    assert to_pyformat("SELECT %(x)s", {"x": 1}) == ("SELECT %(x)s", {"x": 1})
+
+
+def test_engine_hook_records_statements_over_threshold():
+    log = SlowQueryLog(threshold_ms=0, max_entries=2, explain_sample_rate=0, log_file=None)
+    engine = create_engine("sqlite://")
+    log.install(engine, "test")
+
+    with engine.connect() as conn:
+        conn.execute(text("SELECT :value"), {"value": date(2024, 1, 1)})
+        conn.execute(text("SELECT 2"))
+        conn.execute(text("SELECT 3"))
+
+    entries = log.entries()
+    assert [entry["shape"] for entry in entries] == ["SELECT ?", "SELECT ?"]
+    assert entries[0]["statement"] == "SELECT 3"
+    assert entries[0]["engine"] == "test"
+    assert log.entries(limit=1) == entries[:1]
+
+
+def test_engine_hook_survives_failed_statements():
+    log = SlowQueryLog(threshold_ms=0, explain_sample_rate=0, log_file=None)
+    engine = create_engine("sqlite://", pool_size=1)
+    log.install(engine, "test")
+
+    with engine.connect() as conn:
+        with pytest.raises(Exception):
+            conn.execute(text("SELECT * FROM missing_table"))
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        assert "slow_query_started_at" not in conn.info
+
+    assert [entry["statement"] for entry in log.entries()] == ["SELECT 1"]
+
+
+def test_engine_hook_ignores_fast_statements():
+    log = SlowQueryLog(threshold_ms=60_000, explain_sample_rate=0, log_file=None)
+    engine = create_engine("sqlite://")
+    log.install(engine, "test")
+
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+    assert log.entries() == []
+
+
+def test_record_writes_json_lines(tmp_path):
+    log_file = tmp_path / "slow.jsonl"
+    log = SlowQueryLog(threshold_ms=0, explain_sample_rate=0, log_file=str(log_file))
+
+    log.record("sync", "SELECT * FROM sales WHERE id = %(id)s", {"id": 10, "day": date(2024, 1, 1)}, 812.345)
+
+    line = json.loads(log_file.read_text().strip())
+    assert line["duration_ms"] == 812.35
+    assert line["parameters"] == {"id": 10, "day": "2024-01-01"}
+    assert line["explain"] is None
+
+
+def test_record_samples_explain_through_explain_engine():
+    log = SlowQueryLog(threshold_ms=0, explain_sample_rate=1, log_file=None)
+    log.explain_engine = object()
+    submitted = []
+    log._executor.submit = lambda fn, *args: submitted.append(args)
+
+    entry = log.record("async", "SELECT 1", (), 900)
+    log.record("async", "SELECT 2", (), 900)
+    log.record("async", "DELETE FROM sales", (), 900)
+
+    assert len(submitted) == 1
+    assert submitted[0][0] is entry
@@ -0,0 +1,76 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from datetime import date
+from unittest.mock import AsyncMock, MagicMock
+from app.services import top_customer_engine
+from app.services.top_customer_engine import find_top_customer, find_top_customers
+
+
+def result(fetchall=None, fetchone=None):
+    mock = MagicMock()
+    mock.fetchall.return_value = fetchall or []
+    mock.fetchone.return_value = fetchone
+    return mock
+
+
+async def test_find_top_customer_skips_ranges_without_whole_months():
+    db = AsyncMock()
+
+    assert await find_top_customer(db, date(2024, 1, 5), date(2024, 1, 20)) is None
+    db.execute.assert_not_called()
+
+
+async def test_find_top_customer_settles_winner_above_bound(monkeypatch):
+    monkeypatch.setattr(top_customer_engine, "TOP_CANDIDATES", 2)
+    db = AsyncMock()
+    db.execute.side_effect = [
+        result(fetchall=[(date(2024, 1, 1), 7, 50), (date(2024, 1, 1), 8, 10), (date(2024, 2, 1), 7, 40), (date(2024, 2, 1), 9, 5)]),
+        result(fetchall=[(7, 90)]),
+    ]
+
+    assert await find_top_customer(db, date(2024, 1, 1), date(2024, 2, 29)) == (7, 90)
+    candidates = db.execute.call_args_list[1].args[1]["candidates"]
+    assert candidates == [7, 8, 9]
+
+
+async def test_find_top_customer_falls_back_when_bound_is_not_met(monkeypatch):
+    monkeypatch.setattr(top_customer_engine, "TOP_CANDIDATES", 2)
+    db = AsyncMock()
+    db.execute.side_effect = [
+        result(fetchall=[(date(2024, 1, 1), 7, 50), (date(2024, 1, 1), 8, 45), (date(2024, 2, 1), 9, 48), (date(2024, 2, 1), 10, 47)]),
+        result(fetchall=[(7, 60)]),
+    ]
+
+    assert await find_top_customer(db, date(2024, 1, 1), date(2024, 2, 29)) is None
+
+
+async def test_find_top_customers_requires_kth_total_above_bound(monkeypatch):
+    monkeypatch.setattr(top_customer_engine, "TOP_CANDIDATES", 2)
+    db = AsyncMock()
+    db.execute.side_effect = [
+        result(fetchall=[(date(2024, 1, 1), 7, 50), (date(2024, 1, 1), 8, 10), (date(2024, 2, 1), 7, 40), (date(2024, 2, 1), 9, 5)]),
+        result(fetchall=[(7, 90), (8, 12)]),
+    ]
+
+    assert await find_top_customers(db, date(2024, 1, 1), date(2024, 2, 29), k=2) is None
+
+
+async def test_find_top_customers_falls_back_on_a_tie_at_the_bound(monkeypatch):
+    monkeypatch.setattr(top_customer_engine, "TOP_CANDIDATES", 2)
+    db = AsyncMock()
+    db.execute.side_effect = [
+        result(fetchall=[(date(2024, 1, 1), 7, 50), (date(2024, 1, 1), 8, 10), (date(2024, 2, 1), 7, 40), (date(2024, 2, 1), 9, 5)]),
+        # bound = 10 + 5: um cliente fora das listas pode somar 15 e ter id menor que 8
+        result(fetchall=[(7, 90), (8, 15)]),
+    ]
+
+    assert await find_top_customers(db, date(2024, 1, 1), date(2024, 2, 29), k=2) is None
+
+
+async def test_find_top_customers_rejects_k_above_list_size():
+    db = AsyncMock()
+
+    assert await find_top_customers(db, date(2024, 1, 1), date(2024, 2, 29), k=top_customer_engine.TOP_CANDIDATES + 1) is None
+    db.execute.assert_not_called()
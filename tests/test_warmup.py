@@ -0,0 +1,131 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.controllers import health_controller
+from app.jobs import warmup as warmup_module
+from app.jobs.warmup import WarmupState, aggregate_freshness, warm_up
+
+
+class InlineRunner:
+    """ Executa o job direto, como se o lock estivesse livre. """
+
+    def run_exclusive(self, job, func, *args, lock=None, **kwargs):
+        return func(*args, **kwargs)
+
+
+def run_warm_up(pending, windows, refresh=None):
+    state = WarmupState()
+    with patch.object(warmup_module, "job_runner", InlineRunner()), \
+         patch.object(warmup_module, "sales_cube") as cube, \
+         patch.object(warmup_module, "SessionLocal", return_value=MagicMock()), \
+         patch.object(warmup_module, "manage_partitions", return_value={"created": [], "archived": [], "partitions": ["p"]}), \
+         patch.object(warmup_module, "has_pending_changes", return_value=pending), \
+         patch.object(warmup_module, "has_current_windows", return_value=windows), \
+         patch.object(warmup_module, "refresh_aggregates_and_windows", refresh or MagicMock(return_value={"dates": 3})) as aggregates, \
+         patch.object(warmup_module, "refresh_window_results", return_value={"rows": {}}) as windows_job:
+        cube.reload.return_value = {"load_ms": 1.0}
+        report = warm_up(state)
+    return state, report, aggregates, windows_job
+
+
+def test_warm_up_skips_refresh_when_everything_is_fresh():
+    state, report, aggregates, windows_job = run_warm_up(pending=False, windows=True)
+
+    assert report["status"] == "done"
+    aggregates.assert_not_called()
+    windows_job.assert_not_called()
+    assert report["actions"] == {"partitions": {"created": [], "archived": []}, "cube": {"load_ms": 1.0}}
+
+
+def test_warm_up_refreshes_pending_changes():
+    _, report, aggregates, windows_job = run_warm_up(pending=True, windows=True)
+
+    aggregates.assert_called_once()
+    windows_job.assert_not_called()
+    assert report["actions"]["refresh"] == {"dates": 3}
+
+
+def test_warm_up_only_recomputes_windows_on_a_new_day():
+    _, _, aggregates, windows_job = run_warm_up(pending=False, windows=False)
+
+    aggregates.assert_not_called()
+    windows_job.assert_called_once()
+
+
+def test_warm_up_skips_steps_locked_by_another_worker():
+    runner = MagicMock()
+    runner.run_exclusive.return_value = None
+    with patch.object(warmup_module, "job_runner", runner), \
+         patch.object(warmup_module, "sales_cube") as cube, \
+         patch.object(warmup_module, "SessionLocal", return_value=MagicMock()), \
+         patch.object(warmup_module, "has_pending_changes", return_value=True), \
+         patch.object(warmup_module, "has_current_windows", return_value=True):
+        report = warm_up(WarmupState())
+
+    assert report["status"] == "done"
+    assert report["actions"]["partitions"] == "skipped"
+    assert report["actions"]["refresh"] == "skipped"
+    cube.reload.assert_called_once()
+
+
+def test_warm_up_failure_is_reported():
+    state, report, _, _ = run_warm_up(pending=True, windows=True, refresh=MagicMock(side_effect=RuntimeError("boom")))
+
+    assert report["status"] == "failed"
+    assert report["error"] == "boom"
+    assert state.finished_at is not None
+
+
+async def test_aggregate_freshness_fills_tables_without_pending_dates():
+    result = MagicMock()
+    result.fetchall.return_value = [("product_sales_aggregated", 4, 120.04)]
+    db = MagicMock()
+    db.execute = AsyncMock(return_value=result)
+
+    freshness = await aggregate_freshness(db)
+
+    assert freshness["product_sales_aggregated"] == {"pending_dates": 4, "stale_seconds": 120.0}
+    assert freshness["customer_purchases_aggregated"] == {"pending_dates": 0, "stale_seconds": 0.0}
+
+
+def make_client():
+    app = FastAPI()
+    app.include_router(health_controller.router)
+    return TestClient(app)
+
+
+def test_liveness_does_not_touch_the_database():
+    with patch.object(health_controller, "check_database", AsyncMock(side_effect=RuntimeError)) as check:
+        response = make_client().get("/health/live")
+
+    assert response.status_code == 200
+    check.assert_not_called()
+
+
+def test_readiness_reports_freshness_and_warmup():
+    freshness = {"product_sales_aggregated": {"pending_dates": 0, "stale_seconds": 0.0}}
+    with patch.object(health_controller, "check_database", AsyncMock(return_value=freshness)):
+        response = make_client().get("/health/ready")
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["status"] == "ready"
+    assert body["aggregates"] == freshness
+    assert "status" in body["warmup"]
+
+
+def test_readiness_fails_when_database_is_unreachable():
+    async def hang():
+        await asyncio.sleep(1)
+
+    with patch.object(health_controller, "check_database", hang), \
+         patch.object(health_controller, "HEALTH_CHECK_TIMEOUT_SECONDS", 0.01):
+        response = make_client().get("/health/ready")
+
+    assert response.status_code == 503
+    assert response.json()["database"] == "unreachable"
@@ -0,0 +1,155 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest.mock import AsyncMock, MagicMock, patch
+import pytest
+from fastapi import HTTPException
+from app.jobs import precompute_windows as job
+from app.services.window_results import precomputed, to_json, window_for, window_results
+from app.utils.date_utils import named_windows, resolve_date_range
+
+
+@pytest.fixture(autouse=True)
+def clear_window_results():
+    window_results.clear()
+    yield
+    window_results.clear()
+
+
+def test_named_windows_are_inclusive_ranges_ending_today():
+    windows = named_windows(date(2024, 3, 15))
+
+    assert windows["today"] == (date(2024, 3, 15), date(2024, 3, 15))
+    assert windows["last_7_days"] == (date(2024, 3, 9), date(2024, 3, 15))
+    assert windows["last_90_days"][0] == date(2024, 3, 15) - timedelta(days=89)
+    assert windows["month_to_date"] == (date(2024, 3, 1), date(2024, 3, 15))
+    assert windows["year_to_date"] == (date(2024, 1, 1), date(2024, 3, 15))
+    assert windows["previous_month"] == (date(2024, 2, 1), date(2024, 2, 29))
+
+
+def test_previous_month_in_january_is_last_december():
+    assert named_windows(date(2024, 1, 10))["previous_month"] == (date(2023, 12, 1), date(2023, 12, 31))
+
+
+def test_resolve_date_range_accepts_window_alias():
+    start, end = resolve_date_range(None, None, "today")
+
+    assert start == end == date.today().isoformat()
+    assert resolve_date_range("2024-01-01", "2024-01-31", None) == ("2024-01-01", "2024-01-31")
+
+
+@pytest.mark.parametrize("start_date, end_date, window", [(None, None, "last_week"), ("2024-01-01", None, None)])
+def test_resolve_date_range_rejects_unknown_window_or_missing_dates(start_date, end_date, window):
+    with pytest.raises(HTTPException) as error:
+        resolve_date_range(start_date, end_date, window)
+    assert error.value.status_code == 400
+
+
+def test_window_for_recognises_explicit_ranges():
+    today = date(2024, 3, 15)
+
+    assert window_for("2024-03-01", "2024-03-15", today) == "month_to_date"
+    assert window_for("2024-03-02", "2024-03-15", today) is None
+    assert window_for("invalid", "2024-03-15", today) is None
+
+
+def make_service():
+    calls = []
+
+    @precomputed("top-products")
+    async def service(db, start_date, end_date, k=10, category_id=None):
+        calls.append((start_date, end_date, k))
+        return ["live"]
+
+    return service, calls
+
+
+async def test_precomputed_serves_window_from_memory():
+    service, calls = make_service()
+    today = date.today()
+    window_results.load([("today", "top-products", today, today, ["precomputed"])])
+
+    assert await service(MagicMock(), today.isoformat(), today.isoformat(), k=10) == ["precomputed"]
+    assert calls == []
+    assert window_results.stats()["memory_hits"] == 1
+
+
+async def test_precomputed_reads_table_once_then_memory():
+    service, calls = make_service()
+    today = date.today()
+    row = MagicMock()
+    row.fetchone.return_value = ('["from table"]',)
+    db = MagicMock()
+    db.execute = AsyncMock(return_value=row)
+
+    first = await service(db, today.isoformat(), today.isoformat())
+    second = await service(db, today.isoformat(), today.isoformat())
+
+    assert first == second == ["from table"]
+    db.execute.assert_awaited_once()
+    assert calls == []
+
+
+async def test_precomputed_skips_custom_parameters_and_other_ranges():
+    service, calls = make_service()
+    today = date.today()
+    window_results.load([("today", "top-products", today, today, ["precomputed"])])
+
+    assert await service(MagicMock(), today.isoformat(), today.isoformat(), k=5) == ["live"]
+    assert await service(MagicMock(), "2020-01-01", "2020-01-31") == ["live"]
+    assert len(calls) == 2
+
+
+async def test_precomputed_ignores_rows_from_an_older_range():
+    service, calls = make_service()
+    yesterday = date.today() - timedelta(days=1)
+    window_results.load([("today", "top-products", yesterday, yesterday, ["stale"])])
+    row = MagicMock()
+    row.fetchone.return_value = None
+    db = MagicMock()
+    db.execute = AsyncMock(return_value=row)
+
+    today = date.today().isoformat()
+    assert await service(db, today, today) == ["live"]
+    assert window_results.stats()["misses"] == 1
+
+
+async def test_compute_window_results_skips_empty_results():
+    async def top_product(db, start_date, end_date):
+        return {"product": "A", "total_sold": 10}
+
+    async def revenue(db, start_date, end_date):
+        return [] if start_date == end_date else [{"category": "A", "total_revenue": Decimal("1.50")}]
+
+    with patch.dict(job.WINDOW_METRICS, {"top-product": top_product, "revenue-by-category": revenue}, clear=True):
+        rows = await job.compute_window_results(MagicMock(), date(2024, 3, 15))
+
+    assert len(rows) == 7 + 6
+    assert ("today", "top-product", date(2024, 3, 15), date(2024, 3, 15), {"product": "A", "total_sold": 10}) in rows
+    assert not any(window == "today" and metric == "revenue-by-category" for window, metric, *_ in rows)
+
+
+def test_sales_summary_is_not_precomputed():
+    assert "summary" not in job.WINDOW_METRICS
+
+
+def test_refresh_window_results_saves_and_loads_memory():
+    today = date.today()
+    rows = [("today", "revenue-by-category", today, today, [{"category": "A", "total_revenue": Decimal("1.50")}])]
+
+    with patch.object(job, "_compute_with_own_engine", AsyncMock(return_value=rows)), \
+         patch.object(job, "save_window_results", return_value=1) as save:
+        result = job.refresh_window_results()
+
+    assert result == {"rows": {"window_results": 1}}
+    save.assert_called_once_with(rows)
+    assert window_results._from_memory(("today", "revenue-by-category"), today, today) == (
+        True, [{"category": "A", "total_revenue": 1.5}]
+    )
+
+
+def test_to_json_encodes_decimals_and_dates():
+    assert to_json({"total": Decimal("2.50"), "day": date(2024, 1, 2)}) == '{"total":2.5,"day":"2024-01-02"}'